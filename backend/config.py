@@ -26,10 +26,83 @@ CORS_ALLOW_HEADERS = ["*"]
 
 # 下载配置
 MAX_CONCURRENT_DOWNLOADS = 3  # 最大同时下载数
+DOWNLOAD_PRIORITIES = ["interactive", "bulk"]  # 下载优先级，从高到低
+DEFAULT_DOWNLOAD_PRIORITY = "interactive"  # 默认下载优先级
 DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+PROGRESS_FLUSH_HZ = 4  # 每个下载每秒最多推送的进度次数
+WS_BATCH_INTERVAL = 0.25  # WebSocket合并推送多个下载进度的时间窗口（秒）
+DOWNLOAD_USE_PROCESSES = False  # 是否在独立的工作进程中执行下载，避免与Web服务争用GIL
+DOWNLOAD_WORKER_MAX_JOBS = 20  # 每个下载工作进程处理多少个任务后重启，限制内存增长
+DOWNLOAD_INDEX_PATH = BASE_DIR / "data" / "downloads.json"  # 已下载文件索引
+DOWNLOAD_REUSE_MODE = "shared"  # "shared": 相同视频和格式共用同一文件; "link": 为每个请求者创建硬链接; "off": 不复用
+DOWNLOAD_FRAGMENT_CONCURRENCY = 4  # 每个下载并行下载的DASH/HLS分片数
+DOWNLOAD_MAX_CONNECTIONS = 12  # 本进程所有下载的连接总数上限，不小于MAX_CONCURRENT_DOWNLOADS
+HTTP_CHUNK_SIZE = 10 * 1024 * 1024  # 单文件格式按此大小分段发起Range请求，0表示整个文件一次请求
+DOWNLOAD_JOURNAL_PATH = BASE_DIR / "data" / "journal.db"  # 未完成下载任务的日志，重启后从部分文件继续
+JOURNAL_FLUSH_INTERVAL = 5  # 写入下载任务日志的进度间隔(秒)
+JOURNAL_RESUME_LEASE = 60  # 恢复任务时认领记录的租约(秒)，期间其他worker不会重复恢复同一任务
+DOWNLOAD_SHUTDOWN_TIMEOUT = 10  # 停止服务时等待进行中的下载保存断点的时间(秒)
+AUDIO_FORMATS = ["original", "m4a", "opus", "mp3"]  # 仅音频下载的输出格式，"original"保留下载的音频流
+FFMPEG_PATH = "ffmpeg"  # 音频转换使用的ffmpeg可执行文件
+POSTPROCESS_MAX_WORKERS = 2  # 同时运行的音频转换(ffmpeg)进程数
 TEMP_DIR = DOWNLOADS_DIR / "temp"  # 临时文件目录
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# 下载任务后端配置
+JOB_BACKEND = "memory"  # "memory": 单进程; "sqlite": 同一主机上的多个worker共享队列和进度
+JOB_BACKEND_PATH = BASE_DIR / "data" / "jobs.db"  # SQLite后端数据库路径
+JOB_POLL_INTERVAL = 0.2  # SQLite后端检查其他worker事件和空闲名额的间隔(秒)
+JOB_LEASE_TTL = 30  # 下载任务租约时长(秒)，worker退出后租约过期的任务会被标记为失败
+JOB_EVENT_RETENTION = 300  # 跨worker事件的保留时长(秒)
+
+# 存储配置
+STORAGE_MIN_FREE_BYTES = 1024 * 1024 * 1024  # 磁盘上始终保留的空闲空间，1GB
+STORAGE_GLOBAL_QUOTA = 1024 * 1024 * 1024 * 50  # 下载目录总配额（已完成文件+进行中的预留），50GB
+STORAGE_CLIENT_QUOTA = 1024 * 1024 * 1024 * 10  # 单个客户端的配额，10GB
+STORAGE_DEFAULT_RESERVATION = 512 * 1024 * 1024  # 无法估算大小时为下载预留的空间，512MB
+STORAGE_HIGH_WATERMARK = 0.9  # 用量超过总配额的该比例时按最近最少使用淘汰已完成的下载
+STORAGE_LOW_WATERMARK = 0.75  # 淘汰到用量低于总配额的该比例为止
+STORAGE_EVICT_MIN_AGE = 3600  # 最近该时长(秒)内完成或使用过的文件不会被淘汰
+STORAGE_WAIT_TIMEOUT = 600  # 空间不足的下载最多等待的时长(秒)
+
+# 后台维护配置
+MAINTENANCE_TEMP_INTERVAL = 300  # 清理临时文件和残留的部分下载的间隔(秒)
+MAINTENANCE_SESSION_INTERVAL = 600  # 清理过期下载会话的间隔(秒)
+MAINTENANCE_RETENTION_INTERVAL = 3600  # 按保留期限清理已完成下载的间隔(秒)
+TEMP_FILE_MAX_AGE = 24 * 3600  # 临时文件超过该时长(秒)未修改即删除
+ORPHAN_PARTIAL_MAX_AGE = 3600  # 没有下载在写入的部分下载文件超过该时长(秒)未修改即删除
+SESSION_MAX_AGE_HOURS = 24  # 已结束的下载会话保留时长(小时)
+DOWNLOAD_RETENTION = 7 * 24 * 3600  # 已完成的下载在最近一次使用后保留的时长(秒)，0表示不按时间清理
+
+# 元数据提取配置
+EXTRACTOR_MAX_WORKERS = 4  # 提取执行器的线程/进程数
+EXTRACTOR_MAX_QUEUE = 32  # 最大排队提取数，超出时返回503
+EXTRACTOR_TIMEOUT = 30  # 单次提取超时时间(秒)
+EXTRACTOR_USE_PROCESSES = False  # 是否使用进程池代替线程池
+
+# 元数据缓存配置
+METADATA_CACHE_ENABLED = True  # 是否启用内存缓存
+METADATA_CACHE_TTL = 600  # 缓存有效期(秒)
+METADATA_CACHE_MAX_ENTRIES = 512  # 最大缓存条目数
+METADATA_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 最大缓存字节数(近似)，64MB
+
+# 元数据持久化配置
+METADATA_STORE_MODE = "memory"  # "memory": 仅内存缓存; "disk": 额外持久化到SQLite
+METADATA_STORE_PATH = BASE_DIR / "data" / "metadata.db"  # SQLite数据库路径
+METADATA_STORE_TTL = 24 * 3600  # 持久化记录有效期(秒)
+METADATA_STORE_MAX_BYTES = 256 * 1024 * 1024  # 持久化数据上限，256MB
+METADATA_STORE_COMPACT_EVERY = 200  # 每写入多少条记录执行一次压缩
+
+# 批量查询配置
+BATCH_MAX_URLS = 500  # 单次批量请求最多URL数
+BATCH_DEFAULT_CONCURRENCY = 4  # 默认并行提取数
+BATCH_MAX_CONCURRENCY = 16  # 允许的最大并行提取数
+
+# 播放列表/频道配置
+PLAYLIST_MAX_ENTRIES = 1000  # 单个合集最多展开的条目数
+PLAYLIST_MAX_CONCURRENT = 4  # 同时展开的合集数
+PLAYLIST_DEFAULT_CONCURRENCY = 4  # 默认的条目信息并行获取数
+
 # 视频格式配置
 DEFAULT_PREFERRED_QUALITY = "720p"
 SUPPORTED_FORMATS = ["mp4", "webm", "mkv"]
@@ -1,11 +1,18 @@
 import os
+import re
 import uuid
 from fastapi import FastAPI, WebSocket, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from backend.routes import video
+from backend.routes import video, files, downloads
 from backend.services.websocket_manager import WebSocketManager
+from backend.services.download_manager import DownloadManager
+from backend.services.download_pool import DownloadWorkerPool
+from backend.services.extractor_pool import ExtractorPool
+from backend.services.postprocess import PostProcessPool
+from backend.services.playlist import PlaylistService
+from backend.services.maintenance import MaintenanceService
 from backend.config import (
     CORS_ORIGINS, 
     CORS_ALLOW_CREDENTIALS, 
@@ -41,8 +48,29 @@ templates = Jinja2Templates(directory="frontend/templates")
 # WebSocket管理器
 ws_manager = WebSocketManager()
 
+# 浏览器保存的持久客户端ID格式
+CLIENT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
 # 注册路由
 app.include_router(video.router, prefix="/api")
+app.include_router(files.router, prefix="/api")
+app.include_router(downloads.router, prefix="/api")
+
+@app.on_event("startup")
+async def startup():
+    """启动下载处理器和后台维护，多worker部署时每个worker都参与处理共享队列"""
+    await DownloadManager().start()
+    MaintenanceService().start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """停止后台维护、下载处理器、音频转换进程、下载工作进程、元数据提取执行器和播放列表展开线程池"""
+    await MaintenanceService().stop()
+    await DownloadManager().close()
+    await PostProcessPool().shutdown()
+    DownloadWorkerPool().shutdown()
+    ExtractorPool().shutdown()
+    PlaylistService.shutdown()
 
 @app.get("/")
 async def read_root(request: Request):
@@ -50,28 +78,34 @@ async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.websocket("/ws/download")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket下载端点"""
-    # 生成客户端ID
-    client_id = str(uuid.uuid4())
+async def websocket_endpoint(websocket: WebSocket, client_id: str = None):
+    """WebSocket下载端点
+
+    client_id由浏览器生成并保存，重连时带上同一个ID即可恢复自己的下载会话；
+    未提供或格式不正确时按一次性客户端处理。
+    """
+    # 每条连接都有独立的连接ID
+    connection_id = str(uuid.uuid4())
+    if not client_id or not CLIENT_ID_PATTERN.match(client_id):
+        client_id = connection_id
     
     try:
         # 建立连接
-        await ws_manager.connect(websocket, client_id)
-        logger.info(f"新的WebSocket连接: {client_id}")
+        await ws_manager.connect(websocket, connection_id, client_id)
+        logger.info(f"新的WebSocket连接: {connection_id}")
         
         # 处理消息
         while True:
             message = await websocket.receive_text()
-            await ws_manager.handle_client_message(client_id, message)
+            await ws_manager.handle_client_message(connection_id, message)
             
     except Exception as e:
         logger.error(f"WebSocket错误: {str(e)}")
         
     finally:
         # 断开连接
-        ws_manager.disconnect(client_id)
-        logger.info(f"WebSocket连接断开: {client_id}")
+        ws_manager.disconnect(connection_id)
+        logger.info(f"WebSocket连接断开: {connection_id}")
 
 if __name__ == "__main__":
     import uvicorn
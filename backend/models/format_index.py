@@ -0,0 +1,139 @@
+import re
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .video import VideoFormat
+
+# 格式类型
+VIDEO_ONLY = "video_only"
+AUDIO_ONLY = "audio_only"
+COMBINED = "combined"
+FORMAT_TYPES = (VIDEO_ONLY, AUDIO_ONLY, COMBINED)
+
+_RESOLUTION_PATTERN = re.compile(r'^(\d+)x(\d+)$')
+_HEIGHT_PATTERN = re.compile(r'^(\d+)p')
+
+# 编码字符串前缀到编码族的映射，如"avc1.640028" -> "h264"
+_CODEC_FAMILIES = {
+    'avc1': 'h264', 'avc3': 'h264', 'h264': 'h264',
+    'hev1': 'h265', 'hvc1': 'h265', 'h265': 'h265', 'hevc': 'h265',
+    'vp09': 'vp9', 'vp9': 'vp9',
+    'vp08': 'vp8', 'vp8': 'vp8',
+    'av01': 'av1', 'av1': 'av1',
+    'mp4a': 'aac', 'aac': 'aac',
+    'opus': 'opus',
+    'vorbis': 'vorbis',
+    'mp3': 'mp3',
+    'ac-3': 'ac3', 'ac3': 'ac3',
+    'ec-3': 'eac3', 'eac3': 'eac3',
+    'flac': 'flac',
+}
+
+def parse_resolution(resolution: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    解析分辨率字符串
+
+    Args:
+        resolution: "1920x1080"、"720p"或"audio only"等
+
+    Returns:
+        (宽度, 高度)，无法解析的部分为None
+    """
+    if not resolution:
+        return None, None
+    resolution = resolution.strip()
+    match = _RESOLUTION_PATTERN.match(resolution)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    match = _HEIGHT_PATTERN.match(resolution)
+    if match:
+        return None, int(match.group(1))
+    return None, None
+
+def codec_family(codec: Optional[str]) -> Optional[str]:
+    """
+    获取编码族
+
+    Args:
+        codec: yt-dlp给出的编码字符串，如"avc1.640028"、"opus"、"none"
+
+    Returns:
+        编码族名称（如"h264"、"vp9"、"aac"），没有该类型的流时返回None
+    """
+    if not codec or codec == "none":
+        return None
+    prefix = codec.lower().split('.', 1)[0]
+    return _CODEC_FAMILIES.get(prefix, prefix)
+
+class IndexedFormat:
+    """格式及其解析后的字段"""
+    __slots__ = ('format', 'width', 'height', 'type', 'vcodec', 'acodec', 'tbr')
+
+    def __init__(self, fmt: "VideoFormat"):
+        self.format = fmt
+        self.width, self.height = parse_resolution(fmt.resolution)
+        if fmt.is_combined:
+            self.type = COMBINED
+        elif fmt.is_video_only:
+            self.type = VIDEO_ONLY
+        elif fmt.is_audio_only:
+            self.type = AUDIO_ONLY
+        else:
+            self.type = None
+        self.vcodec = codec_family(fmt.vcodec)
+        self.acodec = codec_family(fmt.acodec)
+        self.tbr = fmt.tbr or 0.0
+
+class FormatIndex:
+    """视频格式索引
+
+    构建时解析每个格式一次：分辨率解析为整数，编码归为编码族，并按类型分桶。
+    每个桶另有按(高度, 比特率)和按比特率排序的视图，按高度上限划分格式用二分查找完成。
+    索引只读，随VideoInfo一起缓存。
+    """
+
+    def __init__(self, formats: List["VideoFormat"]):
+        self.entries = [IndexedFormat(f) for f in formats]
+        self._buckets: Dict[str, List[IndexedFormat]] = {t: [] for t in FORMAT_TYPES}
+        for entry in self.entries:
+            if entry.type is not None:
+                self._buckets[entry.type].append(entry)
+
+        # 按(高度, 比特率)升序排列的有高度的格式，及对应的高度列表用于二分查找
+        self._by_height: Dict[str, List[IndexedFormat]] = {}
+        self._heights: Dict[str, List[int]] = {}
+        self._by_tbr: Dict[str, List[IndexedFormat]] = {}
+        self._without_height: Dict[str, List[IndexedFormat]] = {}
+        for format_type, bucket in self._buckets.items():
+            with_height = sorted((e for e in bucket if e.height is not None), key=lambda e: (e.height, e.tbr))
+            self._by_height[format_type] = with_height
+            self._without_height[format_type] = [e for e in bucket if e.height is None]
+            self._heights[format_type] = [e.height for e in with_height]
+            self._by_tbr[format_type] = sorted(bucket, key=lambda e: e.tbr)
+
+    def by_type(self, format_type: str) -> List[IndexedFormat]:
+        """指定类型的所有格式（保持原始顺序）"""
+        return self._buckets.get(format_type, [])
+
+    def by_height(self, format_type: str) -> List[IndexedFormat]:
+        """指定类型中有高度的格式，按(高度, 比特率)升序"""
+        return self._by_height.get(format_type, [])
+
+    def by_tbr(self, format_type: str) -> List[IndexedFormat]:
+        """指定类型的所有格式，按比特率升序"""
+        return self._by_tbr.get(format_type, [])
+
+    def without_height(self, format_type: str) -> List[IndexedFormat]:
+        """指定类型中无法解析出高度的格式（保持原始顺序）"""
+        return self._without_height.get(format_type, [])
+
+    def at_most(self, format_type: str, max_height: int) -> List[IndexedFormat]:
+        """高度不超过max_height的格式，按(高度, 比特率)升序"""
+        end = bisect_right(self._heights.get(format_type, []), max_height)
+        return self.by_height(format_type)[:end]
+
+    def above(self, format_type: str, max_height: int) -> List[IndexedFormat]:
+        """高度超过max_height的格式，按(高度, 比特率)升序"""
+        start = bisect_right(self._heights.get(format_type, []), max_height)
+        return self.by_height(format_type)[start:]
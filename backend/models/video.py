@@ -1,5 +1,6 @@
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+from .format_index import FormatIndex
 
 class VideoFormat(BaseModel):
     """视频格式信息模型"""
@@ -7,12 +8,28 @@ class VideoFormat(BaseModel):
     ext: str  # 文件扩展名
     resolution: str  # 分辨率
     filesize: Optional[int]  # 文件大小(字节)
+    filesize_approx: Optional[int] = None  # 估算的文件大小(字节)，filesize未知时由yt-dlp给出
     vcodec: str  # 视频编码
     acodec: str  # 音频编码
     format_note: str  # 格式说明
     fps: Optional[float]  # 帧率
     tbr: Optional[float]  # 总比特率
     
+    def estimate_size(self, duration: Optional[float] = None) -> Optional[int]:
+        """
+        估算文件大小：优先使用filesize/filesize_approx，否则按总比特率(kbps)和时长计算
+        
+        Returns:
+            估算的字节数，无法估算时返回None
+        """
+        if self.filesize:
+            return self.filesize
+        if self.filesize_approx:
+            return self.filesize_approx
+        if self.tbr and duration:
+            return int(self.tbr * 1000 / 8 * duration)
+        return None
+    
     @property
     def is_video_only(self) -> bool:
         """是否仅视频流"""
@@ -38,6 +55,16 @@ class VideoInfo(BaseModel):
     uploader: Optional[str]  # 上传者
     formats: List[VideoFormat]  # 可用格式列表
     
+    # 首次查询时构建，随VideoInfo对象一起保存在元数据缓存中
+    _format_index: Optional[FormatIndex] = PrivateAttr(default=None)
+    
+    @property
+    def format_index(self) -> FormatIndex:
+        """格式索引，只构建一次"""
+        if self._format_index is None:
+            self._format_index = FormatIndex(self.formats)
+        return self._format_index
+    
     def get_formats_by_type(self, format_type: str) -> List[VideoFormat]:
         """获取指定类型的格式列表
         
@@ -47,11 +74,36 @@ class VideoInfo(BaseModel):
         Returns:
             符合条件的格式列表
         """
-        if format_type == "video_only":
-            return [f for f in self.formats if f.is_video_only]
-        elif format_type == "audio_only":
-            return [f for f in self.formats if f.is_audio_only]
-        elif format_type == "combined":
-            return [f for f in self.formats if f.is_combined]
+        if format_type in ("video_only", "audio_only", "combined"):
+            return [entry.format for entry in self.format_index.by_type(format_type)]
         else:
             return self.formats
+
+class FormatConstraints(BaseModel):
+    """格式选择条件"""
+    max_height: Optional[int] = None  # 最高分辨率(高度)，没有满足的格式时取最低分辨率
+    codecs: List[str] = []  # 视频编码族偏好，靠前的优先，如["av1", "vp9", "h264"]
+    container: Optional[str] = None  # 要求的容器/扩展名，如"mp4"、"webm"
+    max_bytes: Optional[int] = None  # 估算大小上限(字节)，大小未知的格式不受限制
+    allow_merge: bool = True  # 是否允许选择仅视频+仅音频，下载后合并
+
+class FormatSelection(BaseModel):
+    """格式选择结果"""
+    format_id: str  # 用于下载的格式ID，合并时为"视频ID+音频ID"
+    video: VideoFormat  # 视频所在的格式
+    audio: Optional[VideoFormat] = None  # 单独的音频格式，选择音视频组合格式时为None
+    height: Optional[int] = None  # 视频高度
+    estimated_size: Optional[int] = None  # 估算的下载大小(字节)
+
+class BatchInfoRequest(BaseModel):
+    """批量获取视频信息请求模型"""
+    urls: List[str]  # 视频URL列表
+    concurrency: Optional[int] = None  # 并行提取数，默认使用配置值
+
+class DownloadRequest(BaseModel):
+    """创建下载请求模型"""
+    url: str  # 视频URL
+    format_id: Optional[str] = None  # 格式ID，为空时自动选择
+    audio_format: Optional[str] = None  # 仅音频下载的输出格式，取值见AUDIO_FORMATS
+    priority: Optional[str] = None  # 优先级，默认使用配置值
+    client_id: Optional[str] = None  # 客户端ID，决定会话的归属，用于存储配额和公平调度；为空时由服务端生成
@@ -0,0 +1,55 @@
+import uuid
+from fastapi import APIRouter, HTTPException
+from ..services.download_manager import DownloadManager
+from ..models.video import DownloadRequest
+from ..utils.error_utils import AppError
+from ..config import DEFAULT_DOWNLOAD_PRIORITY
+
+router = APIRouter()
+
+@router.post("/downloads", status_code=202)
+async def create_download(request: DownloadRequest):
+    """
+    创建下载任务，与WebSocket的download消息等价
+
+    任务进入下载队列后立即返回会话ID，之后通过GET /api/downloads/{session_id}查询状态，
+    完成后从/api/files/{session_id}获取文件。查询和取消都需要带上创建时的client_id，
+    请求未提供时生成一个并在响应中返回。
+    """
+    session_id = str(uuid.uuid4())
+    client_id = request.client_id or str(uuid.uuid4())
+    manager = DownloadManager()
+    try:
+        await manager.create_session(
+            request.url,
+            session_id,
+            format_id=request.format_id,
+            client_id=client_id,
+            priority=request.priority or DEFAULT_DOWNLOAD_PRIORITY,
+            audio_format=request.audio_format
+        )
+    except AppError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    return {
+        "session_id": session_id,
+        "client_id": client_id,
+        "position": await manager.get_queue_position(session_id)
+    }
+
+@router.get("/downloads/{session_id}")
+async def get_download(session_id: str, client_id: str):
+    """获取下载会话的状态快照，格式与WebSocket推送的事件一致；只能查询自己的会话"""
+    manager = DownloadManager()
+    session = await manager.get_session(session_id)
+    snapshot = await manager.get_snapshot(session_id) if session is not None and session.owned_by(client_id) else None
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="下载会话不存在")
+    return snapshot
+
+@router.delete("/downloads/{session_id}")
+async def cancel_download(session_id: str, client_id: str):
+    """取消自己的下载会话，返回取消后的状态"""
+    try:
+        return {"status": await DownloadManager().cancel_session(session_id, client_id)}
+    except AppError as e:
+        raise HTTPException(status_code=404, detail=e.message)
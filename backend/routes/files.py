@@ -0,0 +1,33 @@
+import asyncio
+import os
+from fastapi import APIRouter, HTTPException
+from ..services.download_manager import DownloadManager
+from ..services.storage_manager import StorageManager
+from ..utils.file_response import RangeFileResponse
+from ..config import DOWNLOADS_DIR
+
+router = APIRouter()
+
+@router.api_route("/files/{session_id}", methods=["GET", "HEAD"])
+async def get_file(session_id: str) -> RangeFileResponse:
+    """
+    下载已完成会话的文件
+
+    支持Range（断点续传、播放器拖动）、ETag/Last-Modified和条件请求。
+    """
+    session = await DownloadManager().get_session(session_id)
+    if session is None or session.status != "completed" or session.file_path is None:
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    path = session.file_path
+    if path.resolve().parent != DOWNLOADS_DIR.resolve():
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    loop = asyncio.get_running_loop()
+    try:
+        stat_result = await loop.run_in_executor(None, os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="文件已被清理")
+    # 记录使用，避免正在被下载的文件按最近最少使用被淘汰
+    await loop.run_in_executor(None, StorageManager.touch, path)
+    return RangeFileResponse(path, stat_result)
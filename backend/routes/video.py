@@ -1,7 +1,20 @@
+import json
 from fastapi import APIRouter, HTTPException
-from typing import Optional, List
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Union
 from ..services.video_info import VideoInfoService
-from ..models.video import VideoInfo, VideoFormat
+from ..services.playlist import PlaylistService
+from ..services.maintenance import MaintenanceService
+from ..models.video import VideoInfo, VideoFormat, BatchInfoRequest, FormatConstraints, FormatSelection
+from ..models.format_index import parse_resolution
+from ..utils.error_utils import AppError, ServiceBusyError
+from ..utils.url_utils import extract_collection_id
+from ..config import (
+    BATCH_MAX_URLS,
+    BATCH_DEFAULT_CONCURRENCY,
+    BATCH_MAX_CONCURRENCY,
+    PLAYLIST_DEFAULT_CONCURRENCY
+)
 
 router = APIRouter()
 
@@ -13,26 +26,95 @@ async def get_video_info(url: str) -> VideoInfo:
         if not video_info:
             raise HTTPException(status_code=404, detail="无法获取视频信息")
         return video_info
+    except HTTPException:
+        raise
+    except ServiceBusyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/video/info/batch")
+async def get_video_info_batch(request: BatchInfoRequest):
+    """批量获取视频信息，以NDJSON格式按完成顺序流式返回每个视频的结果"""
+    if not request.urls:
+        raise HTTPException(status_code=422, detail="URL列表不能为空")
+    if len(request.urls) > BATCH_MAX_URLS:
+        raise HTTPException(status_code=413, detail=f"单次最多查询 {BATCH_MAX_URLS} 个URL")
+    
+    concurrency = request.concurrency or BATCH_DEFAULT_CONCURRENCY
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+    
+    async def generate():
+        async for item in VideoInfoService.iter_video_info_batch(request.urls, concurrency):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.get("/video/playlist")
+async def get_playlist(url: str, resolve: bool = False, concurrency: Optional[int] = None):
+    """
+    展开播放列表或频道，以NDJSON格式流式返回条目
+    
+    resolve为true时，额外以有限并行度获取每个条目的完整视频信息。
+    """
+    try:
+        extract_collection_id(url)
+    except AppError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    
+    concurrency = concurrency or PLAYLIST_DEFAULT_CONCURRENCY
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+    
+    async def generate():
+        async for item in PlaylistService.iter_collection(url, resolve=resolve, concurrency=concurrency):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @router.get("/video/best-format")
-async def get_best_format(url: str, prefer_quality: Optional[str] = "720p"):
-    """获取最佳视频格式的API端点"""
+async def get_best_format(
+    url: str,
+    prefer_quality: Optional[str] = "720p",
+    max_height: Optional[int] = None,
+    codecs: Optional[str] = None,
+    container: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    allow_merge: Optional[bool] = None
+) -> Union[FormatSelection, VideoFormat]:
+    """
+    按条件选择最佳格式的API端点
+    
+    max_height未指定时使用prefer_quality（如"720p"）；codecs为逗号分隔的编码偏好，
+    如"av1,vp9,h264"；allow_merge默认为True。返回的format_id可以直接用于下载。
+    
+    只传入url和prefer_quality时保持原有的返回格式：返回可以直接下载的音视频组合格式（VideoFormat），
+    视频没有组合格式时返回需要合并的FormatSelection；传入任一选择条件时总是返回完整的FormatSelection。
+    """
     try:
         video_info = await VideoInfoService.get_video_info(url)
         if not video_info:
             raise HTTPException(status_code=404, detail="无法获取视频信息")
             
-        best_format = VideoInfoService.get_best_format(
-            video_info.formats, 
-            prefer_quality
-        )
-        
-        if not best_format:
-            raise HTTPException(status_code=404, detail="未找到合适的视频格式")
+        if all(v is None for v in (max_height, codecs, container, max_bytes, allow_merge)):
+            return VideoInfoService.get_best_format(video_info, prefer_quality or "720p")
             
-        return best_format
+        if max_height is None and prefer_quality:
+            _, max_height = parse_resolution(prefer_quality)
+            if max_height is None:
+                raise HTTPException(status_code=422, detail=f"无效的首选质量: {prefer_quality}")
+                
+        constraints = FormatConstraints(
+            max_height=max_height,
+            codecs=[c.strip() for c in codecs.split(',') if c.strip()] if codecs else [],
+            container=container,
+            max_bytes=max_bytes,
+            allow_merge=True if allow_merge is None else allow_merge
+        )
+        return VideoInfoService.select_format(video_info, constraints)
+    except HTTPException:
+        raise
+    except AppError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -44,14 +126,38 @@ async def get_video_formats(url: str) -> List[VideoFormat]:
         if not formats:
             raise HTTPException(status_code=404, detail="无法获取视频格式")
         return formats
+    except HTTPException:
+        raise
+    except ServiceBusyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.delete("/video/info")
+async def invalidate_video_info(url: str):
+    """使指定视频的缓存信息失效"""
+    try:
+        return {"invalidated": await VideoInfoService.invalidate(url)}
+    except AppError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+@router.get("/video/stats")
+async def get_video_stats():
+    """获取元数据提取、缓存和持久化存储的运行指标"""
+    return await VideoInfoService.get_stats()
+
+@router.get("/maintenance/stats")
+async def get_maintenance_stats():
+    """获取后台维护任务（临时文件、过期会话、下载保留期限）每次执行的指标"""
+    return MaintenanceService().get_stats()
+
 @router.post("/video/info")
-async def get_video_info(video_url: str):
+async def post_video_info(video_url: str):
     try:
-        video_info = await video_service.get_video_info(video_url)
+        video_info = await VideoInfoService.get_video_info(video_url)
         return {"success": True, "data": video_info}
+    except ServiceBusyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except ValueError as e:
         return {"success": False, "error": str(e)}
     except Exception as e:
@@ -0,0 +1,65 @@
+import threading
+from typing import Any, Dict
+from ..config import MAX_CONCURRENT_DOWNLOADS, DOWNLOAD_MAX_CONNECTIONS, DOWNLOAD_FRAGMENT_CONCURRENCY
+
+class ConnectionBudget:
+    """下载连接预算
+
+    每个下载开始时按DOWNLOAD_FRAGMENT_CONCURRENCY申请分片并行数，结束时归还。
+    分配时为其余可能同时运行的下载（最多MAX_CONCURRENT_DOWNLOADS个）各保留一个连接，
+    因此下载少时单个下载可以使用更多连接，下载多时退化为每个下载一个连接，
+    连接总数始终不超过DOWNLOAD_MAX_CONNECTIONS。
+    """
+
+    def __init__(
+        self,
+        total: int = DOWNLOAD_MAX_CONNECTIONS,
+        max_jobs: int = MAX_CONCURRENT_DOWNLOADS
+    ):
+        self._total = max(total, max_jobs)
+        self._max_jobs = max_jobs
+        self._used = 0
+        self._jobs = 0
+        self._lock = threading.Lock()
+        self._metrics = {
+            'granted': 0,
+            'reduced': 0,
+        }
+
+    def acquire(self, requested: int = DOWNLOAD_FRAGMENT_CONCURRENCY) -> int:
+        """
+        为一个下载分配连接数
+
+        Args:
+            requested: 期望的分片并行数
+
+        Returns:
+            实际分配的连接数，至少为1，使用完后需要调用release归还
+        """
+        requested = max(1, requested)
+        with self._lock:
+            # 为其余可能开始的下载各保留一个连接
+            reserved = max(0, self._max_jobs - self._jobs - 1)
+            granted = max(1, min(requested, self._total - self._used - reserved))
+            self._used += granted
+            self._jobs += 1
+            self._metrics['granted'] += 1
+            if granted < requested:
+                self._metrics['reduced'] += 1
+            return granted
+
+    def release(self, connections: int):
+        """归还acquire分配的连接"""
+        with self._lock:
+            self._used -= connections
+            self._jobs -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接预算的使用情况"""
+        with self._lock:
+            return {
+                'total': self._total,
+                'used': self._used,
+                'jobs': self._jobs,
+                **self._metrics
+            }
@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from ..config import DOWNLOAD_INDEX_PATH, DOWNLOADS_DIR
+from loguru import logger
+
+# 索引键: (平台, 视频ID, 格式ID)
+IndexKey = Tuple[str, str, str]
+
+class DownloadIndex:
+    """已下载文件索引
+
+    记录(平台, 视频ID, 格式ID)对应的下载文件，相同视频和格式再次下载时直接复用。
+    索引保存在JSON文件中，写入时整体替换；多个worker共享同一文件时，
+    每次读写前按修改时间重新加载。文件被删除或大小变化的条目在读取时丢弃。
+    所有方法都是同步阻塞的，调用方应在线程池中执行。
+    """
+
+    def __init__(self, path: Path = DOWNLOAD_INDEX_PATH, root: Path = DOWNLOADS_DIR):
+        self._path = path
+        self._root = root
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(key: IndexKey) -> str:
+        return ":".join(key)
+
+    def _reload(self):
+        """索引文件被其他进程修改过时重新加载"""
+        try:
+            mtime = self._path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            self._entries = json.loads(self._path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning(f"下载索引无法解析，已重建: {str(e)}")
+            self._entries = {}
+        self._mtime = mtime
+
+    def _save(self):
+        """写入临时文件后原子替换，读取方不会看到写了一半的索引"""
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self._entries, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self._path)
+        self._mtime = self._path.stat().st_mtime
+
+    def get(self, key: IndexKey) -> Optional[Path]:
+        """
+        查找已下载的文件
+
+        Args:
+            key: (平台, 视频ID, 格式ID)
+
+        Returns:
+            文件路径，不存在或已失效时返回None
+        """
+        with self._lock:
+            self._reload()
+            entry = self._entries.get(self._key(key))
+            if entry is None:
+                self.misses += 1
+                return None
+
+            path = self._root / entry['file']
+            try:
+                valid = path.stat().st_size == entry['size']
+            except FileNotFoundError:
+                valid = False
+            if not valid:
+                del self._entries[self._key(key)]
+                self._save()
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return path
+
+    def put(self, key: IndexKey, path: Path, client_id: Optional[str] = None):
+        """
+        记录下载完成的文件
+
+        Args:
+            key: (平台, 视频ID, 格式ID)
+            path: 下载目录中的文件路径
+            client_id: 发起下载的客户端ID，用于统计客户端的存储用量
+        """
+        with self._lock:
+            self._reload()
+            self._entries[self._key(key)] = {
+                'file': path.relative_to(self._root).as_posix(),
+                'size': path.stat().st_size,
+                'created_at': time.time(),
+                'client': client_id,
+            }
+            self._save()
+
+    def discard_file(self, path: Path) -> int:
+        """
+        删除指向某个文件的所有条目（文件被清理时调用）
+
+        Returns:
+            删除的条目数
+        """
+        with self._lock:
+            self._reload()
+            name = path.relative_to(self._root).as_posix()
+            keys = [key for key, entry in self._entries.items() if entry['file'] == name]
+            for key in keys:
+                del self._entries[key]
+            if keys:
+                self._save()
+            return len(keys)
+
+    def get_client_files(self, client_id: str) -> Dict[Path, int]:
+        """
+        获取客户端下载的文件
+
+        Returns:
+            文件路径到登记大小的映射
+        """
+        with self._lock:
+            self._reload()
+            return {
+                self._root / entry['file']: entry['size']
+                for entry in self._entries.values()
+                if entry.get('client') == client_id
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计"""
+        with self._lock:
+            self._reload()
+            return {
+                'path': str(self._path),
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
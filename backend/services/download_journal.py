@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+from ..config import DOWNLOAD_JOURNAL_PATH, JOURNAL_RESUME_LEASE
+
+if TYPE_CHECKING:
+    from .download_manager import DownloadSession
+
+class DownloadJournal:
+    """未完成下载任务的日志
+
+    任务加入队列时写入，结束（完成、失败或取消）时删除；服务停止或异常退出时留下的记录
+    在重启后重新入队。每个任务的临时目录是固定的（见job_temp_dir），重新执行时yt-dlp
+    从其中的.part文件继续下载，不必从头开始。
+
+    所有方法都是同步阻塞的，调用方在线程池中执行。
+    """
+
+    def __init__(self, path: Path = DOWNLOAD_JOURNAL_PATH):
+        self._path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟打开数据库，首次使用时才创建文件"""
+        if self._conn is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self._path),
+                timeout=30,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS journal ("
+                " session_id TEXT PRIMARY KEY,"
+                " url TEXT NOT NULL,"
+                " format_id TEXT,"
+                " audio_format TEXT,"
+                " client_id TEXT,"
+                " priority TEXT NOT NULL,"
+                " temp_dir TEXT NOT NULL,"
+                " bytes_done INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " claimed_at REAL)"
+            )
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(journal)")}
+            if 'claimed_at' not in columns:
+                # 旧版本创建的日志
+                conn.execute("ALTER TABLE journal ADD COLUMN claimed_at REAL")
+            self._conn = conn
+        return self._conn
+
+    def record(self, session: "DownloadSession", temp_dir: Path):
+        """
+        记录新加入队列的任务
+
+        Args:
+            session: 下载会话
+            temp_dir: 任务的临时目录
+        """
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO journal (session_id, url, format_id, audio_format, client_id, priority, "
+                "temp_dir, bytes_done, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                (session.session_id, session.url, session.format_id, session.audio_format,
+                 session.client_id, session.priority, str(temp_dir), now, now)
+            )
+
+    def update_progress(self, session_id: str, bytes_done: int):
+        """记录任务已下载的字节数，并清除恢复时的认领"""
+        with self._lock:
+            self._connect().execute(
+                "UPDATE journal SET bytes_done = ?, updated_at = ?, claimed_at = NULL WHERE session_id = ?",
+                (bytes_done, time.time(), session_id)
+            )
+
+    def claim(self, session_id: str) -> bool:
+        """
+        恢复任务前独占地认领记录，租约JOURNAL_RESUME_LEASE秒
+        
+        多个worker同时启动时都会读到同一条记录，只有认领成功的一个重新入队；任务开始下载后
+        第一次写入进度时租约即被清除，之后再次中断的任务可以立即被恢复。
+        
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            是否认领成功
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._connect().execute(
+                "UPDATE journal SET claimed_at = ? WHERE session_id = ? AND (claimed_at IS NULL OR claimed_at < ?)",
+                (now, session_id, now - JOURNAL_RESUME_LEASE)
+            )
+        return cursor.rowcount == 1
+
+    def remove(self, session_id: str):
+        """任务结束后删除记录"""
+        with self._lock:
+            self._connect().execute("DELETE FROM journal WHERE session_id = ?", (session_id,))
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """所有未完成的任务，按加入顺序"""
+        with self._lock:
+            rows = self._connect().execute("SELECT * FROM journal ORDER BY created_at").fetchall()
+        return [dict(row) for row in rows]
+
+    def temp_dirs(self) -> Set[str]:
+        """未完成任务的临时目录名，清理临时文件时不视为残留"""
+        with self._lock:
+            rows = self._connect().execute("SELECT temp_dir FROM journal").fetchall()
+        return {Path(row['temp_dir']).name for row in rows}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取未完成任务数和已下载的字节数"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT COUNT(*) AS jobs, COALESCE(SUM(bytes_done), 0) AS bytes_done FROM journal"
+            ).fetchone()
+        return {'jobs': row['jobs'], 'bytes_done': row['bytes_done']}
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,16 +1,45 @@
 import asyncio
-from typing import Dict, Optional, Set
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
 from datetime import datetime
 from pathlib import Path
-from ..utils.error_utils import DownloadError
-from ..config import MAX_CONCURRENT_DOWNLOADS
+from ..utils.error_utils import DownloadError, DownloadCancelledError
+from ..utils.file_utils import job_temp_dir
+from ..config import (
+    DOWNLOAD_PRIORITIES,
+    DEFAULT_DOWNLOAD_PRIORITY,
+    AUDIO_FORMATS,
+    JOURNAL_FLUSH_INTERVAL,
+    DOWNLOAD_SHUTDOWN_TIMEOUT
+)
+from .job_backend import JobBackend, create_job_backend
+from .download_journal import DownloadJournal
 from loguru import logger
 
+# 进度回调类型
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
 class DownloadSession:
     """下载会话类"""
-    def __init__(self, url: str, session_id: str):
+    def __init__(
+        self,
+        url: str,
+        session_id: str,
+        format_id: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        client_id: Optional[str] = None,
+        priority: str = DEFAULT_DOWNLOAD_PRIORITY,
+        audio_format: Optional[str] = None
+    ):
         self.url = url
         self.session_id = session_id
+        self.format_id = format_id
+        self.progress_callback = progress_callback
+        self.client_id = client_id
+        self.priority = priority
+        # 仅音频下载的输出格式，为空时下载视频
+        self.audio_format = audio_format
         self.start_time = datetime.now()
         self.progress = 0
         self.speed = 0
@@ -18,18 +47,28 @@ class DownloadSession:
         self.status = "pending"
         self.error = None
         self.file_path: Optional[Path] = None
+        # 最近一次推送的事件，用于客户端重连后恢复状态
+        self.last_event: Optional[Dict[str, Any]] = None
         self._task: Optional[asyncio.Task] = None
+        # 取消标志，由下载线程中的进度钩子检查
+        self.cancel_event = threading.Event()
+        # 与取消标志同时完成的future，等待下载的协程据此立即结束；由下载处理器取走会话时创建
+        self.cancel_waiter: Optional[asyncio.Future] = None
+        
+    def owned_by(self, client_id: str) -> bool:
+        """会话是否由该客户端发起；没有记录客户端的会话不属于任何客户端"""
+        return self.client_id is not None and self.client_id == client_id
         
     @property
     def is_active(self) -> bool:
         """会话是否活跃"""
-        return self.status in ("pending", "downloading")
+        return self.status in ("pending", "downloading", "cancelling")
         
     def update_progress(self, downloaded: int, total: int, speed: float, eta: int):
         """更新下载进度"""
         self.progress = (downloaded / total * 100) if total else 0
-        self.speed = speed
-        self.eta = eta
+        self.speed = speed or 0
+        self.eta = eta or 0
         
     def complete(self, file_path: Path):
         """完成下载"""
@@ -41,9 +80,40 @@ class DownloadSession:
         """下载失败"""
         self.status = "failed"
         self.error = error
+        
+    def cancelled(self):
+        """下载已取消"""
+        self.status = "cancelled"
+        
+    def request_cancel(self):
+        """请求停止下载：置位取消标志并完成cancel_waiter"""
+        self.cancel_event.set()
+        if self.cancel_waiter is not None and not self.cancel_waiter.done():
+            self.cancel_waiter.set_result(None)
+        
+    def snapshot(self, position: int = 0) -> Dict[str, Any]:
+        """
+        获取会话当前状态的快照，格式与推送的事件一致
+        
+        Args:
+            position: 等待中的会话的排队位置
+        """
+        if self.last_event is not None and self.last_event.get('status') != 'queued':
+            return dict(self.last_event)
+        if self.is_active:
+            # 等待中或刚开始下载、尚未收到进度
+            return {'session_id': self.session_id, 'status': 'queued', 'position': position}
+        return {'session_id': self.session_id, 'status': self.status}
 
 class DownloadManager:
-    """下载管理器"""
+    """下载管理器
+
+    会话、等待队列和下载名额保存在任务后端（JOB_BACKEND）中。使用SQLite后端时，
+    多个worker共享同一个队列，任一worker都可以开始、查询或取消任意会话。
+
+    未结束的任务另外记录在下载任务日志中：服务停止时进行中的下载保存断点后放回队列，
+    异常退出或重启后，日志中的任务在启动时重新入队，从部分下载的文件继续。
+    """
     _instance = None
     
     def __new__(cls):
@@ -54,72 +124,251 @@ class DownloadManager:
         
     def __init__(self):
         if not self._initialized:
-            self._sessions: Dict[str, DownloadSession] = {}
-            self._active_downloads: Set[str] = set()
-            self._download_queue = asyncio.Queue()
-            self._lock = asyncio.Lock()
+            self._backend: JobBackend = create_job_backend()
+            # 本进程正在执行的下载，用于响应其他进程发起的取消
+            self._running: Dict[str, DownloadSession] = {}
+            self._processor_task: Optional[asyncio.Task] = None
+            self._journal = DownloadJournal()
+            self._resumed = False
+            self._suspending = False
+            self._backend.add_listener(self._on_session_event)
             self._initialized = True
             
-    async def create_session(self, url: str, session_id: str) -> DownloadSession:
+    def add_listener(self, listener: ProgressCallback):
+        """
+        注册会话事件监听器，所有会话（包括其他worker上的会话）的排队、进度和结果都会通知给它
+        
+        排队位置的变化以一个合并的positions事件通知，见_notify_queue_positions。
+        """
+        self._backend.add_listener(listener)
+        
+    async def start(self):
+        """启动任务后端和下载处理器，首次启动时恢复下载任务日志中未完成的任务"""
+        if self._processor_task is None or self._processor_task.done():
+            self._suspending = False
+            await self._backend.start()
+            if not self._resumed:
+                self._resumed = True
+                await self.resume_interrupted()
+            self._processor_task = asyncio.create_task(self._process_downloads())
+            
+    async def resume_interrupted(self) -> int:
+        """
+        将下载任务日志中被中断的任务重新加入队列
+        
+        仍在等待或下载中（可能由其他worker执行）的任务不处理；会话已不存在（内存后端重启）
+        或因worker退出被标记为失败的任务以原会话ID重新入队，客户端重连后仍能找到它们。
+        每条记录先在任务日志中认领，多个worker同时启动时只有一个会恢复它。
+        
+        Returns:
+            重新入队的任务数
+        """
+        loop = asyncio.get_running_loop()
+        resumed = 0
+        for entry in await loop.run_in_executor(None, self._journal.entries):
+            session_id = entry['session_id']
+            existing = await self._backend.get_session(session_id)
+            if existing is not None and existing.is_active:
+                continue
+            if existing is not None and existing.status != "failed":
+                # 已完成或已取消，日志记录是残留的
+                await loop.run_in_executor(None, self._journal.remove, session_id)
+                continue
+            if not await loop.run_in_executor(None, self._journal.claim, session_id):
+                # 其他worker已经认领了这条记录
+                continue
+            if existing is not None:
+                await self._backend.remove_session(session_id)
+                
+            session = DownloadSession(
+                entry['url'],
+                session_id,
+                format_id=entry['format_id'],
+                client_id=entry['client_id'],
+                priority=entry['priority'],
+                audio_format=entry['audio_format']
+            )
+            try:
+                await self._backend.add_session(session)
+            except DownloadError:
+                # 其他worker刚刚恢复了同一任务
+                continue
+            resumed += 1
+            logger.info(f"恢复未完成的下载: {entry['url']}（已下载 {entry['bytes_done']} 字节）")
+            
+        if resumed:
+            await self._notify_queue_positions()
+        return resumed
+            
+    async def create_session(
+        self,
+        url: str,
+        session_id: str,
+        format_id: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        client_id: Optional[str] = None,
+        priority: str = DEFAULT_DOWNLOAD_PRIORITY,
+        audio_format: Optional[str] = None
+    ) -> DownloadSession:
         """
-        创建下载会话
+        创建下载会话并加入下载队列
+        
+        下载只会由下载处理器启动，调用方通过监听器或progress_callback接收排队位置、进度和结果。
+        progress_callback只在会话由本进程执行时有效。
         
         Args:
             url: 视频URL
             session_id: 会话ID
+            format_id: 可选的格式ID
+            progress_callback: 进度回调函数
+            client_id: 发起下载的客户端ID
+            priority: 优先级，取值见DOWNLOAD_PRIORITIES
+            audio_format: 仅音频下载的输出格式，取值见AUDIO_FORMATS；为空时下载视频
             
         Returns:
             下载会话对象
         """
-        async with self._lock:
-            if session_id in self._sessions:
-                raise DownloadError("会话ID已存在")
-                
-            session = DownloadSession(url, session_id)
-            self._sessions[session_id] = session
-            await self._download_queue.put(session)
+        if priority not in DOWNLOAD_PRIORITIES:
+            raise DownloadError(f"不支持的下载优先级: {priority}")
+        if audio_format is not None and audio_format not in AUDIO_FORMATS:
+            raise DownloadError(f"不支持的音频格式: {audio_format}")
             
-            # 启动下载处理器（如果尚未启动）
-            if not hasattr(self, '_processor_task'):
-                self._processor_task = asyncio.create_task(self._process_downloads())
-                
-            return session
+        session = DownloadSession(url, session_id, format_id, progress_callback, client_id, priority, audio_format)
+        await self._backend.add_session(session)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._journal.record, session, job_temp_dir(session_id))
+        
+        # 启动下载处理器（如果尚未启动）
+        await self.start()
+        return session
             
-    def get_session(self, session_id: str) -> Optional[DownloadSession]:
+    async def get_session(self, session_id: str) -> Optional[DownloadSession]:
         """获取下载会话"""
-        return self._sessions.get(session_id)
+        return await self._backend.get_session(session_id)
+        
+    async def get_client_sessions(self, client_id: str) -> List[DownloadSession]:
+        """获取指定客户端发起的所有会话"""
+        return await self._backend.get_client_sessions(client_id)
+        
+    async def get_snapshot(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """获取会话状态快照，会话不存在时返回None"""
+        session = await self._backend.get_session(session_id)
+        if session is None:
+            return None
+        return session.snapshot(await self._backend.get_queue_position(session_id))
+        
+    async def get_queue_position(self, session_id: str) -> int:
+        """
+        获取会话在等待队列中的位置
+        
+        Returns:
+            从1开始的排队位置，不在队列中时返回0
+        """
+        return await self._backend.get_queue_position(session_id)
         
-    def remove_session(self, session_id: str):
+    async def cancel_session(self, session_id: str, client_id: str) -> str:
+        """
+        取消下载会话
+        
+        等待中的会话立即移出队列并确认取消；正在下载的会话只标记为取消中，
+        执行该下载的worker收到事件后停止下载，待下载线程真正停止后才确认取消并释放下载名额。
+        
+        Args:
+            session_id: 会话ID
+            client_id: 发起取消的客户端ID，只能取消该客户端自己的会话
+            
+        Returns:
+            取消后的会话状态
+            
+        Raises:
+            DownloadError: 会话不存在或无权取消
+        """
+        session = await self._backend.get_session(session_id)
+        if session is None or not session.owned_by(client_id):
+            raise DownloadError("下载会话不存在")
+            
+        if session.status == "pending" and await self._backend.cancel_pending(session_id):
+            await asyncio.get_running_loop().run_in_executor(None, self._journal.remove, session_id)
+            session.cancelled()
+            await self._notify(session, {'status': 'cancelled'})
+            await self._notify_queue_positions()
+            return session.status
+            
+        # 可能刚被下载处理器取走，重新读取状态
+        session = await self._backend.get_session(session_id) or session
+        if session.status == "downloading" and await self._backend.set_cancelling(session_id):
+            session.status = "cancelling"
+            await self._notify(session, {'status': 'cancelling'})
+            
+        return session.status
+        
+    async def remove_session(self, session_id: str):
         """移除下载会话"""
-        if session := self._sessions.pop(session_id, None):
-            if session.session_id in self._active_downloads:
-                self._active_downloads.remove(session.session_id)
+        await self._backend.remove_session(session_id)
+        await asyncio.get_running_loop().run_in_executor(None, self._journal.remove, session_id)
+        
+    async def get_journaled_temp_dirs(self) -> Set[str]:
+        """下载任务日志中未完成任务的临时目录名，这些目录中的部分文件需要保留"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._journal.temp_dirs)
+        
+    async def _on_session_event(self, event: Dict[str, Any]):
+        """会话事件监听器：取消请求可能来自其他worker，由执行下载的进程停止下载"""
+        if event.get('status') == 'cancelling':
+            if session := self._running.get(event['session_id']):
+                session.status = "cancelling"
+                session.request_cancel()
+                
+    async def _notify(self, session: DownloadSession, data: Dict[str, Any]):
+        """通过任务后端通知所有监听器，并调用会话自己的进度回调"""
+        event = {'session_id': session.session_id, **data}
+        await self._backend.publish(session, event)
+        if session.progress_callback:
+            try:
+                await session.progress_callback(event)
+            except Exception as e:
+                logger.error(f"发送下载通知失败: {str(e)}")
                 
+    async def _notify_queue_positions(self):
+        """
+        通知所有等待中的会话其最新的排队位置
+        
+        所有位置合并为一个positions事件（{'status': 'positions', 'positions': {会话ID: 位置}}），
+        任务后端只写入一次，不随队列长度增加写入次数。
+        """
+        pending = await self._backend.get_pending()
+        if not pending:
+            return
+        positions = {session.session_id: position for position, session in enumerate(pending, start=1)}
+        await self._backend.broadcast({'status': 'positions', 'positions': positions})
+        for session in pending:
+            if session.progress_callback:
+                try:
+                    await session.progress_callback({
+                        'session_id': session.session_id,
+                        'status': 'queued',
+                        'position': positions[session.session_id]
+                    })
+                except Exception as e:
+                    logger.error(f"发送下载通知失败: {str(e)}")
+        
     async def _process_downloads(self):
-        """处理下载队列"""
+        """处理下载队列：由任务后端在有任务且有空闲名额时交出下一个会话"""
         while True:
             try:
-                # 检查是否可以开始新的下载
-                if len(self._active_downloads) >= MAX_CONCURRENT_DOWNLOADS:
-                    await asyncio.sleep(1)
-                    continue
-                    
-                # 获取下一个待下载会话
-                session = await self._download_queue.get()
-                
-                if not session.is_active:
-                    self._download_queue.task_done()
-                    continue
-                    
-                # 开始下载
-                self._active_downloads.add(session.session_id)
-                session.status = "downloading"
+                # 获取下一个待下载会话，全局下载名额由后端保证
+                session = await self._backend.claim()
+                session.cancel_waiter = asyncio.get_running_loop().create_future()
+                self._running[session.session_id] = session
                 
                 # 创建下载任务
                 session._task = asyncio.create_task(
                     self._download_video(session)
                 )
+                await self._notify_queue_positions()
                 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"处理下载队列时发生错误: {str(e)}")
                 await asyncio.sleep(1)
@@ -131,42 +380,108 @@ class DownloadManager:
         Args:
             session: 下载会话
         """
+        loop = asyncio.get_running_loop()
+        # 已下载的字节数和上次写入任务日志的时间
+        journal_state = {'bytes': 0, 'flushed': 0.0}
+        
+        async def progress_callback(data: Dict[str, Any]):
+            if data.get('status') == 'downloading':
+                session.update_progress(
+                    data.get('downloaded_bytes') or 0,
+                    data.get('total_bytes') or 0,
+                    data.get('speed'),
+                    data.get('eta')
+                )
+                # 定期把进度写入任务日志
+                journal_state['bytes'] = data.get('downloaded_bytes') or 0
+                now = time.monotonic()
+                if now - journal_state['flushed'] >= JOURNAL_FLUSH_INTERVAL:
+                    journal_state['flushed'] = now
+                    await loop.run_in_executor(
+                        None, self._journal.update_progress, session.session_id, journal_state['bytes']
+                    )
+            await self._notify(session, data)
+            
+        suspended = False
         try:
             from .video_info import VideoInfoService
             
             # 下载视频
-            file_path = await VideoInfoService.download_video(session.url)
+            file_path = await VideoInfoService.download_video(
+                session.url,
+                format_id=session.format_id,
+                progress_callback=progress_callback,
+                cancel_event=session.cancel_event,
+                cancel_waiter=session.cancel_waiter,
+                client_id=session.client_id,
+                audio_format=session.audio_format,
+                job_id=session.session_id
+            )
             
             # 更新会话状态
             session.complete(file_path)
             
+        except DownloadCancelledError:
+            if self._suspending and session.status != "cancelling":
+                # 服务停止导致的中断：保留临时文件和日志记录，放回队列等待继续
+                suspended = True
+            else:
+                # 下载线程已经停止，临时文件已清理
+                session.cancelled()
+                await self._notify(session, {'status': 'cancelled'})
+            
         except Exception as e:
             session.fail(str(e))
             logger.error(f"下载视频时发生错误: {str(e)}")
             
         finally:
-            # 清理会话
-            if session.session_id in self._active_downloads:
-                self._active_downloads.remove(session.session_id)
-            self._download_queue.task_done()
+            self._running.pop(session.session_id, None)
+            if suspended:
+                await loop.run_in_executor(
+                    None, self._journal.update_progress, session.session_id, journal_state['bytes']
+                )
+                session.cancel_event.clear()
+                session.cancel_waiter = None
+                await self._backend.requeue(session)
+            else:
+                # 保存最终状态并释放下载名额
+                await loop.run_in_executor(None, self._journal.remove, session.session_id)
+                await self._backend.release(session)
             
-    def get_active_downloads(self) -> int:
-        """获取当前活跃下载数"""
-        return len(self._active_downloads)
-        
-    def get_queue_size(self) -> int:
-        """获取等待队列大小"""
-        return self._download_queue.qsize()
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取活跃下载数、等待队列大小和任务日志中未完成的任务数"""
+        stats = await self._backend.get_stats()
+        loop = asyncio.get_running_loop()
+        stats['journal'] = await loop.run_in_executor(None, self._journal.get_stats)
+        return stats
         
-    async def cleanup_old_sessions(self, max_age_hours: int = 24):
+    async def cleanup_old_sessions(self, max_age_hours: int = 24) -> int:
         """清理过期会话"""
-        now = datetime.now()
-        to_remove = []
+        return await self._backend.cleanup(max_age_hours)
         
-        for session_id, session in self._sessions.items():
-            age = (now - session.start_time).total_seconds() / 3600
-            if age > max_age_hours and not session.is_active:
-                to_remove.append(session_id)
-                
-        for session_id in to_remove:
-            self.remove_session(session_id) 
\ No newline at end of file
+    async def close(self):
+        """
+        停止下载处理器和任务后端
+        
+        进行中的下载最多等待DOWNLOAD_SHUTDOWN_TIMEOUT秒停止写入，保留的部分文件和任务日志
+        记录用于重启后（或由其他worker）继续下载。
+        """
+        if self._processor_task is not None:
+            self._processor_task.cancel()
+            self._processor_task = None
+            
+        from .video_info import VideoInfoService
+        
+        self._suspending = True
+        running = list(self._running.values())
+        for session in running:
+            session.request_cancel()
+        await VideoInfoService.suspend(DOWNLOAD_SHUTDOWN_TIMEOUT)
+        tasks = [session._task for session in running if session._task is not None]
+        if tasks:
+            await asyncio.wait(tasks, timeout=DOWNLOAD_SHUTDOWN_TIMEOUT)
+        if running:
+            logger.info(f"已中断 {len(running)} 个进行中的下载，重启后继续")
+            
+        await self._backend.close()
+        await asyncio.get_running_loop().run_in_executor(None, self._journal.close)
\ No newline at end of file
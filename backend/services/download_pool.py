@@ -0,0 +1,277 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from ..utils.error_utils import (
+    handle_error,
+    AppError,
+    DownloadError,
+    DownloadCancelledError,
+    ValidationError,
+    VideoError
+)
+from ..config import MAX_CONCURRENT_DOWNLOADS, DOWNLOAD_WORKER_MAX_JOBS, PROGRESS_FLUSH_HZ
+from loguru import logger
+
+# 工作进程发回的错误按类型名还原
+_ERROR_TYPES = {cls.__name__: cls for cls in (VideoError, DownloadError, ValidationError)}
+
+def _error_payload(error: Exception) -> Tuple[str, str, int, Dict[str, Any]]:
+    """
+    在工作进程中把下载异常转换为可以跨进程发送的应用程序错误，转换规则与线程模式一致
+
+    Returns:
+        (错误类型名, 错误信息, 状态码, 详情)
+    """
+    from .video_info import _SizeLimitExceeded
+
+    if isinstance(error, _SizeLimitExceeded):
+        error = DownloadError("视频文件超过大小限制")
+    else:
+        error = handle_error(error)
+    return type(error).__name__, error.message, error.status_code, error.details
+
+def _raise_error(payload: Tuple[str, str, int, Dict[str, Any]]):
+    """在主进程中还原_error_payload转换的错误并抛出"""
+    name, message, status_code, details = payload
+    error_class = _ERROR_TYPES.get(name)
+    if error_class is not None:
+        raise error_class(message, details)
+    raise AppError(message, status_code, details)
+
+def _worker_main(conn: Connection, cancel_flag):
+    """
+    下载工作进程入口：循环接收下载任务，直到收到None或管道关闭
+
+    进度、结果和错误都通过管道发回主进程，消息格式为(类型, 内容)。
+    """
+    from .video_info import _run_download, _DownloadAborted
+
+    interval = 1.0 / PROGRESS_FLUSH_HZ if PROGRESS_FLUSH_HZ > 0 else 0.0
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+
+        url, format_id, temp_file, connections = job
+        last = {'status': None, 'time': 0.0}
+
+        def report(data: Dict[str, Any]):
+            # 跨进程只发送节流后的进度，状态变化立即发送
+            now = time.monotonic()
+            if data['status'] == last['status'] and now - last['time'] < interval:
+                return
+            last['status'], last['time'] = data['status'], now
+            conn.send(('progress', data))
+
+        try:
+            info = _run_download(url, format_id, Path(temp_file), report, cancel_flag.is_set, connections)
+            conn.send(('result', info))
+        except _DownloadAborted:
+            conn.send(('cancelled', None))
+        except Exception as e:
+            conn.send(('error', _error_payload(e)))
+
+class _WorkerCrashed(Exception):
+    """工作进程在任务执行过程中退出"""
+
+class _Worker:
+    """一个下载工作进程及其管道和取消标志"""
+
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.cancel_flag = ctx.Event()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.cancel_flag),
+            name="download-worker",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self, timeout: float = 5):
+        """通知进程退出，超时后强制结束"""
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+        self.conn.close()
+
+class DownloadWorkerPool:
+    """下载工作进程池
+
+    yt-dlp的下载、解析和后处理有大量Python代码，在Web服务进程的线程池中执行时会与
+    请求处理争用GIL。启用DOWNLOAD_USE_PROCESSES后下载在独立的工作进程中执行：
+
+    - 每个进程同时只执行一个下载，进度经管道发回并由主进程节流后推送
+    - 进程异常退出只会让它正在执行的任务失败，下一次任务会启动新进程
+    - 每个进程执行DOWNLOAD_WORKER_MAX_JOBS个任务后退出并替换，限制内存增长
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            self._size = MAX_CONCURRENT_DOWNLOADS
+            self._max_jobs = DOWNLOAD_WORKER_MAX_JOBS
+            # 服务进程中有多个线程，使用spawn避免fork带来的锁状态问题
+            self._ctx = multiprocessing.get_context("spawn")
+            self._semaphore = asyncio.Semaphore(self._size)
+            self._idle: List[_Worker] = []
+            self._busy = 0
+            self._lock = threading.Lock()
+            self._metrics = {
+                'spawned': 0,
+                'recycled': 0,
+                'crashed': 0,
+                'completed': 0,
+                'failed': 0,
+                'cancelled': 0,
+            }
+            self._initialized = True
+
+    def _acquire_worker(self) -> _Worker:
+        """取出一个空闲进程，没有时启动新进程"""
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.conn.close()
+            self._metrics['spawned'] += 1
+        return _Worker(self._ctx)
+
+    def _release_worker(self, worker: _Worker):
+        """任务结束后放回空闲列表，达到任务上限时退出进程"""
+        if worker.jobs >= self._max_jobs:
+            with self._lock:
+                self._metrics['recycled'] += 1
+            worker.stop()
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    @staticmethod
+    def _pump(
+        worker: _Worker,
+        report: Callable[[Dict[str, Any]], None],
+        is_cancelled: Callable[[], bool]
+    ) -> Tuple[str, Any]:
+        """
+        在线程中读取工作进程的消息，转发进度和取消请求，直到收到任务结果
+
+        Raises:
+            _WorkerCrashed: 工作进程在返回结果前退出
+        """
+        while True:
+            if is_cancelled():
+                worker.cancel_flag.set()
+            try:
+                if worker.conn.poll(0.1):
+                    kind, payload = worker.conn.recv()
+                    if kind == 'progress':
+                        report(payload)
+                        continue
+                    return kind, payload
+            except (EOFError, OSError):
+                raise _WorkerCrashed(worker.process.exitcode)
+            if not worker.process.is_alive() and not worker.conn.poll():
+                raise _WorkerCrashed(worker.process.exitcode)
+
+    async def run(
+        self,
+        url: str,
+        format_id: Optional[str],
+        temp_file: Path,
+        report: Callable[[Dict[str, Any]], None],
+        is_cancelled: Callable[[], bool],
+        connections: int = 1
+    ) -> Optional[Dict[str, Any]]:
+        """
+        在工作进程中下载视频到临时文件
+
+        Args:
+            url: 视频URL
+            format_id: 可选的格式ID
+            temp_file: 临时文件路径
+            report: 进度回调（在读取线程中调用，需线程安全）
+            is_cancelled: 返回True时中止下载（在读取线程中调用）
+            connections: DASH/HLS格式并行下载的分片数
+
+        Returns:
+            下载结果，见_run_download
+
+        Raises:
+            DownloadCancelledError: 下载被取消
+            VideoError: 视频相关错误
+            DownloadError: 下载失败、超过大小限制或工作进程异常退出
+            AppError: 其他错误，与线程模式下经handle_error转换的结果一致
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            worker = await loop.run_in_executor(None, self._acquire_worker)
+            worker.cancel_flag.clear()
+            self._busy += 1
+            try:
+                worker.conn.send((url, format_id, str(temp_file), connections))
+                kind, payload = await loop.run_in_executor(None, self._pump, worker, report, is_cancelled)
+            except (_WorkerCrashed, BrokenPipeError) as e:
+                with self._lock:
+                    self._metrics['crashed'] += 1
+                logger.error(f"下载工作进程异常退出(exitcode={worker.process.exitcode}): {url}")
+                await loop.run_in_executor(None, worker.stop, 0)
+                raise DownloadError("下载进程异常退出") from e
+            except asyncio.CancelledError:
+                # 读取线程仍在等待，无法确定进程状态，直接结束该进程
+                worker.cancel_flag.set()
+                await asyncio.shield(loop.run_in_executor(None, worker.stop, 1))
+                raise
+            finally:
+                self._busy -= 1
+
+            worker.jobs += 1
+            await loop.run_in_executor(None, self._release_worker, worker)
+
+        if kind == 'result':
+            self._metrics['completed'] += 1
+            return payload
+        if kind == 'cancelled':
+            self._metrics['cancelled'] += 1
+            raise DownloadCancelledError("下载已取消")
+        self._metrics['failed'] += 1
+        _raise_error(payload)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取进程池指标"""
+        with self._lock:
+            return {
+                'size': self._size,
+                'max_jobs': self._max_jobs,
+                'busy': self._busy,
+                'idle': len(self._idle),
+                **self._metrics
+            }
+
+    def shutdown(self):
+        """退出所有空闲的工作进程"""
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.stop()
@@ -0,0 +1,87 @@
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Deque, Dict, Iterator, List, Optional
+from ..config import DOWNLOAD_PRIORITIES
+
+if TYPE_CHECKING:
+    from .download_manager import DownloadSession
+
+class FairDownloadQueue:
+    """公平下载等待队列
+
+    先按优先级（DOWNLOAD_PRIORITIES中靠前的优先）选择，同一优先级内按客户端轮转，
+    每个客户端每轮只出队一个任务，单个客户端排入大量任务也不会让其他客户端饿死。
+    """
+
+    def __init__(self, priorities: List[str] = DOWNLOAD_PRIORITIES):
+        self._priorities = list(priorities)
+        # 优先级 -> (客户端ID -> 该客户端的等待会话)
+        self._queues: Dict[str, "OrderedDict[str, Deque[DownloadSession]]"] = {
+            priority: OrderedDict() for priority in self._priorities
+        }
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _owner(session: "DownloadSession") -> str:
+        """轮转的单位，没有客户端ID的会话各自独立"""
+        return session.client_id or session.session_id
+
+    def push(self, session: "DownloadSession"):
+        """加入等待队列"""
+        clients = self._queues[session.priority]
+        clients.setdefault(self._owner(session), deque()).append(session)
+        self._size += 1
+
+    def pop(self) -> Optional["DownloadSession"]:
+        """取出下一个应当开始的会话"""
+        for priority in self._priorities:
+            clients = self._queues[priority]
+            if not clients:
+                continue
+            owner, sessions = next(iter(clients.items()))
+            session = sessions.popleft()
+            if sessions:
+                # 本轮已服务过的客户端移到末尾
+                clients.move_to_end(owner)
+            else:
+                del clients[owner]
+            self._size -= 1
+            return session
+        return None
+
+    def remove(self, session_id: str) -> Optional["DownloadSession"]:
+        """从等待队列中移除指定会话"""
+        for clients in self._queues.values():
+            for owner, sessions in clients.items():
+                for session in sessions:
+                    if session.session_id == session_id:
+                        sessions.remove(session)
+                        if not sessions:
+                            del clients[owner]
+                        self._size -= 1
+                        return session
+        return None
+
+    def __iter__(self) -> Iterator["DownloadSession"]:
+        """按预计出队顺序遍历等待中的会话"""
+        for priority in self._priorities:
+            queues = list(self._queues[priority].values())
+            depth = max((len(q) for q in queues), default=0)
+            for round_index in range(depth):
+                for sessions in queues:
+                    if round_index < len(sessions):
+                        yield sessions[round_index]
+
+    def position(self, session_id: str) -> int:
+        """
+        获取会话的排队位置
+
+        Returns:
+            从1开始的排队位置，不在队列中时返回0
+        """
+        for position, session in enumerate(self, start=1):
+            if session.session_id == session_id:
+                return position
+        return 0
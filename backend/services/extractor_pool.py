@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from ..utils.error_utils import ServiceBusyError
+from ..config import (
+    EXTRACTOR_MAX_WORKERS,
+    EXTRACTOR_MAX_QUEUE,
+    EXTRACTOR_TIMEOUT,
+    EXTRACTOR_USE_PROCESSES
+)
+from loguru import logger
+
+class ExtractorPool:
+    """元数据提取执行器
+
+    yt-dlp的extract_info是同步阻塞调用，统一放到这个有界的线程池（或进程池）中执行，
+    避免阻塞事件循环。排队数量超过上限时直接拒绝，由路由层返回503。
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            self._max_workers = EXTRACTOR_MAX_WORKERS
+            self._max_pending = EXTRACTOR_MAX_WORKERS + EXTRACTOR_MAX_QUEUE
+            self._timeout = EXTRACTOR_TIMEOUT
+            self._use_processes = EXTRACTOR_USE_PROCESSES
+            self._executor: Optional[Executor] = None
+            # 计数器会在工作线程的回调中修改，因此使用线程锁
+            self._lock = threading.Lock()
+            self._in_flight = 0
+            self._metrics = {
+                'submitted': 0,
+                'completed': 0,
+                'failed': 0,
+                'rejected': 0,
+                'timed_out': 0,
+                'total_time': 0.0,
+                'max_time': 0.0,
+            }
+            self._initialized = True
+
+    def _get_executor(self) -> Executor:
+        """延迟创建执行器"""
+        if self._executor is None:
+            if self._use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self._max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="extractor"
+                )
+        return self._executor
+
+    def _on_done(self, started: float, future):
+        """底层任务结束时释放名额并记录指标"""
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self._metrics['failed'] += 1
+            else:
+                self._metrics['completed'] += 1
+            self._metrics['total_time'] += elapsed
+            self._metrics['max_time'] = max(self._metrics['max_time'], elapsed)
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """
+        在提取执行器中运行同步函数
+
+        Args:
+            func: 要执行的函数（进程池模式下必须可被pickle）
+            *args: 函数参数
+            timeout: 超时时间(秒)，默认使用EXTRACTOR_TIMEOUT
+
+        Returns:
+            函数返回值
+
+        Raises:
+            ServiceBusyError: 排队已满或执行超时
+        """
+        with self._lock:
+            if self._in_flight >= self._max_pending:
+                self._metrics['rejected'] += 1
+                raise ServiceBusyError("视频信息提取繁忙，请稍后重试")
+            self._in_flight += 1
+            self._metrics['submitted'] += 1
+
+        started = time.monotonic()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        # 名额在底层任务真正结束时才释放，超时的线程仍然计入排队深度
+        future.add_done_callback(lambda f: self._on_done(started, f))
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout=timeout or self._timeout
+            )
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self._metrics['timed_out'] += 1
+            logger.warning(f"视频信息提取超时: {func.__name__}")
+            raise ServiceBusyError("获取视频信息超时，请稍后重试")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取执行器指标"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            finished = metrics['completed'] + metrics['failed']
+            metrics['avg_time'] = metrics['total_time'] / finished if finished else 0.0
+            metrics['in_flight'] = self._in_flight
+            metrics['max_workers'] = self._max_workers
+            metrics['max_pending'] = self._max_pending
+            metrics['mode'] = 'process' if self._use_processes else 'thread'
+        return metrics
+
+    def shutdown(self):
+        """关闭执行器"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
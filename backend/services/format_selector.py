@@ -0,0 +1,137 @@
+from itertools import chain
+from typing import Dict, Iterable, Optional, Tuple
+from ..models.video import VideoInfo, VideoFormat, FormatConstraints, FormatSelection
+from ..models.format_index import FormatIndex, IndexedFormat, COMBINED, VIDEO_ONLY, AUDIO_ONLY
+from ..utils.error_utils import VideoError
+
+# 视频扩展名可以无损合并的音频扩展名
+_COMPATIBLE_AUDIO = {
+    'mp4': ('m4a', 'mp4'),
+    'webm': ('webm',),
+}
+
+def _best_audio(index: FormatIndex, constraints: FormatConstraints) -> Dict[Optional[str], IndexedFormat]:
+    """
+    按视频扩展名找出可合并的最佳音频（比特率最高）
+
+    Returns:
+        视频扩展名到音频的映射；键None为不限容器时的最佳音频
+    """
+    best: Dict[Optional[str], IndexedFormat] = {}
+    # by_tbr按比特率升序，后面的覆盖前面的
+    for entry in index.by_tbr(AUDIO_ONLY):
+        for video_ext, audio_exts in _COMPATIBLE_AUDIO.items():
+            if entry.format.ext in audio_exts:
+                best[video_ext] = entry
+        best[None] = entry
+    if constraints.container:
+        # 指定容器时只能合并兼容的音频
+        return {ext: audio for ext, audio in best.items() if ext is not None}
+    return best
+
+def select_format(video_info: VideoInfo, constraints: FormatConstraints) -> FormatSelection:
+    """
+    按条件选择最佳格式
+
+    候选为音视频组合格式以及（允许合并时）配上最佳兼容音频的仅视频格式。指定max_height时
+    先用索引二分取出不超过该高度的格式（及无法解析高度的格式）排序；其中没有满足其余条件的
+    格式时，才在高于max_height的格式中取最低分辨率。每组候选逐个过滤并计算排序键，
+    一次遍历取最大值。排序依次比较：
+
+    1. 分辨率（高于max_height时越低越好）
+    2. 编码偏好
+    3. 帧率
+    4. 是否无需合并
+    5. 总比特率
+
+    Args:
+        video_info: 视频信息
+        constraints: 选择条件
+
+    Returns:
+        选择结果
+
+    Raises:
+        VideoError: 没有满足条件的格式
+    """
+    index = video_info.format_index
+    duration = video_info.duration
+    max_height = constraints.max_height
+    container = constraints.container.lower() if constraints.container else None
+    # 编码偏好越靠前分数越高，不在列表中的为0
+    codec_rank = {codec.lower(): len(constraints.codecs) - i for i, codec in enumerate(constraints.codecs)}
+    audio_by_ext = _best_audio(index, constraints) if constraints.allow_merge else {}
+    format_types = (COMBINED, VIDEO_ONLY) if constraints.allow_merge else (COMBINED,)
+
+    def pick(candidates: Iterable[IndexedFormat], prefer_low: bool):
+        best: Optional[Tuple[tuple, IndexedFormat, Optional[IndexedFormat], Optional[int]]] = None
+        for entry in candidates:
+            if container and entry.format.ext != container:
+                continue
+
+            audio = None
+            if entry.type == VIDEO_ONLY:
+                audio = audio_by_ext.get(entry.format.ext) or audio_by_ext.get(None)
+                if audio is None:
+                    continue
+
+            size = entry.format.estimate_size(duration)
+            if audio is not None and size is not None:
+                audio_size = audio.format.estimate_size(duration)
+                size = size + audio_size if audio_size is not None else None
+            if constraints.max_bytes and size is not None and size > constraints.max_bytes:
+                continue
+
+            height = entry.height or 0
+            key = (
+                -height if prefer_low else height,
+                codec_rank.get(entry.vcodec, 0),
+                entry.format.fps or 0,
+                audio is None,
+                entry.tbr + (audio.tbr if audio is not None else 0),
+            )
+            if best is None or key > best[0]:
+                best = (key, entry, audio, size)
+        return best
+
+    if max_height is None:
+        best = pick(chain.from_iterable(index.by_type(t) for t in format_types), False)
+    else:
+        best = pick(chain.from_iterable(
+            chain(index.at_most(t, max_height), index.without_height(t)) for t in format_types
+        ), False)
+        if best is None:
+            best = pick(chain.from_iterable(index.above(t, max_height) for t in format_types), True)
+
+    if best is None:
+        raise VideoError("没有满足条件的视频格式")
+
+    _, video, audio, size = best
+    return FormatSelection(
+        format_id=f"{video.format.format_id}+{audio.format.format_id}" if audio else video.format.format_id,
+        video=video.format,
+        audio=audio.format if audio else None,
+        height=video.height,
+        estimated_size=size
+    )
+
+def select_audio(video_info: VideoInfo, codec: Optional[str] = None) -> Optional[VideoFormat]:
+    """
+    选择仅音频下载使用的格式
+
+    优先选择编码族为codec的音频中比特率最高的一个（输出时只需重新封装），
+    没有时选择比特率最高的音频。
+
+    Args:
+        video_info: 视频信息
+        codec: 期望的音频编码族，如"aac"、"opus"；为空时不限编码
+
+    Returns:
+        音频格式，视频没有仅音频格式时返回None
+    """
+    index = video_info.format_index
+    best = None
+    for entry in index.by_tbr(AUDIO_ONLY):
+        if codec is None or entry.acodec == codec or best is None or best.acodec != codec:
+            best = entry
+    return best.format if best else None
@@ -0,0 +1,745 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Set
+from .download_queue import FairDownloadQueue
+from ..utils.error_utils import DownloadError
+from ..config import (
+    JOB_BACKEND,
+    JOB_BACKEND_PATH,
+    JOB_POLL_INTERVAL,
+    JOB_LEASE_TTL,
+    JOB_EVENT_RETENTION,
+    MAX_CONCURRENT_DOWNLOADS,
+    DOWNLOAD_PRIORITIES
+)
+from loguru import logger
+
+if TYPE_CHECKING:
+    from .download_manager import DownloadSession
+
+# 会话事件监听器类型
+EventListener = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# 占用下载名额的会话状态
+ACTIVE_STATUSES = ("downloading", "cancelling")
+
+class JobBackend:
+    """下载任务后端基类
+
+    保存下载会话、等待队列和下载名额，并把会话事件分发给所有监听器。
+    DownloadManager只通过该接口访问共享状态，替换实现即可在多个进程间共享下载队列。
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._listeners: List[EventListener] = []
+
+    def add_listener(self, listener: EventListener):
+        """注册会话事件监听器"""
+        self._listeners.append(listener)
+
+    async def _dispatch(self, event: Dict[str, Any]):
+        """把事件交给本进程的所有监听器"""
+        for listener in list(self._listeners):
+            try:
+                await listener(event)
+            except Exception as e:
+                logger.error(f"发送下载通知失败: {str(e)}")
+
+    async def start(self):
+        """启动后台任务"""
+
+    async def close(self):
+        """停止后台任务并释放资源"""
+
+    async def add_session(self, session: "DownloadSession"):
+        """保存会话并加入等待队列"""
+        raise NotImplementedError
+
+    async def claim(self) -> "DownloadSession":
+        """等待直到有可以开始的会话且全局下载名额未满，占用名额并返回该会话"""
+        raise NotImplementedError
+
+    async def release(self, session: "DownloadSession"):
+        """保存会话的最终状态并释放下载名额"""
+        raise NotImplementedError
+
+    async def requeue(self, session: "DownloadSession"):
+        """释放下载名额并把被中断的会话放回等待队列，之后由任一worker继续下载"""
+        raise NotImplementedError
+
+    async def publish(self, session: "DownloadSession", event: Dict[str, Any]):
+        """记录会话的最新事件并通知所有监听器"""
+        raise NotImplementedError
+
+    async def broadcast(self, event: Dict[str, Any]):
+        """通知所有监听器一个不属于单个会话的事件（如所有等待会话的排队位置），只写入一次"""
+        raise NotImplementedError
+
+    async def get_session(self, session_id: str) -> Optional["DownloadSession"]:
+        """获取会话"""
+        raise NotImplementedError
+
+    async def get_client_sessions(self, client_id: str) -> List["DownloadSession"]:
+        """获取指定客户端发起的所有会话"""
+        raise NotImplementedError
+
+    async def get_pending(self) -> List["DownloadSession"]:
+        """按预计开始顺序获取等待中的会话"""
+        raise NotImplementedError
+
+    async def get_queue_position(self, session_id: str) -> int:
+        """
+        获取会话的排队位置
+
+        Returns:
+            从1开始的排队位置，不在队列中时返回0
+        """
+        for position, session in enumerate(await self.get_pending(), start=1):
+            if session.session_id == session_id:
+                return position
+        return 0
+
+    async def cancel_pending(self, session_id: str) -> bool:
+        """如果会话仍在等待，将其移出队列并标记为已取消"""
+        raise NotImplementedError
+
+    async def set_cancelling(self, session_id: str) -> bool:
+        """如果会话正在下载，将其标记为取消中"""
+        raise NotImplementedError
+
+    async def remove_session(self, session_id: str):
+        """移除会话"""
+        raise NotImplementedError
+
+    async def cleanup(self, max_age_hours: float) -> int:
+        """
+        清理已结束的过期会话
+
+        Returns:
+            清理的会话数
+        """
+        raise NotImplementedError
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取活跃下载数和等待队列大小"""
+        raise NotImplementedError
+
+class MemoryJobBackend(JobBackend):
+    """进程内的任务后端，状态保存在普通字典中，只适用于单个worker"""
+
+    name = "memory"
+
+    def __init__(self, max_active: int = MAX_CONCURRENT_DOWNLOADS):
+        super().__init__()
+        self._max_active = max_active
+        self._sessions: Dict[str, "DownloadSession"] = {}
+        self._active: Set[str] = set()
+        self._queue = FairDownloadQueue()
+        # 有新任务入队或下载名额释放时唤醒等待中的claim
+        self._condition = asyncio.Condition()
+
+    def _can_dispatch(self) -> bool:
+        """是否有等待的任务且有空闲的下载名额"""
+        return len(self._queue) > 0 and len(self._active) < self._max_active
+
+    async def add_session(self, session: "DownloadSession"):
+        async with self._condition:
+            if session.session_id in self._sessions:
+                raise DownloadError("会话ID已存在")
+            self._sessions[session.session_id] = session
+            self._queue.push(session)
+            self._condition.notify_all()
+
+    async def claim(self) -> "DownloadSession":
+        async with self._condition:
+            while True:
+                await self._condition.wait_for(self._can_dispatch)
+                session = self._queue.pop()
+                if not session.is_active:
+                    continue
+                self._active.add(session.session_id)
+                session.status = "downloading"
+                return session
+
+    async def release(self, session: "DownloadSession"):
+        async with self._condition:
+            self._active.discard(session.session_id)
+            self._condition.notify_all()
+
+    async def requeue(self, session: "DownloadSession"):
+        async with self._condition:
+            self._active.discard(session.session_id)
+            session.status = "pending"
+            self._queue.push(session)
+            self._condition.notify_all()
+
+    async def publish(self, session: "DownloadSession", event: Dict[str, Any]):
+        session.last_event = event
+        await self._dispatch(event)
+
+    async def broadcast(self, event: Dict[str, Any]):
+        await self._dispatch(event)
+
+    async def get_session(self, session_id: str) -> Optional["DownloadSession"]:
+        return self._sessions.get(session_id)
+
+    async def get_client_sessions(self, client_id: str) -> List["DownloadSession"]:
+        return [session for session in self._sessions.values() if session.client_id == client_id]
+
+    async def get_pending(self) -> List["DownloadSession"]:
+        return list(self._queue)
+
+    async def get_queue_position(self, session_id: str) -> int:
+        return self._queue.position(session_id)
+
+    async def cancel_pending(self, session_id: str) -> bool:
+        async with self._condition:
+            session = self._sessions.get(session_id)
+            if session is None or session.status != "pending":
+                return False
+            self._queue.remove(session_id)
+            session.cancelled()
+            return True
+
+    async def set_cancelling(self, session_id: str) -> bool:
+        session = self._sessions.get(session_id)
+        if session is None or session.status != "downloading":
+            return False
+        session.status = "cancelling"
+        return True
+
+    async def remove_session(self, session_id: str):
+        async with self._condition:
+            if session := self._sessions.pop(session_id, None):
+                self._active.discard(session.session_id)
+                self._queue.remove(session.session_id)
+                self._condition.notify_all()
+
+    async def cleanup(self, max_age_hours: float) -> int:
+        now = datetime.now()
+        to_remove = [
+            session_id for session_id, session in self._sessions.items()
+            if not session.is_active
+            and (now - session.start_time).total_seconds() / 3600 > max_age_hours
+        ]
+        for session_id in to_remove:
+            await self.remove_session(session_id)
+        return len(to_remove)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'active': len(self._active),
+            'queued': len(self._queue),
+            'sessions': len(self._sessions),
+        }
+
+class SqliteJobBackend(JobBackend):
+    """基于SQLite的任务后端，同一主机上的多个worker进程共享同一个数据库文件
+
+    - 占用名额在BEGIN IMMEDIATE事务中完成，MAX_CONCURRENT_DOWNLOADS对所有worker生效
+    - 排队顺序与FairDownloadQueue一致：先按优先级，同一优先级内按客户端轮转
+    - 会话事件写入events表，各worker轮询后分发给本进程的监听器（本进程的事件直接分发）
+    - 下载中的任务持有租约并定期续约，worker异常退出后租约过期，任务被标记为失败并释放名额
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: Path = JOB_BACKEND_PATH,
+        max_active: int = MAX_CONCURRENT_DOWNLOADS,
+        poll_interval: float = JOB_POLL_INTERVAL,
+        lease_ttl: float = JOB_LEASE_TTL,
+        event_retention: float = JOB_EVENT_RETENTION
+    ):
+        super().__init__()
+        self._path = path
+        self._max_active = max_active
+        self._poll_interval = poll_interval
+        self._lease_ttl = lease_ttl
+        self._event_retention = event_retention
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # 本worker正在下载的会话，需要定期续约
+        self._owned: Set[str] = set()
+        self._last_event_id = 0
+        self._wakeup = asyncio.Event()
+        self._poll_task: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟打开数据库，首次使用时才创建文件"""
+        if self._conn is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self._path),
+                timeout=30,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " session_id TEXT PRIMARY KEY,"
+                " url TEXT NOT NULL,"
+                " format_id TEXT,"
+                " audio_format TEXT,"
+                " client_id TEXT,"
+                " owner TEXT NOT NULL,"
+                " priority TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " status TEXT NOT NULL,"
+                " worker_id TEXT,"
+                " lease_until REAL,"
+                " last_event TEXT,"
+                " error TEXT,"
+                " file_path TEXT,"
+                " created_at REAL NOT NULL)"
+            )
+            # 旧版本创建的表没有audio_format列
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'audio_format' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN audio_format TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, priority)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_client ON jobs (client_id)")
+            # 每个有等待任务的客户端的轮转顺序，turn越小越先被服务
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS owners ("
+                " priority TEXT NOT NULL,"
+                " owner TEXT NOT NULL,"
+                " turn INTEGER NOT NULL,"
+                " PRIMARY KEY (priority, owner))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " worker_id TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('tick', 0)")
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, func, *args):
+        """在线程池中执行同步的数据库操作"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    @staticmethod
+    def _next_tick(conn: sqlite3.Connection) -> int:
+        """递增的全局序号，用于入队顺序和客户端轮转"""
+        conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'tick'")
+        return conn.execute("SELECT value FROM counters WHERE name = 'tick'").fetchone()[0]
+
+    @staticmethod
+    def _drop_owner_if_idle(conn: sqlite3.Connection, priority: str, owner: str):
+        """客户端在该优先级下已没有等待任务时移出轮转"""
+        remaining = conn.execute(
+            "SELECT 1 FROM jobs WHERE priority = ? AND owner = ? AND status = 'pending' LIMIT 1",
+            (priority, owner)
+        ).fetchone()
+        if remaining is None:
+            conn.execute("DELETE FROM owners WHERE priority = ? AND owner = ?", (priority, owner))
+
+    @staticmethod
+    def _row_to_session(row: sqlite3.Row) -> "DownloadSession":
+        from .download_manager import DownloadSession
+
+        session = DownloadSession(
+            row['url'],
+            row['session_id'],
+            format_id=row['format_id'],
+            client_id=row['client_id'],
+            priority=row['priority'],
+            audio_format=row['audio_format']
+        )
+        session.status = row['status']
+        session.error = row['error']
+        session.file_path = Path(row['file_path']) if row['file_path'] else None
+        session.last_event = json.loads(row['last_event']) if row['last_event'] else None
+        session.start_time = datetime.fromtimestamp(row['created_at'])
+        return session
+
+    def _add_session(self, session: "DownloadSession"):
+        owner = FairDownloadQueue._owner(session)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                tick = self._next_tick(conn)
+                conn.execute(
+                    "INSERT INTO jobs (session_id, url, format_id, audio_format, client_id, owner, priority, seq, status, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?)",
+                    (session.session_id, session.url, session.format_id, session.audio_format, session.client_id,
+                     owner, session.priority, tick, time.time())
+                )
+                conn.execute(
+                    "INSERT OR IGNORE INTO owners (priority, owner, turn) VALUES (?, ?, ?)",
+                    (session.priority, owner, tick)
+                )
+                conn.execute("COMMIT")
+            except sqlite3.IntegrityError:
+                conn.execute("ROLLBACK")
+                raise DownloadError("会话ID已存在")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def add_session(self, session: "DownloadSession"):
+        await self._run(self._add_session, session)
+        self._wakeup.set()
+
+    def _reap_expired(self, conn: sqlite3.Connection):
+        """结束租约已过期（所属worker已退出）的下载"""
+        now = time.time()
+        rows = conn.execute(
+            "SELECT session_id, status FROM jobs WHERE status IN ('downloading', 'cancelling') AND lease_until < ?",
+            (now,)
+        ).fetchall()
+        for row in rows:
+            if row['status'] == 'cancelling':
+                status, event = 'cancelled', {'session_id': row['session_id'], 'status': 'cancelled'}
+            else:
+                status, event = 'failed', {'session_id': row['session_id'], 'status': 'error', 'error': '下载进程已退出'}
+            data = json.dumps(event)
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, last_event = ?, worker_id = NULL, lease_until = NULL "
+                "WHERE session_id = ?",
+                (status, event.get('error'), data, row['session_id'])
+            )
+            # 空worker_id的事件会分发给所有worker
+            conn.execute(
+                "INSERT INTO events (worker_id, data, created_at) VALUES ('', ?, ?)",
+                (data, now)
+            )
+            logger.warning(f"下载任务租约过期: {row['session_id']}")
+
+    def _try_claim(self) -> Optional[sqlite3.Row]:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._reap_expired(conn)
+                active = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN ('downloading', 'cancelling')"
+                ).fetchone()[0]
+                row = None
+                if active < self._max_active:
+                    for priority in DOWNLOAD_PRIORITIES:
+                        row = conn.execute(
+                            "SELECT j.* FROM jobs j JOIN owners o ON o.priority = j.priority AND o.owner = j.owner "
+                            "WHERE j.status = 'pending' AND j.priority = ? ORDER BY o.turn, j.seq LIMIT 1",
+                            (priority,)
+                        ).fetchone()
+                        if row is not None:
+                            break
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'downloading', worker_id = ?, lease_until = ? WHERE session_id = ?",
+                        (self.worker_id, time.time() + self._lease_ttl, row['session_id'])
+                    )
+                    # 本轮已服务过的客户端排到末尾
+                    conn.execute(
+                        "UPDATE owners SET turn = ? WHERE priority = ? AND owner = ?",
+                        (self._next_tick(conn), row['priority'], row['owner'])
+                    )
+                    self._drop_owner_if_idle(conn, row['priority'], row['owner'])
+                    self._owned.add(row['session_id'])
+                conn.execute("COMMIT")
+                return row
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def claim(self) -> "DownloadSession":
+        while True:
+            self._wakeup.clear()
+            row = await self._run(self._try_claim)
+            if row is not None:
+                session = self._row_to_session(row)
+                session.status = "downloading"
+                return session
+            # 其他worker释放的名额只能通过轮询发现
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _release(self, session: "DownloadSession"):
+        with self._lock:
+            self._owned.discard(session.session_id)
+            self._connect().execute(
+                "UPDATE jobs SET status = ?, error = ?, file_path = ?, worker_id = NULL, lease_until = NULL "
+                "WHERE session_id = ?",
+                (session.status, session.error,
+                 str(session.file_path) if session.file_path else None, session.session_id)
+            )
+
+    async def release(self, session: "DownloadSession"):
+        await self._run(self._release, session)
+        self._wakeup.set()
+
+    def _requeue(self, session: "DownloadSession"):
+        owner = FairDownloadQueue._owner(session)
+        with self._lock:
+            self._owned.discard(session.session_id)
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                tick = self._next_tick(conn)
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', seq = ?, worker_id = NULL, lease_until = NULL "
+                    "WHERE session_id = ?",
+                    (tick, session.session_id)
+                )
+                conn.execute(
+                    "INSERT OR IGNORE INTO owners (priority, owner, turn) VALUES (?, ?, ?)",
+                    (session.priority, owner, tick)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def requeue(self, session: "DownloadSession"):
+        await self._run(self._requeue, session)
+        session.status = "pending"
+        self._wakeup.set()
+
+    def _publish(self, event: Dict[str, Any]):
+        data = json.dumps(event, default=str)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET last_event = ? WHERE session_id = ?",
+                    (data, event['session_id'])
+                )
+                conn.execute(
+                    "INSERT INTO events (worker_id, data, created_at) VALUES (?, ?, ?)",
+                    (self.worker_id, data, time.time())
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def publish(self, session: "DownloadSession", event: Dict[str, Any]):
+        session.last_event = event
+        try:
+            await self._run(self._publish, event)
+        except Exception as e:
+            logger.error(f"写入下载事件失败: {str(e)}")
+        # 本进程的监听器直接分发，不等轮询
+        await self._dispatch(event)
+
+    def _broadcast(self, event: Dict[str, Any]):
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO events (worker_id, data, created_at) VALUES (?, ?, ?)",
+                (self.worker_id, json.dumps(event, default=str), time.time())
+            )
+
+    async def broadcast(self, event: Dict[str, Any]):
+        try:
+            await self._run(self._broadcast, event)
+        except Exception as e:
+            logger.error(f"写入下载事件失败: {str(e)}")
+        await self._dispatch(event)
+
+    def _query_sessions(self, sql: str, params: tuple = ()) -> List["DownloadSession"]:
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [self._row_to_session(row) for row in rows]
+
+    async def get_session(self, session_id: str) -> Optional["DownloadSession"]:
+        sessions = await self._run(self._query_sessions, "SELECT * FROM jobs WHERE session_id = ?", (session_id,))
+        return sessions[0] if sessions else None
+
+    async def get_client_sessions(self, client_id: str) -> List["DownloadSession"]:
+        return await self._run(
+            self._query_sessions,
+            "SELECT * FROM jobs WHERE client_id = ? ORDER BY seq",
+            (client_id,)
+        )
+
+    async def get_pending(self) -> List["DownloadSession"]:
+        sessions = await self._run(
+            self._query_sessions,
+            "SELECT j.* FROM jobs j JOIN owners o ON o.priority = j.priority AND o.owner = j.owner "
+            "WHERE j.status = 'pending' ORDER BY o.turn, j.seq"
+        )
+        # 按轮转顺序放入公平队列，复用其出队顺序的计算
+        queue = FairDownloadQueue()
+        for session in sessions:
+            queue.push(session)
+        return list(queue)
+
+    def _cancel_pending(self, session_id: str) -> bool:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT priority, owner FROM jobs WHERE session_id = ? AND status = 'pending'",
+                    (session_id,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE jobs SET status = 'cancelled' WHERE session_id = ?", (session_id,))
+                    self._drop_owner_if_idle(conn, row['priority'], row['owner'])
+                conn.execute("COMMIT")
+                return row is not None
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def cancel_pending(self, session_id: str) -> bool:
+        return await self._run(self._cancel_pending, session_id)
+
+    def _set_cancelling(self, session_id: str) -> bool:
+        with self._lock:
+            cursor = self._connect().execute(
+                "UPDATE jobs SET status = 'cancelling' WHERE session_id = ? AND status = 'downloading'",
+                (session_id,)
+            )
+            return cursor.rowcount > 0
+
+    async def set_cancelling(self, session_id: str) -> bool:
+        return await self._run(self._set_cancelling, session_id)
+
+    def _remove_session(self, session_id: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT priority, owner FROM jobs WHERE session_id = ?", (session_id,)).fetchone()
+                conn.execute("DELETE FROM jobs WHERE session_id = ?", (session_id,))
+                if row is not None:
+                    self._drop_owner_if_idle(conn, row['priority'], row['owner'])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def remove_session(self, session_id: str):
+        await self._run(self._remove_session, session_id)
+        self._wakeup.set()
+
+    def _cleanup(self, max_age_hours: float) -> int:
+        with self._lock:
+            cursor = self._connect().execute(
+                "DELETE FROM jobs WHERE status IN ('completed', 'failed', 'cancelled') AND created_at < ?",
+                (time.time() - max_age_hours * 3600,)
+            )
+            return cursor.rowcount
+
+    async def cleanup(self, max_age_hours: float) -> int:
+        return await self._run(self._cleanup, max_age_hours)
+
+    def _get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._connect().execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall())
+        return {
+            'backend': self.name,
+            'worker_id': self.worker_id,
+            'active': sum(counts.get(status, 0) for status in ACTIVE_STATUSES),
+            'queued': counts.get('pending', 0),
+            'sessions': sum(counts.values()),
+            'owned': len(self._owned),
+        }
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return await self._run(self._get_stats)
+
+    def _fetch_events(self) -> List[Dict[str, Any]]:
+        """读取其他worker发布的新事件"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id, data FROM events WHERE id > ? AND worker_id != ? ORDER BY id",
+                (self._last_event_id, self.worker_id)
+            ).fetchall()
+            if rows:
+                self._last_event_id = rows[-1]['id']
+        return [json.loads(row['data']) for row in rows]
+
+    def _maintain(self):
+        """为本worker的下载续约，并删除过期事件"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            if self._owned:
+                conn.executemany(
+                    "UPDATE jobs SET lease_until = ? WHERE session_id = ? AND worker_id = ?",
+                    [(now + self._lease_ttl, session_id, self.worker_id) for session_id in self._owned]
+                )
+            conn.execute("DELETE FROM events WHERE created_at < ?", (now - self._event_retention,))
+
+    def _init_cursor(self):
+        with self._lock:
+            self._last_event_id = self._connect().execute(
+                "SELECT COALESCE(MAX(id), 0) FROM events"
+            ).fetchone()[0]
+
+    async def start(self):
+        if self._poll_task is None or self._poll_task.done():
+            await self._run(self._init_cursor)
+            self._poll_task = asyncio.create_task(self._poll_loop())
+
+    async def _poll_loop(self):
+        """轮询其他worker的事件，并定期续约"""
+        last_maintain = 0.0
+        while True:
+            try:
+                for event in await self._run(self._fetch_events):
+                    await self._dispatch(event)
+                if time.monotonic() - last_maintain >= self._lease_ttl / 3:
+                    await self._run(self._maintain)
+                    last_maintain = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"同步下载任务事件失败: {str(e)}")
+            await asyncio.sleep(self._poll_interval)
+
+    async def close(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def create_job_backend(kind: str = JOB_BACKEND) -> JobBackend:
+    """
+    按配置创建任务后端
+
+    Args:
+        kind: "memory"或"sqlite"
+
+    Raises:
+        ValueError: 不支持的后端类型
+    """
+    if kind == "memory":
+        return MemoryJobBackend()
+    if kind == "sqlite":
+        return SqliteJobBackend()
+    raise ValueError(f"不支持的下载任务后端: {kind}")
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from ..config import (
+    TEMP_DIR,
+    MAINTENANCE_TEMP_INTERVAL,
+    MAINTENANCE_SESSION_INTERVAL,
+    MAINTENANCE_RETENTION_INTERVAL,
+    TEMP_FILE_MAX_AGE,
+    ORPHAN_PARTIAL_MAX_AGE,
+    SESSION_MAX_AGE_HOURS,
+    DOWNLOAD_RETENTION
+)
+from .download_manager import DownloadManager
+from .video_info import VideoInfoService
+from loguru import logger
+
+def _entry_usage(entry: os.DirEntry) -> Tuple[float, int]:
+    """临时目录中一项的最近修改时间和大小，下载的独立临时目录按其中的文件计算"""
+    st = entry.stat(follow_symlinks=False)
+    if not entry.is_dir(follow_symlinks=False):
+        return st.st_mtime, st.st_size
+    mtime, size = st.st_mtime, 0
+    with os.scandir(entry.path) as children:
+        for child in children:
+            try:
+                child_st = child.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            mtime = max(mtime, child_st.st_mtime)
+            size += child_st.st_size
+    return mtime, size
+
+def _sweep_temp_dir(temp_dir: Path, active: Set[str]) -> Dict[str, int]:
+    """
+    清理临时目录（同步阻塞，在线程池中执行）
+
+    - 超过TEMP_FILE_MAX_AGE未修改的临时目录或文件一律删除
+    - 不属于进行中下载、超过ORPHAN_PARTIAL_MAX_AGE未修改的视为残留的部分下载删除
+
+    Args:
+        temp_dir: 临时目录
+        active: 进行中下载的独立临时目录名
+
+    Returns:
+        删除的过期项数、残留项数和字节数
+    """
+    result = {'expired': 0, 'orphaned': 0, 'bytes': 0}
+    now = time.time()
+    with os.scandir(temp_dir) as entries:
+        for entry in entries:
+            try:
+                mtime, size = _entry_usage(entry)
+            except FileNotFoundError:
+                continue
+            age = now - mtime
+            if age > TEMP_FILE_MAX_AGE:
+                kind = 'expired'
+            elif entry.name not in active and age > ORPHAN_PARTIAL_MAX_AGE:
+                kind = 'orphaned'
+            else:
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.warning(f"清理临时文件失败 {entry.path}: {str(e)}")
+                continue
+            result[kind] += 1
+            result['bytes'] += size
+    return result
+
+class _MaintenanceTask:
+    """一项定期执行的维护任务及其指标"""
+
+    def __init__(self, name: str, interval: float, run: Callable[[], Awaitable[Dict[str, int]]]):
+        self.name = name
+        self.interval = interval
+        self.run = run
+        self.next_run = 0.0
+        self.metrics: Dict[str, Any] = {
+            'interval': interval,
+            'runs': 0,
+            'failures': 0,
+            'last_started': None,
+            'last_duration': None,
+            'last_result': None,
+            'last_error': None,
+            'totals': {},
+        }
+
+class MaintenanceService:
+    """后台维护服务
+
+    在事件循环中按各自的间隔执行维护任务，文件系统扫描都在线程池中进行：
+
+    - temp: 清理过期的临时文件和没有下载在写入的部分下载
+    - sessions: 清理已结束的过期下载会话
+    - retention: 删除超过保留期限的已完成下载
+
+    多worker部署时每个worker都会执行，删除不存在的文件会被忽略。
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            self._tasks = {
+                task.name: task for task in (
+                    _MaintenanceTask('temp', MAINTENANCE_TEMP_INTERVAL, self._sweep_temp),
+                    _MaintenanceTask('sessions', MAINTENANCE_SESSION_INTERVAL, self._cleanup_sessions),
+                    _MaintenanceTask('retention', MAINTENANCE_RETENTION_INTERVAL, self._expire_downloads),
+                )
+            }
+            self._task: Optional[asyncio.Task] = None
+            self._initialized = True
+
+    def start(self):
+        """启动维护循环，启动后立即执行一次所有任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止维护循环"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """按间隔依次执行到期的任务"""
+        while True:
+            now = time.monotonic()
+            for task in self._tasks.values():
+                if task.next_run <= now:
+                    await self._run_task(task)
+                    task.next_run = time.monotonic() + task.interval
+            delay = min(task.next_run for task in self._tasks.values()) - time.monotonic()
+            await asyncio.sleep(max(delay, 1.0))
+
+    async def _run_task(self, task: _MaintenanceTask):
+        """执行一项任务并记录本次执行的指标，任务失败不影响其他任务"""
+        metrics = task.metrics
+        metrics['runs'] += 1
+        metrics['last_started'] = datetime.now().isoformat()
+        started = time.monotonic()
+        try:
+            result = await task.run()
+            metrics['last_result'] = result
+            metrics['last_error'] = None
+            for key, value in result.items():
+                metrics['totals'][key] = metrics['totals'].get(key, 0) + value
+            if any(result.values()):
+                logger.info(f"维护任务 {task.name} 完成: {result}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics['failures'] += 1
+            metrics['last_error'] = str(e)
+            logger.error(f"维护任务 {task.name} 失败: {str(e)}")
+        finally:
+            metrics['last_duration'] = round(time.monotonic() - started, 3)
+
+    async def _sweep_temp(self) -> Dict[str, int]:
+        """清理临时文件，跳过本进程进行中的下载和任务日志中等待继续的下载"""
+        active = VideoInfoService._storage.active_temp_dirs() | await DownloadManager().get_journaled_temp_dirs()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, _sweep_temp_dir, TEMP_DIR, active)
+
+    async def _cleanup_sessions(self) -> Dict[str, int]:
+        """清理已结束的过期下载会话，并重新入队因worker退出而中断的任务"""
+        manager = DownloadManager()
+        return {
+            'sessions': await manager.cleanup_old_sessions(SESSION_MAX_AGE_HOURS),
+            'resumed': await manager.resume_interrupted(),
+        }
+
+    async def _expire_downloads(self) -> Dict[str, int]:
+        """删除最近一次使用超过保留期限的已完成下载"""
+        if DOWNLOAD_RETENTION <= 0:
+            return {'files': 0, 'bytes': 0}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, VideoInfoService._storage.expire, DOWNLOAD_RETENTION)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各维护任务的执行指标"""
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'tasks': {name: task.metrics for name, task in self._tasks.items()},
+        }
@@ -0,0 +1,143 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from ..models.video import VideoInfo
+from ..config import (
+    METADATA_CACHE_TTL,
+    METADATA_CACHE_MAX_ENTRIES,
+    METADATA_CACHE_MAX_BYTES
+)
+
+# 缓存键: (视频ID, 平台)
+CacheKey = Tuple[str, str]
+
+class _CacheEntry:
+    """缓存条目"""
+    __slots__ = ('value', 'size', 'expires_at')
+
+    def __init__(self, value: VideoInfo, size: int, expires_at: float):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+class MetadataCache:
+    """视频元数据缓存
+
+    以extract_video_id得到的(视频ID, 平台)为键，同一视频的watch/shorts/youtu.be
+    等不同链接共享一个条目。条目按TTL过期，并按条目数和近似字节数做LRU淘汰。
+    只在事件循环中使用，不需要加锁。
+    """
+
+    def __init__(
+        self,
+        ttl: float = METADATA_CACHE_TTL,
+        max_entries: int = METADATA_CACHE_MAX_ENTRIES,
+        max_bytes: int = METADATA_CACHE_MAX_BYTES
+    ):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, _CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _estimate_size(video_info: VideoInfo) -> int:
+        """估算条目占用的字节数（以JSON序列化长度近似）"""
+        return len(video_info.model_dump_json())
+
+    def get(self, key: CacheKey) -> Optional[VideoInfo]:
+        """
+        获取缓存的视频信息
+
+        Args:
+            key: (视频ID, 平台)
+
+        Returns:
+            命中时返回VideoInfo，否则返回None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def put(self, key: CacheKey, video_info: VideoInfo, ttl: Optional[float] = None):
+        """
+        写入缓存
+
+        Args:
+            key: (视频ID, 平台)
+            video_info: 视频信息
+            ttl: 可选的过期时间(秒)，默认使用缓存的TTL
+        """
+        size = self._estimate_size(video_info)
+        if size > self._max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        expires_at = time.monotonic() + (self._ttl if ttl is None else ttl)
+        self._entries[key] = _CacheEntry(video_info, size, expires_at)
+        self._total_bytes += size
+        self._evict()
+
+    def invalidate(self, key: CacheKey) -> bool:
+        """
+        使指定条目失效
+
+        Returns:
+            条目是否存在
+        """
+        if key in self._entries:
+            self._remove(key)
+            return True
+        return False
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._total_bytes = 0
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size
+
+    def _evict(self):
+        """按LRU顺序淘汰，直到条目数和字节数都在限制内"""
+        while self._entries and (
+            len(self._entries) > self._max_entries
+            or self._total_bytes > self._max_bytes
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._total_bytes,
+            'max_entries': self._max_entries,
+            'max_bytes': self._max_bytes,
+            'ttl': self._ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
@@ -0,0 +1,204 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from ..models.video import VideoInfo
+from ..config import (
+    METADATA_STORE_PATH,
+    METADATA_STORE_TTL,
+    METADATA_STORE_MAX_BYTES,
+    METADATA_STORE_COMPACT_EVERY
+)
+from loguru import logger
+
+# 存储键: (视频ID, 平台)
+StoreKey = Tuple[str, str]
+
+class MetadataStore:
+    """视频元数据持久化存储
+
+    基于SQLite，保存序列化后的VideoInfo（含全部VideoFormat）及其获取时间，
+    使提取结果在服务重启后仍然可用。所有方法都是同步阻塞的，
+    调用方应在线程池中执行。
+    """
+
+    def __init__(
+        self,
+        path: Path = METADATA_STORE_PATH,
+        ttl: float = METADATA_STORE_TTL,
+        max_bytes: int = METADATA_STORE_MAX_BYTES,
+        compact_every: int = METADATA_STORE_COMPACT_EVERY
+    ):
+        self._path = path
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        self._compact_every = compact_every
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes_since_compact = 0
+        self.reads = 0
+        self.hits = 0
+        self.writes = 0
+        self.compactions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟打开数据库，首次使用时才创建文件"""
+        if self._conn is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self._path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS video_info ("
+                " video_id TEXT NOT NULL,"
+                " platform TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " PRIMARY KEY (video_id, platform))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_video_info_fetched_at "
+                "ON video_info (fetched_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: StoreKey) -> Optional[Tuple[VideoInfo, float]]:
+        """
+        读取视频信息
+
+        Args:
+            key: (视频ID, 平台)
+
+        Returns:
+            (VideoInfo, 获取时间戳)，不存在或已过期时返回None
+        """
+        with self._lock:
+            self.reads += 1
+            row = self._connect().execute(
+                "SELECT data, fetched_at FROM video_info "
+                "WHERE video_id = ? AND platform = ?",
+                key
+            ).fetchone()
+            if row is None:
+                return None
+            data, fetched_at = row
+            if time.time() - fetched_at > self._ttl:
+                return None
+            self.hits += 1
+
+        try:
+            return VideoInfo.model_validate_json(data), fetched_at
+        except Exception as e:
+            logger.warning(f"持久化的视频信息无法解析，已忽略: {key}: {str(e)}")
+            self.delete(key)
+            return None
+
+    def put(self, key: StoreKey, video_info: VideoInfo, fetched_at: Optional[float] = None):
+        """
+        写入视频信息
+
+        Args:
+            key: (视频ID, 平台)
+            video_info: 视频信息
+            fetched_at: 获取时间戳，默认为当前时间
+        """
+        data = video_info.model_dump_json()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO video_info "
+                "(video_id, platform, data, size, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (key[0], key[1], data, len(data), fetched_at or time.time())
+            )
+            conn.commit()
+            self.writes += 1
+            self._writes_since_compact += 1
+            need_compact = self._writes_since_compact >= self._compact_every
+
+        if need_compact:
+            self.compact()
+
+    def delete(self, key: StoreKey) -> bool:
+        """删除视频信息"""
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "DELETE FROM video_info WHERE video_id = ? AND platform = ?",
+                key
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def compact(self) -> Dict[str, int]:
+        """
+        压缩存储：删除过期记录，超过容量上限时按获取时间从旧到新删除，
+        直到总大小降到上限的80%，最后回收数据库文件空间
+
+        Returns:
+            删除的过期记录数和淘汰记录数
+        """
+        with self._lock:
+            conn = self._connect()
+            expired = conn.execute(
+                "DELETE FROM video_info WHERE fetched_at < ?",
+                (time.time() - self._ttl,)
+            ).rowcount
+
+            evicted = 0
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM video_info"
+            ).fetchone()[0]
+            if total > self._max_bytes:
+                target = int(self._max_bytes * 0.8)
+                to_delete = []
+                for video_id, platform, size in conn.execute(
+                    "SELECT video_id, platform, size FROM video_info ORDER BY fetched_at"
+                ):
+                    if total <= target:
+                        break
+                    to_delete.append((video_id, platform))
+                    total -= size
+                conn.executemany(
+                    "DELETE FROM video_info WHERE video_id = ? AND platform = ?",
+                    to_delete
+                )
+                evicted = len(to_delete)
+            conn.commit()
+
+            if expired or evicted:
+                conn.execute("VACUUM")
+            self._writes_since_compact = 0
+            self.compactions += 1
+
+        if expired or evicted:
+            logger.info(f"元数据存储压缩完成: 过期 {expired} 条, 淘汰 {evicted} 条")
+        return {'expired': expired, 'evicted': evicted}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计"""
+        with self._lock:
+            entries, total = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM video_info"
+            ).fetchone()
+        return {
+            'path': str(self._path),
+            'entries': entries,
+            'bytes': total,
+            'max_bytes': self._max_bytes,
+            'ttl': self._ttl,
+            'reads': self.reads,
+            'hits': self.hits,
+            'writes': self.writes,
+            'compactions': self.compactions,
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
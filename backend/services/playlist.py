@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Set
+import yt_dlp
+from .video_info import VideoInfoService
+from ..utils.error_utils import handle_error, format_error_response, VideoError
+from ..utils.url_utils import (
+    extract_collection_id,
+    validate_video_url,
+    build_video_url
+)
+from ..config import PLAYLIST_MAX_ENTRIES, PLAYLIST_MAX_CONCURRENT
+from loguru import logger
+
+# 展开播放列表的专用线程池，避免长时间的分页请求占满提取执行器
+_enumerator_pool = ThreadPoolExecutor(
+    max_workers=PLAYLIST_MAX_CONCURRENT,
+    thread_name_prefix="playlist"
+)
+# 进行中的展开的停止标志，服务停止时全部置位
+_active_stops: Set[threading.Event] = set()
+
+def _canonical_collection_url(url: str, collection_id: str, kind: str, platform: str) -> str:
+    """将合集URL规范化为yt-dlp可直接分页展开的地址"""
+    if platform == 'youtube':
+        if kind == 'playlist':
+            return f"https://www.youtube.com/playlist?list={collection_id}"
+        # 频道首页在flat模式下返回的是各个标签页，直接展开"视频"标签页
+        return f"https://www.youtube.com/{collection_id}/videos"
+    if platform == 'bilibili':
+        return f"https://space.bilibili.com/{collection_id}/video"
+    return url
+
+def _enumerate_collection(
+    url: str,
+    max_entries: int,
+    emit: Callable[[Dict[str, Any]], None],
+    stop: threading.Event
+):
+    """
+    同步展开合集，每发现一个条目立即通过emit回调输出
+
+    使用extract_flat和lazy_playlist，只请求列表页而不解析每个视频的格式，
+    第一页返回后就能输出条目，无需等待整个列表解析完毕。
+
+    Args:
+        url: 规范化后的合集URL
+        max_entries: 最多输出的条目数
+        emit: 输出回调（在工作线程中调用）
+        stop: 置位时提前停止展开
+    """
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': 'in_playlist',
+        'lazy_playlist': True,
+        'playlistend': max_entries,
+        'ignoreerrors': True,
+        'no_color': True
+    }
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+        # 跟随重定向类型的结果，直到得到真正的列表
+        for _ in range(3):
+            if not info or info.get('_type') not in ('url', 'url_transparent'):
+                break
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+
+        if not info or info.get('_type') != 'playlist':
+            raise VideoError("无法展开播放列表或频道")
+
+        emit({
+            'type': 'playlist',
+            'id': info.get('id'),
+            'title': info.get('title'),
+            'uploader': info.get('uploader') or info.get('channel'),
+        })
+
+        entries = info.get('entries') or []
+        for index, entry in enumerate(itertools.islice(entries, max_entries), start=1):
+            if stop.is_set():
+                break
+            if not entry or not entry.get('id'):
+                continue
+            emit({
+                'type': 'entry',
+                'index': index,
+                'video_id': entry.get('id'),
+                'url': entry.get('url'),
+                'title': entry.get('title'),
+                'duration': entry.get('duration'),
+            })
+
+class PlaylistService:
+    """播放列表和频道服务类"""
+
+    @staticmethod
+    def shutdown():
+        """停止所有进行中的展开并关闭展开线程池"""
+        for stop in list(_active_stops):
+            stop.set()
+        _enumerator_pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    async def iter_collection(
+        url: str,
+        resolve: bool = False,
+        concurrency: int = 4,
+        max_entries: int = PLAYLIST_MAX_ENTRIES
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        展开播放列表或频道，按发现顺序流式产出条目
+
+        先用flat模式快速输出条目ID；resolve为True时，每个条目再以有限并行度
+        通过VideoInfoService获取完整信息（共享缓存和请求合并），结果在完成时产出。
+
+        Args:
+            url: 播放列表或频道URL
+            resolve: 是否获取每个条目的完整视频信息
+            concurrency: 获取完整信息的最大并行数
+            max_entries: 最多展开的条目数
+
+        Yields:
+            消息字典，type为playlist/entry/info/error/done
+
+        Raises:
+            ValidationError: URL不是支持的合集地址
+        """
+        collection_id, kind, platform = extract_collection_id(url)
+        target = _canonical_collection_url(url, collection_id, kind, platform)
+        logger.info(f"展开{kind}: {target}")
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        _active_stops.add(stop)
+
+        def emit(item: Dict[str, Any]):
+            if stop.is_set():
+                return
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # 事件循环已关闭
+                stop.set()
+
+        def enumerate_entries():
+            try:
+                _enumerate_collection(target, max_entries, emit, stop)
+            except Exception as e:
+                logger.error(f"展开播放列表失败: {str(e)}")
+                emit({'type': 'error', **format_error_response(handle_error(e))})
+            finally:
+                emit({'type': '_finished'})
+
+        enumerator = loop.run_in_executor(_enumerator_pool, enumerate_entries)
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = set()
+
+        async def resolve_entry(index: int, video_id: str, video_url: str):
+            result = {'type': 'info', 'index': index, 'video_id': video_id}
+            async with semaphore:
+                try:
+                    video_info = await VideoInfoService.get_video_info(video_url)
+                    result.update(success=True, data=video_info.model_dump())
+                except Exception as e:
+                    result.update(success=False, **format_error_response(handle_error(e)))
+            await queue.put(result)
+
+        count = 0
+        pending = 0  # 已启动但结果尚未产出的条目数
+        finished = False
+        try:
+            while not finished or pending:
+                item = await queue.get()
+                if item['type'] == '_finished':
+                    finished = True
+                    continue
+
+                if item['type'] == 'entry':
+                    count += 1
+                    video_url = item['url']
+                    if not video_url or not validate_video_url(video_url)[0]:
+                        video_url = build_video_url(item['video_id'], platform)
+                    item['url'] = video_url
+                    if resolve:
+                        task = asyncio.ensure_future(resolve_entry(item['index'], item['video_id'], video_url))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                        pending += 1
+                elif item['type'] == 'info':
+                    pending -= 1
+                elif item['type'] == 'playlist':
+                    item.update(kind=kind, platform=platform)
+
+                yield item
+
+            yield {'type': 'done', 'count': count}
+        finally:
+            # 客户端断开或展开结束时停止后台工作
+            stop.set()
+            _active_stops.discard(stop)
+            for task in tasks:
+                task.cancel()
+            if not enumerator.done():
+                enumerator.cancel()
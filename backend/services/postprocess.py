@@ -0,0 +1,161 @@
+import asyncio
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+from ..utils.error_utils import DownloadError, DownloadCancelledError
+from ..config import FFMPEG_PATH, POSTPROCESS_MAX_WORKERS
+from loguru import logger
+
+# 输出格式: (扩展名, 编码族, 转码参数)
+_AUDIO_TARGETS = {
+    'm4a': ('m4a', 'aac', ['-c:a', 'aac', '-b:a', '192k']),
+    'opus': ('opus', 'opus', ['-c:a', 'libopus', '-b:a', '128k']),
+    'mp3': ('mp3', 'mp3', ['-c:a', 'libmp3lame', '-q:a', '2']),
+}
+
+def audio_target_codec(audio_format: str) -> Optional[str]:
+    """输出格式对应的编码族，源音频是该编码时只需重新封装"""
+    target = _AUDIO_TARGETS.get(audio_format)
+    return target[1] if target else None
+
+class PostProcessPool:
+    """下载后处理进程池
+
+    音频转换由独立的ffmpeg进程完成，不占用Python线程；同时运行的进程数限制为
+    POSTPROCESS_MAX_WORKERS，超出的任务排队等待。源音频编码与目标一致时只重新封装
+    （-c:a copy），否则转码。服务停止时由shutdown结束所有运行中的ffmpeg进程。
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            self._size = POSTPROCESS_MAX_WORKERS
+            self._semaphore = asyncio.Semaphore(self._size)
+            self._busy = 0
+            self._waiting = 0
+            # 运行中的ffmpeg进程
+            self._processes: Set[asyncio.subprocess.Process] = set()
+            self._closing = False
+            self._metrics = {
+                'remuxed': 0,
+                'transcoded': 0,
+                'failed': 0,
+                'cancelled': 0,
+            }
+            self._initialized = True
+
+    async def convert_audio(
+        self,
+        source: Path,
+        audio_format: str,
+        source_codec: Optional[str],
+        cancelled: asyncio.Event
+    ) -> Path:
+        """
+        将下载的文件转换为指定的音频格式
+
+        Args:
+            source: 下载的文件
+            audio_format: 输出格式，取值见_AUDIO_TARGETS
+            source_codec: 源音频的编码族，用于判断能否只重新封装
+            cancelled: 置位时结束ffmpeg进程
+
+        Returns:
+            输出文件路径（与源文件在同一目录）
+
+        Raises:
+            DownloadCancelledError: 转换期间下载被取消或服务停止
+            DownloadError: 不支持的格式、未安装ffmpeg或转换失败
+        """
+        if audio_format not in _AUDIO_TARGETS:
+            raise DownloadError(f"不支持的音频格式: {audio_format}")
+        ext, codec, encode_args = _AUDIO_TARGETS[audio_format]
+        remux = source_codec == codec
+        output = source.with_name(f"{source.stem}_audio.{ext}")
+        command = [
+            FFMPEG_PATH, '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+            '-i', str(source), '-map', '0:a:0', '-vn',
+            *(['-c:a', 'copy'] if remux else encode_args),
+            str(output)
+        ]
+
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._busy += 1
+        try:
+            if self._closing:
+                self._metrics['cancelled'] += 1
+                raise DownloadCancelledError("服务正在停止")
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *command,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE
+                )
+            except FileNotFoundError:
+                self._metrics['failed'] += 1
+                raise DownloadError("服务器未安装ffmpeg，无法转换音频格式")
+
+            self._processes.add(process)
+            communicate = asyncio.ensure_future(process.communicate())
+            cancel_wait = asyncio.ensure_future(cancelled.wait())
+            try:
+                await asyncio.wait({communicate, cancel_wait}, return_when=asyncio.FIRST_COMPLETED)
+                if not communicate.done():
+                    raise DownloadCancelledError("下载已取消")
+            except BaseException as e:
+                # 取消或出错时结束ffmpeg进程
+                if process.returncode is None:
+                    process.kill()
+                await asyncio.shield(communicate)
+                if isinstance(e, (DownloadCancelledError, asyncio.CancelledError)):
+                    self._metrics['cancelled'] += 1
+                raise
+            finally:
+                cancel_wait.cancel()
+                self._processes.discard(process)
+
+            _, stderr = communicate.result()
+            if process.returncode != 0:
+                if self._closing:
+                    # 进程被shutdown结束
+                    self._metrics['cancelled'] += 1
+                    raise DownloadCancelledError("服务正在停止")
+                self._metrics['failed'] += 1
+                message = stderr.decode(errors='replace').strip().splitlines()
+                logger.error(f"音频转换失败({process.returncode}): {' '.join(message[-3:])}")
+                raise DownloadError("音频转换失败")
+        finally:
+            self._busy -= 1
+            self._semaphore.release()
+
+        self._metrics['remuxed' if remux else 'transcoded'] += 1
+        return output
+
+    async def shutdown(self):
+        """结束所有运行中的ffmpeg进程并等待其退出，之后不再启动新的转换"""
+        self._closing = True
+        processes = list(self._processes)
+        for process in processes:
+            if process.returncode is None:
+                process.kill()
+        if processes:
+            await asyncio.gather(*(process.wait() for process in processes), return_exceptions=True)
+            logger.info(f"已结束 {len(processes)} 个音频转换进程")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取后处理指标"""
+        return {
+            'size': self._size,
+            'busy': self._busy,
+            'waiting': self._waiting,
+            **self._metrics
+        }
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from ..config import PROGRESS_FLUSH_HZ
+from loguru import logger
+
+class ProgressThrottle:
+    """下载进度节流器
+
+    yt-dlp在下载线程中每收到一块数据就调用一次进度钩子。节流器只保留最新的进度，
+    按PROGRESS_FLUSH_HZ的频率在事件循环中调用回调；状态变化（如下载完成进入处理阶段）
+    会立即刷新。每个刷新周期最多只有一次跨线程调度。
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        callback: Callable[[Dict[str, Any]], Awaitable[None]],
+        rate: float = PROGRESS_FLUSH_HZ
+    ):
+        self._loop = loop
+        self._callback = callback
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._latest: Optional[Dict[str, Any]] = None
+        self._last_status: Optional[str] = None
+        self._scheduled = False
+        self._last_flush = 0.0
+        self._delivery: Optional[asyncio.Future] = None
+        self._closed = False
+        self.received = 0  # 收到的进度次数
+        self.flushed = 0  # 实际回调的次数
+
+    def update(self, data: Dict[str, Any]):
+        """
+        记录最新进度（可在任意线程中调用）
+
+        Args:
+            data: 进度数据，必须包含status字段
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self.received += 1
+            self._latest = data
+            state_changed = data.get('status') != self._last_status
+            self._last_status = data.get('status')
+            if self._scheduled and not state_changed:
+                return
+            self._scheduled = True
+            delay = 0.0 if state_changed else max(0.0, self._last_flush + self._interval - time.monotonic())
+
+        try:
+            self._loop.call_soon_threadsafe(self._schedule, delay)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def _schedule(self, delay: float):
+        if delay > 0:
+            self._loop.call_later(delay, self._flush)
+        else:
+            self._flush()
+
+    def _flush(self):
+        """在事件循环中发送最新进度"""
+        with self._lock:
+            data, self._latest = self._latest, None
+            self._scheduled = False
+            self._last_flush = time.monotonic()
+        if data is None:
+            return
+        self.flushed += 1
+        # 串行投递，保证进度按顺序到达
+        self._delivery = asyncio.ensure_future(self._deliver(data, self._delivery))
+
+    async def _deliver(self, data: Dict[str, Any], previous: Optional[asyncio.Future]):
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await self._callback(data)
+        except Exception as e:
+            logger.error(f"进度回调错误: {str(e)}")
+
+    async def close(self):
+        """停止接收进度并等待已记录的进度全部投递，之后再发送的消息不会被旧进度覆盖"""
+        with self._lock:
+            self._closed = True
+        self._flush()
+        if self._delivery is not None:
+            await asyncio.wait([self._delivery])
@@ -0,0 +1,312 @@
+import asyncio
+import itertools
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from ..utils.error_utils import DownloadError, DownloadCancelledError
+from ..config import (
+    DOWNLOADS_DIR,
+    TEMP_DIR,
+    STORAGE_MIN_FREE_BYTES,
+    STORAGE_GLOBAL_QUOTA,
+    STORAGE_CLIENT_QUOTA,
+    STORAGE_DEFAULT_RESERVATION,
+    STORAGE_HIGH_WATERMARK,
+    STORAGE_LOW_WATERMARK,
+    STORAGE_EVICT_MIN_AGE,
+    STORAGE_WAIT_TIMEOUT
+)
+from .download_index import DownloadIndex
+from loguru import logger
+
+# 按inode分组的已完成文件: (最近使用时间, 大小, 所有文件名)
+_FileGroup = Tuple[float, int, List[Path]]
+
+class StorageReservation:
+    """一次下载预留的存储空间"""
+
+    def __init__(self, token: int, client_id: Optional[str], size: int):
+        self.token = token
+        self.client_id = client_id
+        self.size = size
+        # 下载写入的临时文件，已写入的部分不再重复计入磁盘空闲空间的预留
+        self.temp_file: Optional[Path] = None
+
+class StorageManager:
+    """存储准入控制
+
+    下载开始前按估算大小预留空间，放不下的下载等待其他下载结束或空间被释放：
+
+    - 磁盘空闲空间减去进行中下载尚未写入的部分，必须保留STORAGE_MIN_FREE_BYTES
+    - 下载目录用量加上所有预留不超过STORAGE_GLOBAL_QUOTA
+    - 每个客户端已下载的文件（按下载索引统计）加上其预留不超过STORAGE_CLIENT_QUOTA
+    - 用量超过高水位时按最近使用时间淘汰已完成的下载，直到低于低水位
+
+    预留只在本进程内可见；多个worker共享下载目录时，目录用量和空闲空间仍会被正确计入。
+    """
+
+    def __init__(
+        self,
+        index: DownloadIndex,
+        downloads_dir: Path = DOWNLOADS_DIR,
+        temp_dir: Path = TEMP_DIR
+    ):
+        self._index = index
+        self._downloads_dir = downloads_dir
+        self._temp_dir = temp_dir
+        self._reservations: Dict[int, StorageReservation] = {}
+        self._tokens = itertools.count()
+        self._condition = asyncio.Condition()
+        self._waiting = 0
+        self._usage: Dict[str, int] = {}
+        self._stats = {
+            'admitted': 0,
+            'waited': 0,
+            'rejected': 0,
+            'evicted_files': 0,
+            'evicted_bytes': 0,
+        }
+
+    def _scan(self) -> Tuple[int, List[_FileGroup]]:
+        """统计下载目录中已完成文件的用量，硬链接只计算一次"""
+        groups: Dict[Tuple[int, int], _FileGroup] = {}
+        with os.scandir(self._downloads_dir) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                inode = (st.st_dev, st.st_ino)
+                last_used = max(st.st_atime, st.st_mtime)
+                if inode in groups:
+                    used, size, paths = groups[inode]
+                    groups[inode] = (max(used, last_used), size, paths + [Path(entry.path)])
+                else:
+                    groups[inode] = (last_used, st.st_size, [Path(entry.path)])
+        return sum(size for _, size, _ in groups.values()), sorted(groups.values(), key=lambda g: g[0])
+
+    def _written(self, reservation: StorageReservation) -> int:
+        """预留对应的临时目录（含.part和分片）已写入的字节数"""
+        if reservation.temp_file is None:
+            return 0
+        written = 0
+        for path in reservation.temp_file.parent.glob("*"):
+            try:
+                written += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return written
+
+    def _disk_free(self) -> int:
+        """下载目录和临时目录所在磁盘中较小的空闲空间"""
+        return min(
+            shutil.disk_usage(self._downloads_dir).free,
+            shutil.disk_usage(self._temp_dir).free
+        )
+
+    def _evict(self, groups: List[_FileGroup], need: int, only: Optional[Set[Path]] = None) -> int:
+        """
+        按最近使用时间从旧到新淘汰已完成的下载，被淘汰的文件从groups中移除
+
+        Args:
+            groups: _scan返回的文件分组
+            need: 需要释放的字节数
+            only: 只淘汰这些文件（客户端自己的下载）
+
+        Returns:
+            实际释放的字节数
+        """
+        freed = 0
+        now = time.time()
+        for group in list(groups):
+            if freed >= need:
+                break
+            last_used, size, paths = group
+            if now - last_used < STORAGE_EVICT_MIN_AGE:
+                break
+            if only is not None and not any(path in only for path in paths):
+                continue
+            self._remove_group(paths)
+            groups.remove(group)
+            freed += size
+            self._stats['evicted_files'] += len(paths)
+            self._stats['evicted_bytes'] += size
+            logger.info(f"淘汰最近最少使用的下载: {paths[0].name} ({size} 字节)")
+        return freed
+
+    def _remove_group(self, paths: List[Path]):
+        """删除同一文件的所有文件名，并从下载索引中移除"""
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"删除文件失败 {path}: {str(e)}")
+                continue
+            self._index.discard_file(path)
+
+    def expire(self, max_age: float) -> Dict[str, int]:
+        """
+        删除最近一次使用早于max_age秒的已完成下载（同步阻塞，在线程池中执行）
+
+        Returns:
+            删除的文件数和字节数
+        """
+        _, groups = self._scan()
+        now = time.time()
+        result = {'files': 0, 'bytes': 0}
+        for last_used, size, paths in groups:
+            if now - last_used <= max_age:
+                break
+            self._remove_group(paths)
+            result['files'] += len(paths)
+            result['bytes'] += size
+            logger.info(f"删除超过保留期限的下载: {paths[0].name}")
+        return result
+
+    def active_temp_dirs(self) -> Set[str]:
+        """本进程进行中的下载使用的临时目录名"""
+        return {
+            r.temp_file.parent.name for r in list(self._reservations.values())
+            if r.temp_file is not None
+        }
+
+    def _try_admit(
+        self,
+        size: int,
+        client_id: Optional[str],
+        reservations: List[StorageReservation]
+    ) -> Optional[str]:
+        """
+        检查新的预留是否放得下，必要时先淘汰旧文件（同步阻塞，在线程池中执行）
+
+        Returns:
+            放不下的原因，放得下时返回None
+        """
+        usage, groups = self._scan()
+        reserved = sum(r.size for r in reservations)
+        pending = sum(max(0, r.size - self._written(r)) for r in reservations)
+        free = self._disk_free() - pending
+
+        if usage + reserved + size > STORAGE_GLOBAL_QUOTA * STORAGE_HIGH_WATERMARK:
+            freed = self._evict(groups, usage + reserved + size - int(STORAGE_GLOBAL_QUOTA * STORAGE_LOW_WATERMARK))
+            usage -= freed
+            free += freed
+        if free - size < STORAGE_MIN_FREE_BYTES:
+            freed = self._evict(groups, STORAGE_MIN_FREE_BYTES + size - free)
+            usage -= freed
+            free += freed
+        self._usage = {'used_bytes': usage, 'free_bytes': free}
+
+        if usage + reserved + size > STORAGE_GLOBAL_QUOTA:
+            return "下载目录已达存储配额"
+        if free - size < STORAGE_MIN_FREE_BYTES:
+            return "磁盘空间不足"
+
+        if client_id:
+            files = {path: entry_size for path, entry_size in self._index.get_client_files(client_id).items() if path.exists()}
+            client_usage = sum(files.values()) + sum(r.size for r in reservations if r.client_id == client_id)
+            if client_usage + size > STORAGE_CLIENT_QUOTA:
+                client_usage -= self._evict(groups, client_usage + size - STORAGE_CLIENT_QUOTA, set(files))
+            if client_usage + size > STORAGE_CLIENT_QUOTA:
+                return "已超出客户端存储配额"
+        return None
+
+    async def reserve(
+        self,
+        size: Optional[int],
+        client_id: Optional[str],
+        is_cancelled: Callable[[], bool],
+        on_wait: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> StorageReservation:
+        """
+        为下载预留存储空间，放不下时等待
+
+        Args:
+            size: 估算的下载大小，未知时使用STORAGE_DEFAULT_RESERVATION
+            client_id: 发起下载的客户端ID
+            is_cancelled: 等待期间检查下载是否已取消
+            on_wait: 开始等待时调用，参数为等待原因
+
+        Returns:
+            预留，下载结束后必须调用release释放
+
+        Raises:
+            DownloadError: 超过配额或等待超时
+            DownloadCancelledError: 等待期间下载被取消
+        """
+        size = size or STORAGE_DEFAULT_RESERVATION
+        if size > STORAGE_GLOBAL_QUOTA or (client_id and size > STORAGE_CLIENT_QUOTA):
+            self._stats['rejected'] += 1
+            raise DownloadError("视频文件超过存储配额")
+
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + STORAGE_WAIT_TIMEOUT
+        waiting = False
+        async with self._condition:
+            try:
+                while True:
+                    # 持有锁检查，避免并发的预留都认为自己放得下
+                    reason = await loop.run_in_executor(
+                        None, self._try_admit, size, client_id, list(self._reservations.values())
+                    )
+                    if reason is None:
+                        reservation = StorageReservation(next(self._tokens), client_id, size)
+                        self._reservations[reservation.token] = reservation
+                        self._stats['admitted'] += 1
+                        return reservation
+
+                    if not waiting:
+                        waiting = True
+                        self._waiting += 1
+                        self._stats['waited'] += 1
+                        logger.info(f"存储空间不足，下载等待中: {reason}")
+                        if on_wait:
+                            await on_wait(reason)
+                    if is_cancelled():
+                        raise DownloadCancelledError("下载已取消")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['rejected'] += 1
+                        raise DownloadError(f"存储空间不足：{reason}")
+                    # 定期重新检查，空间也可能被其他进程或手动清理释放
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), min(remaining, 1.0))
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                if waiting:
+                    self._waiting -= 1
+
+    async def release(self, reservation: StorageReservation):
+        """释放预留并唤醒等待中的下载"""
+        self._reservations.pop(reservation.token, None)
+        async with self._condition:
+            self._condition.notify_all()
+
+    @staticmethod
+    def touch(path: Path):
+        """记录文件被复用，只更新访问时间，避免被当作最近最少使用的文件淘汰"""
+        try:
+            st = path.stat()
+            # 按纳秒保留修改时间，避免浮点精度损失改变文件的ETag
+            os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+        except OSError as e:
+            logger.warning(f"更新文件访问时间失败 {path}: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取预留、等待和淘汰统计"""
+        return {
+            'reservations': len(self._reservations),
+            'reserved_bytes': sum(r.size for r in self._reservations.values()),
+            'waiting': self._waiting,
+            'global_quota': STORAGE_GLOBAL_QUOTA,
+            'client_quota': STORAGE_CLIENT_QUOTA,
+            **self._usage,
+            **self._stats
+        }
@@ -1,23 +1,351 @@
 import yt_dlp
-from typing import Optional, Callable, Dict, Any, Awaitable
+from typing import Optional, Callable, Dict, Any, Awaitable, Tuple, List, AsyncIterator, Union
 from pathlib import Path
-from ..models.video import VideoInfo, VideoFormat
-from ..utils.file_utils import create_temp_file, move_to_downloads, cleanup_temp_files
-from ..utils.error_utils import handle_error, VideoError, DownloadError
+from ..models.video import VideoInfo, VideoFormat, FormatConstraints, FormatSelection
+from ..models.format_index import parse_resolution, codec_family
+from ..utils.file_utils import (
+    create_temp_file,
+    remove_temp_dir,
+    move_to_downloads,
+    link_or_copy,
+    job_temp_dir,
+    has_partial_files
+)
+from ..utils.error_utils import (
+    handle_error,
+    format_error_response,
+    AppError,
+    VideoError,
+    DownloadError,
+    DownloadCancelledError
+)
 from ..utils.url_utils import validate_video_url, extract_video_id
-from ..config import MAX_FILE_SIZE
+from ..utils.async_utils import SingleFlight
+from ..config import (
+    MAX_FILE_SIZE,
+    DOWNLOAD_USE_PROCESSES,
+    DOWNLOAD_REUSE_MODE,
+    HTTP_CHUNK_SIZE,
+    METADATA_CACHE_ENABLED,
+    METADATA_CACHE_TTL,
+    METADATA_STORE_MODE,
+    METADATA_STORE_TTL
+)
+from .extractor_pool import ExtractorPool
+from .metadata_cache import MetadataCache
+from .metadata_store import MetadataStore
+from .progress import ProgressThrottle
+from .download_pool import DownloadWorkerPool
+from .download_index import DownloadIndex, IndexKey
+from .format_selector import select_format, select_audio
+from .postprocess import PostProcessPool, audio_target_codec
+from .storage_manager import StorageManager, StorageReservation
+from .connection_budget import ConnectionBudget
 from loguru import logger
 import re
+import time
 import asyncio
+import itertools
+import threading
+
+class _DownloadAborted(yt_dlp.utils.DownloadCancelled):
+    """在进度钩子中抛出，用于中止正在进行的yt-dlp下载"""
+    msg = '下载已取消'
+
+class _SizeLimitExceeded(yt_dlp.utils.DownloadCancelled):
+    """已下载或已知的总大小超过MAX_FILE_SIZE时在进度钩子中抛出"""
+    msg = '视频文件超过大小限制'
+
+def _estimate_download_size(video_info: VideoInfo, format_id: Optional[str]) -> Optional[int]:
+    """
+    根据格式元数据估算下载大小
+
+    Args:
+        video_info: 视频信息
+        format_id: 格式ID，可以是"137+140"这样的合并格式；为空时按yt-dlp的'best'，
+            即最后一个音视频组合格式估算
+
+    Returns:
+        估算的字节数，格式无法解析或缺少大小信息时返回None
+    """
+    if format_id:
+        formats = {f.format_id: f for f in video_info.formats}
+        parts = [formats.get(part) for part in format_id.split('+')]
+    else:
+        combined = [f for f in video_info.formats if f.is_combined]
+        parts = combined[-1:]
+    if not parts or None in parts:
+        return None
+
+    sizes = [f.estimate_size(video_info.duration) for f in parts]
+    if None in sizes:
+        return None
+    return sum(sizes)
+
+def _build_video_info(info: Dict[str, Any]) -> VideoInfo:
+    """将yt-dlp返回的信息字典转换为VideoInfo对象"""
+    formats = []
+    for f in info.get('formats', []):
+        # 添加所有格式，包括音频
+        format_note = f.get('format_note', '')
+        if f.get('vcodec') == 'none':
+            format_note = '仅音频'
+        elif f.get('acodec') == 'none':
+            format_note = '仅视频'
+        
+        # 获取分辨率
+        resolution = f.get('resolution', 'unknown')
+        if resolution == 'unknown':
+            width = f.get('width')
+            height = f.get('height')
+            if width and height:
+                resolution = f"{width}x{height}"
+        
+        formats.append(VideoFormat(
+            format_id=f.get('format_id', ''),
+            ext=f.get('ext', ''),
+            resolution=resolution,
+            filesize=f.get('filesize'),
+            filesize_approx=f.get('filesize_approx'),
+            vcodec=f.get('vcodec', ''),
+            acodec=f.get('acodec', ''),
+            format_note=format_note,
+            fps=f.get('fps'),
+            tbr=f.get('tbr')
+        ))
+    
+    if not formats:
+        raise VideoError("未找到任何可用格式")
+    
+    logger.info(f"成功获取到 {len(formats)} 个格式")
+    
+    return VideoInfo(
+        id=info.get('id', ''),
+        title=info.get('title', ''),
+        description=info.get('description'),
+        duration=info.get('duration'),
+        thumbnail=info.get('thumbnail'),
+        uploader=info.get('uploader'),
+        formats=formats
+    )
+
+def _extract_video_info(url: str) -> VideoInfo:
+    """
+    同步提取视频信息，运行在提取执行器中
+
+    定义在模块级别，以便进程池模式下可以被pickle。
+
+    Args:
+        url: 视频URL
+
+    Returns:
+        VideoInfo对象
+
+    Raises:
+        VideoError: 视频相关错误
+    """
+    # 配置yt-dlp选项
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': False,
+        'format': 'best',  # 默认选择最佳质量
+        'youtube_include_dash_manifest': True,  # 包括DASH格式
+        'youtube_include_hls_manifest': True,   # 包括HLS格式
+        'ignoreerrors': True,  # 忽略部分错误继续处理
+        'no_color': True       # 禁用颜色输出
+    }
+    
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        logger.info(f"正在获取视频信息: {url}")
+        try:
+            info = ydl.extract_info(url, download=False)
+        except yt_dlp.utils.DownloadError as e:
+            logger.error(f"yt-dlp下载错误: {str(e)}")
+            raise VideoError(f"获取视频信息失败: {str(e)}")
+        except Exception as e:
+            logger.error(f"获取视频信息时发生未知错误: {str(e)}")
+            raise VideoError("获取视频信息时发生未知错误")
+        
+        if not info:
+            raise VideoError("无法获取视频信息")
+        
+        return _build_video_info(info)
+
+def _run_download(
+    url: str,
+    format_id: Optional[str],
+    temp_file: Path,
+    report: Callable[[Dict[str, Any]], None],
+    is_cancelled: Callable[[], bool],
+    connections: int = 1
+) -> Optional[Dict[str, Any]]:
+    """
+    同步下载视频到临时文件，运行在线程池或下载工作进程中
+
+    定义在模块级别，以便在工作进程中调用。
+
+    Args:
+        url: 视频URL
+        format_id: 可选的格式ID
+        temp_file: 临时文件路径（不含扩展名），扩展名由yt-dlp按实际下载的格式添加
+        report: 进度回调（在下载线程中调用）
+        is_cancelled: 返回True时在下一次进度回调中中止下载
+        connections: DASH/HLS格式并行下载的分片数
+
+    Returns:
+        下载结果（title、ext、acodec，以及实际写入的文件路径filepath），
+        yt-dlp没有返回信息时为None
+
+    Raises:
+        _DownloadAborted: 下载被取消
+        _SizeLimitExceeded: 下载大小超过MAX_FILE_SIZE
+    """
+    # 合并格式会依次下载多个文件，累计已完成部分的大小
+    finished_bytes = [0]
+
+    def progress_hook(d: Dict[str, Any]):
+        """同步进度回调"""
+        # 在yt-dlp的工作线程中检查取消标志，抛出异常以中止下载
+        if is_cancelled():
+            raise _DownloadAborted()
+        # 已下载的或服务器声明的大小超过上限时立即中止，不必等到下载完成
+        if d['status'] == 'downloading':
+            current = max(d.get('downloaded_bytes') or 0, d.get('total_bytes') or 0)
+            if finished_bytes[0] + current > MAX_FILE_SIZE:
+                raise _SizeLimitExceeded()
+        elif d['status'] == 'finished' and 'postprocessor' not in d:
+            finished_bytes[0] += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+        try:
+            if d['status'] == 'downloading':
+                report({
+                    'status': 'downloading',
+                    'downloaded_bytes': d.get('downloaded_bytes') or 0,
+                    'total_bytes': d.get('total_bytes') or d.get('total_bytes_estimate') or 0,
+                    'speed': d.get('speed') or 0,
+                    'eta': d.get('eta') or 0,
+                    'filename': d.get('filename', '')
+                })
+            
+            elif d['status'] == 'finished':
+                report({
+                    'status': 'processing',
+                    'filename': d.get('filename', '')
+                })
+        except Exception as e:
+            logger.error(f"进度回调错误: {str(e)}")
+    
+    ydl_opts = {
+        'format': format_id if format_id else 'best',
+        'outtmpl': f"{temp_file}.%(ext)s",
+        'concurrent_fragment_downloads': connections,
+        'quiet': False,  # 启用输出以获取进度
+        'no_warnings': True,
+        'progress_hooks': [progress_hook],
+        'noprogress': False,  # 确保显示进度
+        'postprocessor_hooks': [progress_hook],  # 添加后处理钩子
+        'verbose': True  # 启用详细输出
+    }
+    if HTTP_CHUNK_SIZE:
+        # 单文件格式分段请求，避免单个长连接被服务端限速
+        ydl_opts['http_chunk_size'] = HTTP_CHUNK_SIZE
+    
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=True)
+    if not info:
+        return None
+    downloaded = (info.get('requested_downloads') or [{}])[0]
+    return {
+        'title': info.get('title'),
+        'ext': info.get('ext'),
+        'acodec': info.get('acodec'),
+        'filepath': downloaded.get('filepath') or info.get('filepath'),
+    }
+
+class _SharedDownload:
+    """一次实际的下载及加入它的所有请求者
+
+    进度广播给每个请求者的回调；只有所有请求者都已取消（或离开）时，
+    is_set()才返回True，下载线程据此中止下载，同时置位cancelled供协程等待。
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Future] = None
+        self.cancelled = asyncio.Event()
+        self._callbacks: Dict[int, Callable[[Dict[str, Any]], Awaitable[None]]] = {}
+        self._cancel_events: Dict[int, Optional[threading.Event]] = {}
+        self._tokens = itertools.count()
+
+    def attach(
+        self,
+        callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]],
+        cancel_event: Optional[threading.Event],
+        cancel_waiter: Optional[asyncio.Future] = None
+    ) -> int:
+        """加入下载，返回用于离开的令牌；cancel_waiter完成时重新检查是否应当中止"""
+        token = next(self._tokens)
+        if callback is not None:
+            self._callbacks[token] = callback
+        # 下载线程会读取取消标志，整体替换字典而不是原地修改
+        self._cancel_events = {**self._cancel_events, token: cancel_event}
+        if cancel_waiter is not None:
+            cancel_waiter.add_done_callback(lambda _: self._check_cancelled())
+        return token
+
+    def detach(self, token: int):
+        """离开下载，不再接收进度"""
+        self._callbacks.pop(token, None)
+        self._cancel_events = {k: v for k, v in self._cancel_events.items() if k != token}
+        self._check_cancelled()
+
+    def _check_cancelled(self):
+        if self.is_set():
+            self.cancelled.set()
+
+    def is_set(self) -> bool:
+        """是否应当中止下载（可在下载线程中调用）"""
+        return all(
+            event is not None and event.is_set()
+            for event in self._cancel_events.values()
+        )
+
+    async def broadcast(self, data: Dict[str, Any]):
+        """把进度发送给所有请求者"""
+        for callback in list(self._callbacks.values()):
+            try:
+                await callback(data)
+            except Exception as e:
+                logger.error(f"进度回调错误: {str(e)}")
 
 class VideoInfoService:
     """视频信息服务类"""
     
+    # 按(视频ID, 平台)缓存的视频信息
+    _cache = MetadataCache()
+    # 按(视频ID, 平台)合并进行中的提取
+    _in_flight = SingleFlight()
+    # 磁盘模式下的持久化存储，重启后按需从中预热缓存
+    _store: Optional[MetadataStore] = MetadataStore() if METADATA_STORE_MODE == "disk" else None
+    # 按(平台, 视频ID, 格式ID)记录的已下载文件
+    _index = DownloadIndex()
+    # 下载前的存储空间预留、配额和淘汰
+    _storage = StorageManager(_index)
+    # 所有下载共享的分片并行连接数
+    _connections = ConnectionBudget()
+    # 按(平台, 视频ID, 格式ID)合并进行中的下载
+    _downloads: Dict[IndexKey, "_SharedDownload"] = {}
+    _download_stats = {'started': 0, 'joined': 0, 'reused': 0}
+    # 服务停止中，此后被中断的下载保留临时文件
+    _suspended = False
+    
     @staticmethod
     async def get_video_info(url: str) -> VideoInfo:
         """
         获取视频信息
         
+        优先从元数据缓存读取，未命中时在ExtractorPool中执行提取，不会阻塞事件循环。
+        同一视频的并发请求会合并为一次提取，共享结果或错误。
+        
         Args:
             url: 视频URL
             
@@ -27,6 +355,7 @@ class VideoInfoService:
         Raises:
             VideoError: 视频相关错误
             ValidationError: URL验证错误
+            ServiceBusyError: 提取执行器繁忙
         """
         # 验证URL
         is_valid, error = validate_video_url(url)
@@ -38,83 +367,146 @@ class VideoInfoService:
             video_id, platform = extract_video_id(url)
             logger.info(f"提取到视频ID: {video_id}, 平台: {platform}")
             
-            # 配置yt-dlp选项
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': False,
-                'format': 'best',  # 默认选择最佳质量
-                'youtube_include_dash_manifest': True,  # 包括DASH格式
-                'youtube_include_hls_manifest': True,   # 包括HLS格式
-                'ignoreerrors': True,  # 忽略部分错误继续处理
-                'no_color': True       # 禁用颜色输出
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                logger.info(f"正在获取视频信息: {url}")
-                try:
-                    info = ydl.extract_info(url, download=False)
-                except yt_dlp.utils.DownloadError as e:
-                    logger.error(f"yt-dlp下载错误: {str(e)}")
-                    raise VideoError(f"获取视频信息失败: {str(e)}")
-                except Exception as e:
-                    logger.error(f"获取视频信息时发生未知错误: {str(e)}")
-                    raise VideoError("获取视频信息时发生未知错误")
-                
-                if not info:
-                    raise VideoError("无法获取视频信息")
-                
-                formats = []
-                for f in info.get('formats', []):
-                    # 添加所有格式，包括音频
-                    format_note = f.get('format_note', '')
-                    if f.get('vcodec') == 'none':
-                        format_note = '仅音频'
-                    elif f.get('acodec') == 'none':
-                        format_note = '仅视频'
-                    
-                    # 获取分辨率
-                    resolution = f.get('resolution', 'unknown')
-                    if resolution == 'unknown':
-                        width = f.get('width')
-                        height = f.get('height')
-                        if width and height:
-                            resolution = f"{width}x{height}"
-                    
-                    formats.append(VideoFormat(
-                        format_id=f.get('format_id', ''),
-                        ext=f.get('ext', ''),
-                        resolution=resolution,
-                        filesize=f.get('filesize'),
-                        vcodec=f.get('vcodec', ''),
-                        acodec=f.get('acodec', ''),
-                        format_note=format_note,
-                        fps=f.get('fps'),
-                        tbr=f.get('tbr')
-                    ))
-                
-                if not formats:
-                    raise VideoError("未找到任何可用格式")
-                
-                logger.info(f"成功获取到 {len(formats)} 个格式")
-                
-                return VideoInfo(
-                    id=info.get('id', ''),
-                    title=info.get('title', ''),
-                    description=info.get('description'),
-                    duration=info.get('duration'),
-                    thumbnail=info.get('thumbnail'),
-                    uploader=info.get('uploader'),
-                    formats=formats
-                )
+            key = (video_id, platform)
+            if METADATA_CACHE_ENABLED:
+                cached = VideoInfoService._cache.get(key)
+                if cached is not None:
+                    logger.info(f"命中元数据缓存: {video_id}")
+                    return cached
+            
+            return await VideoInfoService._in_flight.do(
+                key, lambda: VideoInfoService._fetch_video_info(key, url)
+            )
                 
+        except AppError:
+            raise
         except yt_dlp.utils.DownloadError as e:
             logger.error(f"yt-dlp下载错误: {str(e)}")
             raise VideoError(f"下载失败: {str(e)}")
         except Exception as e:
             logger.error(f"获取视频信息时发生错误: {str(e)}")
             raise VideoError(f"获取视频信息失败: {str(e)}")
+    
+    @staticmethod
+    async def _fetch_video_info(key: Tuple[str, str], url: str) -> VideoInfo:
+        """
+        内存缓存未命中时获取视频信息，同一视频的并发调用只会执行一次
+        
+        磁盘模式下先查询持久化存储，仍未命中才执行实际提取，并将结果写回存储。
+        """
+        loop = asyncio.get_running_loop()
+        store = VideoInfoService._store
+        
+        if store is not None:
+            try:
+                stored = await loop.run_in_executor(None, store.get, key)
+            except Exception as e:
+                logger.error(f"读取元数据存储失败: {str(e)}")
+                stored = None
+            if stored is not None:
+                video_info, fetched_at = stored
+                logger.info(f"从元数据存储加载: {key[0]}")
+                if METADATA_CACHE_ENABLED:
+                    remaining = METADATA_STORE_TTL - (time.time() - fetched_at)
+                    VideoInfoService._cache.put(key, video_info, ttl=min(METADATA_CACHE_TTL, remaining))
+                return video_info
+        
+        video_info = await ExtractorPool().run(_extract_video_info, url)
+        if METADATA_CACHE_ENABLED:
+            VideoInfoService._cache.put(key, video_info)
+        
+        if store is not None:
+            try:
+                await loop.run_in_executor(None, store.put, key, video_info)
+            except Exception as e:
+                logger.error(f"写入元数据存储失败: {str(e)}")
+        return video_info
 
+    @staticmethod
+    async def iter_video_info_batch(urls: List[str], concurrency: int) -> AsyncIterator[Dict[str, Any]]:
+        """
+        批量获取视频信息，按完成顺序逐条产出结果
+        
+        URL按(视频ID, 平台)去重，同一视频只提取一次；单个URL出错只影响其自身的结果。
+        
+        Args:
+            urls: 视频URL列表
+            concurrency: 最大并行提取数
+            
+        Yields:
+            每个视频（或无效URL）的结果字典
+        """
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        for url in urls:
+            try:
+                key = extract_video_id(url)
+            except Exception as e:
+                yield {'url': url, 'urls': [url], 'success': False, **format_error_response(handle_error(e))}
+                continue
+            groups.setdefault(key, []).append(url)
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def resolve(key: Tuple[str, str], group: List[str]) -> Dict[str, Any]:
+            result = {'url': group[0], 'urls': group, 'video_id': key[0], 'platform': key[1]}
+            async with semaphore:
+                try:
+                    video_info = await VideoInfoService.get_video_info(group[0])
+                    return {**result, 'success': True, 'data': video_info.model_dump()}
+                except Exception as e:
+                    return {**result, 'success': False, **format_error_response(handle_error(e))}
+        
+        tasks = [asyncio.ensure_future(resolve(key, group)) for key, group in groups.items()]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            # 客户端提前断开时取消剩余任务
+            for task in tasks:
+                task.cancel()
+    
+    @staticmethod
+    async def invalidate(url: str) -> bool:
+        """
+        使指定视频的缓存信息失效（包括持久化存储）
+        
+        Args:
+            url: 视频URL（同一视频的任意链接形式均可）
+            
+        Returns:
+            缓存或存储中是否存在该视频
+            
+        Raises:
+            ValidationError: URL验证错误
+        """
+        key = extract_video_id(url)
+        existed = VideoInfoService._cache.invalidate(key)
+        if VideoInfoService._store is not None:
+            loop = asyncio.get_running_loop()
+            existed = await loop.run_in_executor(None, VideoInfoService._store.delete, key) or existed
+        return existed
+    
+    @staticmethod
+    async def get_stats() -> Dict[str, Any]:
+        """获取元数据提取、缓存、持久化存储、下载复用和后处理的运行指标"""
+        loop = asyncio.get_running_loop()
+        stats = {
+            'extractor': ExtractorPool().get_metrics(),
+            'cache': VideoInfoService._cache.get_stats(),
+            'coalescing': VideoInfoService._in_flight.get_stats(),
+            'downloads': {
+                'in_flight': len(VideoInfoService._downloads),
+                **VideoInfoService._download_stats,
+                'index': await loop.run_in_executor(None, VideoInfoService._index.get_stats),
+            },
+            'storage': VideoInfoService._storage.get_stats(),
+            'connections': VideoInfoService._connections.get_stats(),
+            'postprocess': PostProcessPool().get_metrics(),
+        }
+        if VideoInfoService._store is not None:
+            stats['store'] = await loop.run_in_executor(None, VideoInfoService._store.get_stats)
+        return stats
+    
     @staticmethod
     async def get_video_formats(url: str) -> list[VideoFormat]:
         """
@@ -133,56 +525,50 @@ class VideoInfoService:
         try:
             video_info = await VideoInfoService.get_video_info(url)
             return video_info.formats
+        except AppError:
+            raise
         except Exception as e:
             logger.error(f"获取视频格式失败: {str(e)}")
             raise VideoError(f"获取视频格式失败: {str(e)}")
         
     @staticmethod
-    def get_best_format(formats: list[VideoFormat], prefer_quality: str = "720p") -> VideoFormat:
+    def select_format(video_info: VideoInfo, constraints: FormatConstraints) -> FormatSelection:
+        """
+        按条件选择最佳的单个格式或视频+音频组合，规则见format_selector.select_format
+        
+        Raises:
+            VideoError: 没有满足条件的格式
+        """
+        return select_format(video_info, constraints)
+        
+    @staticmethod
+    def get_best_format(video_info: VideoInfo, prefer_quality: str = "720p") -> Union[VideoFormat, FormatSelection]:
         """
         获取最佳视频格式
         
+        只在音视频组合格式中选择，返回的格式可以直接下载；视频没有音视频组合格式
+        （如只提供DASH流的网站）时返回完整的选择结果，表明需要下载视频和音频两个流。
+        
         Args:
-            formats: 格式列表
-            prefer_quality: 首选质量
+            video_info: 视频信息
+            prefer_quality: 首选质量，如"720p"或"1280x720"，取不超过该分辨率的最高分辨率
             
         Returns:
-            最佳格式
+            最佳的音视频组合格式，或需要合并时的选择结果
             
         Raises:
             VideoError: 未找到合适的格式
         """
         try:
-            if not formats:
-                raise VideoError("没有可用的视频格式")
-                
-            target_formats = [f for f in formats 
-                            if f.resolution and prefer_quality in f.resolution]
-                            
-            if target_formats:
-                combined = [f for f in target_formats if f.is_combined]
-                if combined:
-                    return max(combined, key=lambda x: x.tbr or 0)
-                return max(target_formats, key=lambda x: x.tbr or 0)
-                
-            available_formats = [f for f in formats if f.resolution]
-            if not available_formats:
-                raise VideoError("未找到有效的视频格式")
-                
-            target_height = int(prefer_quality.replace('p', ''))
-            available_formats.sort(
-                key=lambda x: int(x.resolution.split('x')[1]) 
-                if 'x' in x.resolution 
-                else int(x.resolution.replace('p', '')),
-                reverse=True
-            )
-            
-            for fmt in available_formats:
-                height = int(fmt.resolution.split('x')[1]) if 'x' in fmt.resolution else int(fmt.resolution.replace('p', ''))
-                if height <= target_height:
-                    return fmt
-                    
-            return available_formats[-1]
+            _, max_height = parse_resolution(prefer_quality)
+            if max_height is None:
+                raise VideoError(f"无效的首选质量: {prefer_quality}")
+            try:
+                return VideoInfoService.select_format(
+                    video_info, FormatConstraints(max_height=max_height, allow_merge=False)
+                ).video
+            except VideoError:
+                return VideoInfoService.select_format(video_info, FormatConstraints(max_height=max_height))
             
         except Exception as e:
             logger.error(f"选择最佳格式时发生错误: {str(e)}")
@@ -192,15 +578,32 @@ class VideoInfoService:
     async def download_video(
         url: str, 
         format_id: Optional[str] = None,
-        progress_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+        progress_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        cancel_event: Optional[threading.Event] = None,
+        client_id: Optional[str] = None,
+        audio_format: Optional[str] = None,
+        job_id: Optional[str] = None,
+        cancel_waiter: Optional[asyncio.Future] = None
     ) -> Path:
         """
         下载视频
         
+        相同(平台, 视频ID, 格式ID)已下载过时直接复用文件；正在下载时加入进行中的下载，
+        共享其进度和结果，不会重复下载。
+        
+        指定audio_format时只下载音频：未指定格式ID时直接选择最佳的仅音频格式，
+        不会下载视频流；输出格式不是"original"时再由ffmpeg重新封装或转码。
+        
         Args:
             url: 视频URL
             format_id: 可选的格式ID
             progress_callback: 进度回调函数
+            cancel_event: 取消标志，所有加入同一下载的请求都取消后，下载会在下一次进度回调时中止
+            client_id: 发起下载的客户端ID，新下载的文件计入该客户端的存储配额
+            audio_format: 仅音频下载的输出格式，取值见AUDIO_FORMATS；为空时下载视频
+            job_id: 下载任务ID，指定时使用该任务固定的临时目录，服务重启后重新执行同一任务时
+                从上次留下的部分文件继续下载
+            cancel_waiter: 与cancel_event同时完成的future，完成后本次请求立即结束
             
         Returns:
             下载文件路径
@@ -208,6 +611,7 @@ class VideoInfoService:
         Raises:
             VideoError: 视频相关错误
             DownloadError: 下载相关错误
+            DownloadCancelledError: 下载被取消
             ValidationError: URL验证错误
         """
         try:
@@ -216,73 +620,37 @@ class VideoInfoService:
             if not is_valid:
                 raise VideoError(error)
             
-            # 创建临时文件
-            temp_file = create_temp_file(suffix=".mp4")
-            
-            # 创建事件循环
-            loop = asyncio.get_event_loop()
-            
-            def progress_hook(d: Dict[str, Any]):
-                """同步进度回调"""
-                try:
-                    if d['status'] == 'downloading':
-                        # 创建一个新的事件循环来运行异步回调
-                        async def send_progress():
-                            if progress_callback:
-                                await progress_callback({
-                                    'status': 'downloading',
-                                    'downloaded_bytes': d.get('downloaded_bytes', 0),
-                                    'total_bytes': d.get('total_bytes', 0),
-                                    'speed': d.get('speed', 0),
-                                    'eta': d.get('eta', 0),
-                                    'filename': d.get('filename', '')
-                                })
-                        asyncio.run_coroutine_threadsafe(send_progress(), loop)
-                    
-                    elif d['status'] == 'finished':
-                        async def send_processing():
-                            if progress_callback:
-                                await progress_callback({
-                                    'status': 'processing',
-                                    'filename': d.get('filename', '')
-                                })
-                        asyncio.run_coroutine_threadsafe(send_processing(), loop)
-                except Exception as e:
-                    logger.error(f"进度回调错误: {str(e)}")
-            
-            ydl_opts = {
-                'format': format_id if format_id else 'best',
-                'outtmpl': str(temp_file),
-                'quiet': False,  # 启用输出以获取进度
-                'no_warnings': True,
-                'progress_hooks': [progress_hook],
-                'noprogress': False,  # 确保显示进度
-                'postprocessor_hooks': [progress_hook],  # 添加后处理钩子
-                'verbose': True  # 启用详细输出
-            }
-            
-            # 在新线程中运行下载
-            def download():
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    return ydl.extract_info(url, download=True)
-            
-            # 在线程池中执行下载
-            info = await loop.run_in_executor(None, download)
-            
-            if not info:
-                raise DownloadError("下载失败：无法获取视频信息")
+            if audio_format and not format_id:
+                format_id = await VideoInfoService._select_audio_format(url, audio_format)
             
-            # 检查文件大小
-            if temp_file.stat().st_size > MAX_FILE_SIZE:
-                temp_file.unlink()
-                raise DownloadError("视频文件超过大小限制")
-            
-            # 移动到下载目录
-            final_name = f"{info.get('title', 'video')}.{info.get('ext', 'mp4')}"
-            final_path = move_to_downloads(temp_file, final_name)
-            
-            # 清理过期的临时文件
-            cleanup_temp_files()
+            if DOWNLOAD_REUSE_MODE == "off":
+                shared = _SharedDownload()
+                shared.attach(progress_callback, cancel_event, cancel_waiter)
+                final_path = await VideoInfoService._download_file(
+                    url, format_id, shared, client_id=client_id, audio_format=audio_format, job_id=job_id
+                )
+            else:
+                video_id, platform = extract_video_id(url)
+                key_format = format_id or 'best'
+                if audio_format and audio_format != "original":
+                    # 转换后的文件与原始下载是不同的结果
+                    key_format = f"{key_format}>{audio_format}"
+                key = (platform, video_id, key_format)
+                loop = asyncio.get_running_loop()
+                final_path = await loop.run_in_executor(None, VideoInfoService._index.get, key)
+                started = False
+                if final_path is not None:
+                    logger.info(f"复用已下载的文件: {final_path}")
+                    VideoInfoService._download_stats['reused'] += 1
+                    await loop.run_in_executor(None, StorageManager.touch, final_path)
+                else:
+                    final_path, started = await VideoInfoService._join_download(
+                        key, url, format_id, progress_callback, cancel_event, client_id, audio_format, job_id,
+                        cancel_waiter
+                    )
+                if DOWNLOAD_REUSE_MODE == "link" and not started:
+                    # 每个请求者得到独立的文件名，硬链接不占用额外空间
+                    final_path = await loop.run_in_executor(None, link_or_copy, final_path, final_path.name)
             
             # 通知下载完成
             if progress_callback:
@@ -293,15 +661,269 @@ class VideoInfoService:
             
             return final_path
             
+        except DownloadCancelledError:
+            logger.info(f"下载已取消: {url}")
+            raise
         except Exception as e:
             logger.error(f"下载视频时发生错误: {str(e)}")
-            # 确保清理临时文件
-            if 'temp_file' in locals() and temp_file.exists():
-                temp_file.unlink()
             # 通知下载失败
             if progress_callback:
                 await progress_callback({
                     'status': 'error',
                     'error': str(e)
                 })
-            raise handle_error(e) 
\ No newline at end of file
+            raise handle_error(e)
+            
+    @staticmethod
+    async def _join_download(
+        key: IndexKey,
+        url: str,
+        format_id: Optional[str],
+        progress_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]],
+        cancel_event: Optional[threading.Event],
+        client_id: Optional[str] = None,
+        audio_format: Optional[str] = None,
+        job_id: Optional[str] = None,
+        cancel_waiter: Optional[asyncio.Future] = None
+    ) -> Tuple[Path, bool]:
+        """
+        启动或加入相同键的下载，等待其完成
+        
+        本请求取消时，如果还有其他请求者则立即返回，否则等待下载停止写入后返回。
+        恢复的任务（job_id的临时目录中留有部分文件）不加入进行中的下载，而是从自己的部分文件继续。
+        
+        Returns:
+            (下载文件路径, 是否由本次请求启动)
+            
+        Raises:
+            DownloadCancelledError: 本次请求被取消，或所有请求都已取消导致下载中止
+        """
+        downloads = VideoInfoService._downloads
+        shared = downloads.get(key)
+        if shared is not None and job_id is not None:
+            loop = asyncio.get_running_loop()
+            if await loop.run_in_executor(None, has_partial_files, job_temp_dir(job_id)):
+                # 恢复的任务在自己的临时目录中留有部分文件：不加入从头开始的下载，从自己的部分文件继续
+                logger.info(f"从任务的部分文件继续下载，不加入进行中的下载: {url}")
+                own = _SharedDownload()
+                own.attach(progress_callback, cancel_event, cancel_waiter)
+                return await VideoInfoService._download_file(
+                    url, format_id, own, key, client_id, audio_format, job_id
+                ), True
+                
+        started = shared is None
+        if started:
+            shared = _SharedDownload()
+            downloads[key] = shared
+            shared.task = asyncio.ensure_future(
+                VideoInfoService._download_file(url, format_id, shared, key, client_id, audio_format, job_id)
+            )
+            shared.task.add_done_callback(lambda task: VideoInfoService._forget_download(key, shared))
+            VideoInfoService._download_stats['started'] += 1
+        else:
+            logger.info(f"加入进行中的下载: {url}")
+            VideoInfoService._download_stats['joined'] += 1
+            
+        token = shared.attach(progress_callback, cancel_event, cancel_waiter)
+        try:
+            waiters = {shared.task} if cancel_waiter is None else {shared.task, cancel_waiter}
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            shared.detach(token)
+        if shared.task.done():
+            return shared.task.result(), started
+            
+        # 共享的下载不随单个请求取消：还有其他请求者时本请求提前返回；
+        # 本请求是最后一个请求者时，等待下载真正停止后才确认取消，下载名额不会被提前释放
+        if shared.is_set():
+            try:
+                await asyncio.shield(shared.task)
+            except Exception:
+                pass
+        raise DownloadCancelledError("下载已取消")
+            
+    @staticmethod
+    async def suspend(timeout: float):
+        """
+        服务停止前调用：之后因取消而中断的下载保留各自任务的临时目录，
+        并等待进行中的下载（最多timeout秒）停止写入
+        
+        调用方需要先置位各请求的取消标志，下载线程在下一次进度回调时中止。
+        """
+        VideoInfoService._suspended = True
+        tasks = [shared.task for shared in VideoInfoService._downloads.values() if shared.task is not None]
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+            
+    @staticmethod
+    def _forget_download(key: IndexKey, shared: "_SharedDownload"):
+        if VideoInfoService._downloads.get(key) is shared:
+            del VideoInfoService._downloads[key]
+        # 所有请求者都已离开时，避免出现"exception was never retrieved"警告
+        if not shared.task.cancelled():
+            shared.task.exception()
+            
+    @staticmethod
+    async def _select_audio_format(url: str, audio_format: str) -> str:
+        """
+        为仅音频下载选择格式ID
+        
+        优先选择与输出格式编码一致的音频流，转换时只需重新封装；视频信息获取失败
+        或没有仅音频格式时交给yt-dlp按"bestaudio/best"选择。
+        """
+        try:
+            video_info = await VideoInfoService.get_video_info(url)
+        except Exception as e:
+            logger.warning(f"无法获取视频信息，由yt-dlp选择音频格式: {str(e)}")
+            return "bestaudio/best"
+        
+        audio = select_audio(video_info, audio_target_codec(audio_format))
+        if audio is None:
+            logger.info(f"视频没有仅音频格式，下载组合格式后提取音频: {url}")
+            return "bestaudio/best"
+        return audio.format_id
+            
+    @staticmethod
+    async def _check_download_size(url: str, format_id: Optional[str]) -> Optional[int]:
+        """
+        下载前按格式元数据检查大小，明显超过MAX_FILE_SIZE的任务直接拒绝
+        
+        视频信息通常已在选择格式时缓存；获取失败或无法估算时不拦截，
+        由下载过程中的检查兜底。
+        
+        Returns:
+            估算的下载大小，无法估算时返回None
+            
+        Raises:
+            DownloadError: 预计大小超过限制
+        """
+        try:
+            video_info = await VideoInfoService.get_video_info(url)
+        except Exception as e:
+            logger.warning(f"下载前无法获取视频信息，跳过大小预检: {str(e)}")
+            return None
+        
+        estimated = _estimate_download_size(video_info, format_id)
+        if estimated is not None and estimated > MAX_FILE_SIZE:
+            logger.info(f"预计大小 {estimated} 字节超过限制，拒绝下载: {url}")
+            raise DownloadError(
+                f"视频文件超过大小限制（预计 {estimated / 1024 / 1024:.0f}MB，"
+                f"上限 {MAX_FILE_SIZE / 1024 / 1024:.0f}MB）"
+            )
+        return estimated
+            
+    @staticmethod
+    async def _download_file(
+        url: str,
+        format_id: Optional[str],
+        shared: "_SharedDownload",
+        key: Optional[IndexKey] = None,
+        client_id: Optional[str] = None,
+        audio_format: Optional[str] = None,
+        job_id: Optional[str] = None
+    ) -> Path:
+        """
+        执行一次实际的下载并移动到下载目录，进度广播给所有加入的请求者
+        
+        Args:
+            url: 视频URL
+            format_id: 可选的格式ID
+            shared: 共享下载，提供进度广播和取消判断
+            key: 下载索引键，下载完成后登记到索引
+            client_id: 发起下载的客户端ID，预留空间和下载的文件计入其配额
+            audio_format: 仅音频下载的输出格式，不是"original"时下载后转换
+            job_id: 下载任务ID，指定时使用该任务固定的临时目录
+            
+        Returns:
+            下载文件路径
+        """
+        estimated = await VideoInfoService._check_download_size(url, format_id)
+        
+        async def on_wait(reason: str):
+            await shared.broadcast({'status': 'waiting', 'reason': reason})
+            
+        # 空间不足时在这里等待，不会开始写入
+        reservation = await VideoInfoService._storage.reserve(estimated, client_id, shared.is_set, on_wait)
+        try:
+            return await VideoInfoService._download_reserved(
+                url, format_id, shared, key, client_id, reservation, audio_format, job_id
+            )
+        finally:
+            await VideoInfoService._storage.release(reservation)
+            
+    @staticmethod
+    async def _download_reserved(
+        url: str,
+        format_id: Optional[str],
+        shared: "_SharedDownload",
+        key: Optional[IndexKey],
+        client_id: Optional[str],
+        reservation: StorageReservation,
+        audio_format: Optional[str] = None,
+        job_id: Optional[str] = None
+    ) -> Path:
+        """在已预留的空间内执行下载，参数见_download_file"""
+        loop = asyncio.get_running_loop()
+        # 扩展名由yt-dlp按实际下载的格式添加，仅音频下载不会得到.mp4
+        temp_file = create_temp_file(job_id=job_id)
+        reservation.temp_file = temp_file
+        keep_partial = False
+        try:
+            
+            # 进度节流：只保留最新状态，按固定频率回到事件循环中发送
+            throttle = ProgressThrottle(loop, shared.broadcast)
+            
+            # 在下载工作进程或线程池中执行下载，分片并行数受全局连接预算限制
+            connections = VideoInfoService._connections.acquire()
+            try:
+                if DOWNLOAD_USE_PROCESSES:
+                    info = await DownloadWorkerPool().run(
+                        url, format_id, temp_file, throttle.update, shared.is_set, connections
+                    )
+                else:
+                    info = await loop.run_in_executor(
+                        None, _run_download, url, format_id, temp_file, throttle.update, shared.is_set, connections
+                    )
+            except _DownloadAborted:
+                raise DownloadCancelledError("下载已取消")
+            except _SizeLimitExceeded:
+                raise DownloadError("视频文件超过大小限制")
+            finally:
+                VideoInfoService._connections.release(connections)
+                # 确保积压的进度在完成/失败通知之前发出
+                await throttle.close()
+            if shared.is_set():
+                raise DownloadCancelledError("下载已取消")
+            
+            if not info:
+                raise DownloadError("下载失败：无法获取视频信息")
+            if not info.get('filepath') or not Path(info['filepath']).exists():
+                raise DownloadError("下载失败：未找到下载的文件")
+            downloaded = Path(info['filepath'])
+            
+            if audio_format and audio_format != "original":
+                await shared.broadcast({'status': 'processing', 'filename': downloaded.name})
+                downloaded = await PostProcessPool().convert_audio(
+                    downloaded, audio_format, codec_family(info.get('acodec')), shared.cancelled
+                )
+            
+            # 检查文件大小
+            if downloaded.stat().st_size > MAX_FILE_SIZE:
+                raise DownloadError("视频文件超过大小限制")
+            
+            # 移动到下载目录
+            final_name = f"{info.get('title') or 'video'}{downloaded.suffix or '.mp4'}"
+            final_path = move_to_downloads(downloaded, final_name)
+            
+            if key is not None:
+                await loop.run_in_executor(None, VideoInfoService._index.put, key, final_path, client_id)
+            return final_path
+            
+        except DownloadCancelledError:
+            # 服务停止导致的中断保留部分文件，任务重新执行时从断点继续
+            keep_partial = VideoInfoService._suspended and job_id is not None
+            raise
+        finally:
+            # 删除本次下载的临时目录及其中的.part/.ytdl/分片等中间文件
+            if not keep_partial:
+                remove_temp_dir(temp_file)
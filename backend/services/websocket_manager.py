@@ -1,125 +1,316 @@
+import asyncio
 import json
-from typing import Dict, Set, Optional
+import uuid
+from typing import Any, Dict, Iterable, List, Set, Optional
 from fastapi import WebSocket
 from .download_manager import DownloadManager
 from ..utils.error_utils import handle_error
+from ..config import DEFAULT_DOWNLOAD_PRIORITY, WS_BATCH_INTERVAL
 from loguru import logger
 
+# 会话结束状态，出现时立即推送而不等待批量窗口
+TERMINAL_STATUSES = ('complete', 'error', 'cancelled')
+
 class WebSocketManager:
-    """WebSocket连接管理器"""
+    """WebSocket连接管理器
+
+    一个连接可以同时承载多个下载会话。客户端通过会话ID订阅/退订，
+    服务端把各会话的最新状态合并成批量的progress帧推送。
+
+    下载会话属于持久的客户端ID（由浏览器保存），而不是某一条连接。
+    连接断开后下载继续运行，新连接可以通过resume重新订阅并获取状态快照。
+    """
     _instance = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._initialized = False
         return cls._instance
-        
+
     def __init__(self):
         if not self._initialized:
+            # 连接ID -> WebSocket，每条连接的ID都不同
             self._active_connections: Dict[str, WebSocket] = {}
+            # 连接ID -> 持久的客户端ID，同一客户端可能同时有多条连接
+            self._clients: Dict[str, str] = {}
             self._download_manager = DownloadManager()
+            self._download_manager.add_listener(self._on_session_event)
+            # 连接ID -> 订阅的会话ID
+            self._subscriptions: Dict[str, Set[str]] = {}
+            # 会话ID -> 订阅该会话的连接ID
+            self._subscribers: Dict[str, Set[str]] = {}
+            # 连接ID -> (会话ID -> 待推送的最新状态)
+            self._outbox: Dict[str, Dict[str, dict]] = {}
+            self._outbox_event = asyncio.Event()
+            self._urgent = False
+            self._flush_task: Optional[asyncio.Task] = None
             self._initialized = True
-            
-    async def connect(self, websocket: WebSocket, client_id: str):
-        """建立WebSocket连接"""
+
+    async def connect(self, websocket: WebSocket, connection_id: str, client_id: str):
+        """
+        建立WebSocket连接
+
+        Args:
+            websocket: WebSocket连接
+            connection_id: 本条连接的ID
+            client_id: 持久的客户端ID，决定会话的归属
+        """
         await websocket.accept()
-        self._active_connections[client_id] = websocket
-        logger.info(f"WebSocket客户端连接: {client_id}")
-        
-    def disconnect(self, client_id: str):
-        """断开WebSocket连接"""
-        if client_id in self._active_connections:
-            del self._active_connections[client_id]
-            logger.info(f"WebSocket客户端断开: {client_id}")
-            
-    async def send_message(self, client_id: str, message: dict):
-        """发送消息给指定客户端"""
-        if websocket := self._active_connections.get(client_id):
+        self._active_connections[connection_id] = websocket
+        self._clients[connection_id] = client_id
+        self._subscriptions.setdefault(connection_id, set())
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"WebSocket客户端连接: {client_id} ({connection_id})")
+
+    def disconnect(self, connection_id: str):
+        """断开WebSocket连接，已订阅的下载继续运行"""
+        if connection_id in self._active_connections:
+            del self._active_connections[connection_id]
+            logger.info(f"WebSocket客户端断开: {self._clients.get(connection_id)} ({connection_id})")
+        self.unsubscribe(connection_id, list(self._subscriptions.pop(connection_id, ())))
+        self._outbox.pop(connection_id, None)
+        self._clients.pop(connection_id, None)
+
+    async def send_message(self, connection_id: str, message: dict):
+        """发送消息给指定连接"""
+        if websocket := self._active_connections.get(connection_id):
             try:
                 await websocket.send_json(message)
             except Exception as e:
                 logger.error(f"发送消息失败: {str(e)}")
-                self.disconnect(client_id)
-                
-    async def handle_download_request(self, client_id: str, url: str, format_id: Optional[str] = None):
-        """处理下载请求"""
-        try:
-            # 创建下载会话
-            session = await self._download_manager.create_session(url, client_id)
-            
-            # 定义进度回调
-            async def progress_callback(data: dict):
-                if data['status'] == 'downloading':
-                    await self.send_message(client_id, {
-                        'status': 'downloading',
-                        'downloaded_bytes': data['downloaded_bytes'],
-                        'total_bytes': data['total_bytes'],
-                        'speed': data['speed'],
-                        'eta': data['eta']
-                    })
-                elif data['status'] == 'completed':
-                    await self.send_message(client_id, {
-                        'status': 'complete',
-                        'file_path': data['file_path']
-                    })
-                elif data['status'] == 'error':
-                    await self.send_message(client_id, {
-                        'status': 'error',
-                        'message': data['error']
+                self.disconnect(connection_id)
+
+    async def _owned_session(self, connection_id: str, session_id: str) -> bool:
+        """会话是否存在且属于该连接的客户端，归属规则见DownloadSession.owned_by"""
+        session = await self._download_manager.get_session(session_id)
+        return session is not None and session.owned_by(self._clients.get(connection_id))
+
+    async def subscribe(self, connection_id: str, session_ids: Iterable[str]) -> List[str]:
+        """
+        订阅会话的状态推送
+
+        Returns:
+            实际订阅成功（存在且属于该客户端）的会话ID
+        """
+        subscribed = []
+        for session_id in session_ids:
+            if not await self._owned_session(connection_id, session_id):
+                continue
+            self._subscriptions.setdefault(connection_id, set()).add(session_id)
+            self._subscribers.setdefault(session_id, set()).add(connection_id)
+            subscribed.append(session_id)
+        return subscribed
+
+    def unsubscribe(self, connection_id: str, session_ids: Iterable[str]):
+        """退订会话的状态推送"""
+        subscriptions = self._subscriptions.get(connection_id, set())
+        for session_id in session_ids:
+            subscriptions.discard(session_id)
+            if connections := self._subscribers.get(session_id):
+                connections.discard(connection_id)
+                if not connections:
+                    del self._subscribers[session_id]
+            if pending := self._outbox.get(connection_id):
+                pending.pop(session_id, None)
+
+    async def resume(self, connection_id: str, session_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        重新订阅会话并返回它们的当前状态
+
+        先订阅再读取快照，之后的状态变化都会继续推送，不会遗漏；
+        已结束的会话在快照中带有最终状态（完成、失败或取消）。
+
+        Args:
+            connection_id: 连接ID
+            session_ids: 要恢复的会话ID，为空时恢复该客户端的全部会话
+
+        Returns:
+            包含sessions（状态快照）和missing（已不存在或不属于该客户端的会话ID）的字典
+        """
+        if session_ids is None:
+            client_id = self._clients.get(connection_id)
+            session_ids = [session.session_id for session in await self._download_manager.get_client_sessions(client_id)]
+
+        sessions, missing = [], []
+        for session_id in session_ids:
+            if not await self._owned_session(connection_id, session_id):
+                missing.append(session_id)
+                continue
+            # 先订阅再取快照，读取快照期间的状态变化也会推送
+            self._subscriptions.setdefault(connection_id, set()).add(session_id)
+            self._subscribers.setdefault(session_id, set()).add(connection_id)
+            snapshot = await self._download_manager.get_snapshot(session_id)
+            if snapshot is None:
+                self.unsubscribe(connection_id, [session_id])
+                missing.append(session_id)
+                continue
+            sessions.append(self._format_update(snapshot))
+        return {'sessions': sessions, 'missing': missing}
+
+    @staticmethod
+    def _format_update(event: Dict[str, Any]) -> Dict[str, Any]:
+        """将下载事件转换为推送给客户端的状态"""
+        update = {key: value for key, value in event.items() if key not in ('error', 'filename')}
+        if event.get('status') == 'error':
+            update['message'] = event.get('error')
+        return update
+
+    async def _on_session_event(self, event: Dict[str, Any]):
+        """DownloadManager的会话事件监听器：写入订阅者的待推送队列"""
+        if event.get('status') == 'positions':
+            # 合并的排队位置事件，拆分为各会话的queued状态
+            for session_id, position in event['positions'].items():
+                self._queue_update(session_id, {'session_id': session_id, 'status': 'queued', 'position': position})
+        else:
+            self._queue_update(event['session_id'], self._format_update(event))
+
+    def _queue_update(self, session_id: str, update: Dict[str, Any]):
+        """把会话的最新状态写入订阅者的待推送队列"""
+        connections = self._subscribers.get(session_id)
+        if not connections:
+            return
+        for connection_id in connections:
+            # 同一会话只保留最新状态
+            self._outbox.setdefault(connection_id, {})[session_id] = update
+        if update.get('status') in TERMINAL_STATUSES:
+            self._urgent = True
+        self._outbox_event.set()
+
+    async def _flush_loop(self):
+        """批量推送循环：有待推送内容时等待一个批量窗口，再为每条连接发送一帧"""
+        while True:
+            try:
+                await self._outbox_event.wait()
+                if not self._urgent:
+                    await asyncio.sleep(WS_BATCH_INTERVAL)
+                self._outbox_event.clear()
+                self._urgent = False
+
+                outbox, self._outbox = self._outbox, {}
+                await asyncio.gather(*(
+                    self.send_message(connection_id, {
+                        'type': 'progress',
+                        'updates': list(updates.values())
                     })
-                
-            # 开始下载
-            from .video_info import VideoInfoService
-            await VideoInfoService.download_video(
+                    for connection_id, updates in outbox.items() if updates
+                ))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"推送下载进度失败: {str(e)}")
+
+    async def handle_download_request(
+        self,
+        connection_id: str,
+        url: str,
+        format_id: Optional[str] = None,
+        priority: str = DEFAULT_DOWNLOAD_PRIORITY,
+        request_id: Optional[str] = None,
+        audio_format: Optional[str] = None
+    ):
+        """处理下载请求：创建会话并交给DownloadManager排队调度，发起连接自动订阅该会话"""
+        session_id = str(uuid.uuid4())
+        try:
+            # 先登记订阅再创建会话，避免错过第一条状态
+            self._subscriptions.setdefault(connection_id, set()).add(session_id)
+            self._subscribers.setdefault(session_id, set()).add(connection_id)
+
+            # 创建下载会话，下载由DownloadManager按并发限制启动
+            await self._download_manager.create_session(
                 url,
+                session_id,
                 format_id=format_id,
-                progress_callback=progress_callback
+                client_id=self._clients.get(connection_id),
+                priority=priority,
+                audio_format=audio_format
             )
-            
+            await self.send_message(connection_id, {
+                'type': 'accepted',
+                'request_id': request_id,
+                'session_id': session_id,
+                'position': await self._download_manager.get_queue_position(session_id)
+            })
+
         except Exception as e:
+            self.unsubscribe(connection_id, [session_id])
             error = handle_error(e)
-            await self.send_message(client_id, {
-                'status': 'error',
+            await self.send_message(connection_id, {
+                'type': 'error',
+                'request_id': request_id,
                 'message': str(error)
             })
-            
-    async def handle_client_message(self, client_id: str, message: str):
+
+    async def handle_client_message(self, connection_id: str, message: str):
         """处理客户端消息"""
+        request_id = None
         try:
             # 尝试解析JSON格式
             try:
                 data = json.loads(message)
                 message_type = data.get('type')
-                
+                request_id = data.get('request_id')
+
                 if message_type == 'download':
                     url = data.get('url')
                     format_id = data.get('format_id')
+                    priority = data.get('priority') or DEFAULT_DOWNLOAD_PRIORITY
+                    audio_format = data.get('audio_format')
                     if not url:
                         raise ValueError("缺少URL参数")
-                    await self.handle_download_request(client_id, url, format_id)
-                    
+                    await self.handle_download_request(
+                        connection_id, url, format_id, priority, request_id, audio_format
+                    )
+
                 elif message_type == 'cancel':
                     session_id = data.get('session_id')
-                    if session_id:
-                        self._download_manager.remove_session(session_id)
-                        await self.send_message(client_id, {
-                            'status': 'cancelled'
-                        })
-                        
+                    if not session_id:
+                        raise ValueError("缺少session_id参数")
+                    # 取消结果通过会话状态推送通知
+                    await self._download_manager.cancel_session(session_id, self._clients.get(connection_id))
+
+                elif message_type == 'resume':
+                    # 重连后恢复：重新订阅并返回状态快照
+                    snapshot = await self.resume(connection_id, data.get('session_ids'))
+                    await self.send_message(connection_id, {
+                        'type': 'snapshot',
+                        'request_id': request_id,
+                        **snapshot
+                    })
+
+                elif message_type == 'subscribe':
+                    session_ids = await self.subscribe(connection_id, data.get('session_ids') or [])
+                    await self.send_message(connection_id, {
+                        'type': 'subscribed',
+                        'request_id': request_id,
+                        'session_ids': session_ids
+                    })
+
+                elif message_type == 'unsubscribe':
+                    session_ids = data.get('session_ids') or []
+                    self.unsubscribe(connection_id, session_ids)
+                    await self.send_message(connection_id, {
+                        'type': 'unsubscribed',
+                        'request_id': request_id,
+                        'session_ids': session_ids
+                    })
+
                 else:
-                    await self.send_message(client_id, {
-                        'status': 'error',
+                    await self.send_message(connection_id, {
+                        'type': 'error',
+                        'request_id': request_id,
                         'message': '不支持的消息类型'
                     })
-                    
+
             except json.JSONDecodeError:
                 # 如果不是JSON格式，则视为直接的URL字符串
-                await self.handle_download_request(client_id, message)
-                
+                await self.handle_download_request(connection_id, message)
+
         except Exception as e:
             error = handle_error(e)
-            await self.send_message(client_id, {
-                'status': 'error',
+            await self.send_message(connection_id, {
+                'type': 'error',
+                'request_id': request_id,
                 'message': str(error)
-            }) 
\ No newline at end of file
+            })
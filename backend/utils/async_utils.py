@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """
+    合并相同键的并发调用
+
+    同一时刻相同键只会执行一次工厂函数，其余调用者等待同一个任务并共享
+    其结果或异常。任务结束后立即移除，不缓存结果。
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.executed = 0  # 实际执行的次数
+        self.deduplicated = 0  # 被合并的调用次数
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行或加入一次调用
+
+        Args:
+            key: 合并键
+            factory: 返回协程的工厂函数，仅在没有进行中的调用时执行
+
+        Returns:
+            调用结果
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.deduplicated += 1
+
+        # shield保证某个调用者被取消时不会取消其他调用者共享的任务
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # 所有调用者都已取消时，避免出现"exception was never retrieved"警告
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        """进行中的调用数"""
+        return len(self._in_flight)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            'in_flight': self.in_flight,
+            'executed': self.executed,
+            'deduplicated': self.deduplicated,
+        }
@@ -21,11 +21,19 @@ class DownloadError(AppError):
     def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
         super().__init__(message, status_code=500, details=details)
 
+class DownloadCancelledError(DownloadError):
+    """下载已被取消"""
+
 class ValidationError(AppError):
     """数据验证错误"""
     def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
         super().__init__(message, status_code=422, details=details)
 
+class ServiceBusyError(AppError):
+    """服务繁忙错误"""
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message, status_code=503, details=details)
+
 ERROR_MAPPINGS = {
     "Video unavailable": ("视频不可用或已被删除", VideoError),
     "Private video": ("这是一个私密视频", VideoError),
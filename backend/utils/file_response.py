@@ -0,0 +1,209 @@
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import quote
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from ..config import DOWNLOAD_CHUNK_SIZE
+
+# 可选的ASGI扩展：服务器声明支持时由服务器用sendfile直接把文件写入socket。
+# uvicorn不提供该扩展，在uvicorn下总是走分块读取
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个字节范围
+
+    Args:
+        header: Range请求头，如"bytes=0-499"、"bytes=500-"、"bytes=-500"
+        size: 文件大小
+
+    Returns:
+        (起始位置, 结束位置)，均包含在内；格式无法识别或是多个范围时返回None，按完整文件响应
+
+    Raises:
+        ValueError: 范围无法满足（起始位置超出文件大小）
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start, sep, end = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        first = int(start) if start else None
+        last = int(end) if end else None
+    except ValueError:
+        return None
+
+    if first is None:
+        # 后缀范围：最后N个字节
+        if last is None:
+            return None
+        if last == 0 or size == 0:
+            raise ValueError("范围无法满足")
+        return max(size - last, 0), size - 1
+    if last is not None and last < first:
+        return None
+    if first >= size:
+        raise ValueError("范围无法满足")
+    return first, size - 1 if last is None else min(last, size - 1)
+
+class RangeFileResponse(Response):
+    """支持Range、ETag和条件请求的文件响应
+
+    - If-None-Match/If-Modified-Since命中时返回304
+    - 单个字节范围返回206，If-Range与当前文件不一致时返回完整文件
+    - 默认在线程中按DOWNLOAD_CHUNK_SIZE用pread分块读取并发送，内存占用与文件大小无关；
+      本项目使用的uvicorn走的就是这条路径
+    - 只有ASGI服务器在scope中声明了http.response.zerocopysend扩展时才交给服务器用sendfile发送，
+      uvicorn不提供该扩展，因此部署时没有零拷贝带来的加速
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        stat_result: os.stat_result,
+        filename: Optional[str] = None,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE
+    ):
+        self.path = path
+        self.stat_result = stat_result
+        self.filename = filename or path.name
+        self.chunk_size = chunk_size
+        self.status_code = 200
+        self.background = None
+        self.media_type = mimetypes.guess_type(self.filename)[0] or "application/octet-stream"
+        self.etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        self.last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        self.init_headers({
+            "accept-ranges": "bytes",
+            "etag": self.etag,
+            "last-modified": self.last_modified,
+            "content-disposition": self._content_disposition(),
+        })
+
+    def _content_disposition(self) -> str:
+        """附件文件名，非ASCII字符按RFC 5987编码"""
+        fallback = self.filename.encode("ascii", "replace").decode().replace('"', "_").replace("?", "_")
+        return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(self.filename)}"
+
+    def _not_modified(self, headers: Headers) -> bool:
+        """条件请求是否命中（If-None-Match优先于If-Modified-Since）"""
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(self.stat_result.st_mtime) <= since
+        return False
+
+    def _range_applies(self, headers: Headers) -> bool:
+        """If-Range与当前文件一致（或没有If-Range）时才按范围响应"""
+        if_range = headers.get("if-range")
+        if if_range is None:
+            return True
+        return if_range.strip() in (self.etag, self.last_modified)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        headers = Headers(scope=scope)
+        size = self.stat_result.st_size
+        start, end = 0, size - 1
+        status = 200
+
+        if self._not_modified(headers):
+            status = 304
+        elif "range" in headers and scope["method"] == "GET" and self._range_applies(headers):
+            try:
+                requested = parse_range(headers["range"], size)
+            except ValueError:
+                self.headers["content-range"] = f"bytes */{size}"
+                self.headers["content-length"] = "0"
+                await self._send_start(send, 416)
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if requested is not None:
+                start, end = requested
+                status = 206
+                self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        # 实际的状态码、范围和Content-Length在收到请求后确定
+        length = end - start + 1 if status != 304 else 0
+        if status != 304:
+            self.headers["content-length"] = str(length)
+        await self._send_start(send, status)
+
+        if scope["method"] == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b""})
+        elif ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            await self._send_zerocopy(send, start, length)
+        else:
+            # 客户端断开时停止读取，不必把剩余的文件读完
+            async with anyio.create_task_group() as task_group:
+                async def send_then_stop():
+                    await self._send_chunks(send, start, length)
+                    task_group.cancel_scope.cancel()
+
+                task_group.start_soon(send_then_stop)
+                await self._wait_for_disconnect(receive)
+                task_group.cancel_scope.cancel()
+
+    async def _send_start(self, send: Send, status: int):
+        self.status_code = status
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": self.raw_headers,
+        })
+
+    async def _send_zerocopy(self, send: Send, start: int, length: int):
+        """由服务器使用sendfile发送"""
+        file = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            await send({
+                "type": ZEROCOPY_EXTENSION,
+                "file": file,
+                "offset": start,
+                "count": length,
+                "more_body": False,
+            })
+        finally:
+            await anyio.to_thread.run_sync(file.close)
+
+    async def _send_chunks(self, send: Send, start: int, length: int):
+        """在线程中按块读取并发送，同一时间只有一个块在内存中"""
+        fd = await anyio.to_thread.run_sync(os.open, self.path, os.O_RDONLY)
+        try:
+            offset, remaining = start, length
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(os.pread, fd, min(self.chunk_size, remaining), offset)
+                if not chunk:
+                    # 文件在发送过程中被截断
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    async def _wait_for_disconnect(receive: Receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
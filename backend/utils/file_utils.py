@@ -1,11 +1,16 @@
+import errno
 import os
 import re
 import shutil
+import tempfile
+import uuid
 from pathlib import Path
 from typing import Optional
-from datetime import datetime, timedelta
 from ..config import TEMP_DIR, DOWNLOADS_DIR
 
+# 大多数文件系统对单个文件名的字节数限制
+MAX_FILENAME_BYTES = 255
+
 def sanitize_filename(filename: str) -> str:
     """
     安全化文件名，移除不安全字符
@@ -20,16 +25,38 @@ def sanitize_filename(filename: str) -> str:
     safe_filename = re.sub(r'[^\w\-\.]', '_', filename)
     # 确保文件名不以点开始（避免隐藏文件）
     safe_filename = safe_filename.lstrip('.')
-    # 限制文件名长度
-    if len(safe_filename) > 255:
+    # 限制文件名长度（按UTF-8字节数，中文等字符每个占3字节）
+    if len(safe_filename.encode('utf-8')) > MAX_FILENAME_BYTES:
         name, ext = os.path.splitext(safe_filename)
-        safe_filename = name[:255-len(ext)] + ext
+        safe_filename = _fit_name(name, ext)
     return safe_filename or 'unnamed_file'
 
+def _fit_name(name: str, tail: str) -> str:
+    """
+    截断name，使name+tail的UTF-8编码不超过MAX_FILENAME_BYTES字节，不会截断多字节字符
+    
+    Args:
+        name: 可以截断的文件名主干
+        tail: 必须保留的部分，如随机后缀和扩展名；过长时不再当作扩展名保留
+    """
+    budget = MAX_FILENAME_BYTES - len(tail.encode('utf-8'))
+    if budget < MAX_FILENAME_BYTES // 2:
+        name, tail = name + tail, ''
+        budget = MAX_FILENAME_BYTES
+    return name.encode('utf-8')[:budget].decode('utf-8', errors='ignore') + tail
+
+def _unique_name(filename: str) -> str:
+    """在文件名和扩展名之间加入随机后缀，必要时截断文件名为后缀留出空间"""
+    name, ext = os.path.splitext(filename)
+    return _fit_name(name, f"_{uuid.uuid4().hex[:8]}{ext}")
+
 def get_safe_filepath(filename: str, directory: Path = DOWNLOADS_DIR) -> Path:
     """
     获取安全的文件路径，避免文件名冲突
     
+    文件名已存在时加入随机后缀，不会逐个尝试编号。返回的路径没有被占用，
+    需要保证不被并发写入覆盖时使用reserve_filepath。
+    
     Args:
         filename: 原始文件名
         directory: 目标目录
@@ -39,62 +66,111 @@ def get_safe_filepath(filename: str, directory: Path = DOWNLOADS_DIR) -> Path:
     """
     safe_filename = sanitize_filename(filename)
     filepath = directory / safe_filename
-    
-    # 如果文件已存在，添加数字后缀
     if filepath.exists():
-        name, ext = os.path.splitext(safe_filename)
-        counter = 1
-        while (directory / f"{name}_{counter}{ext}").exists():
-            counter += 1
-        filepath = directory / f"{name}_{counter}{ext}"
-    
+        filepath = directory / _unique_name(safe_filename)
     return filepath
 
-def create_temp_file(prefix: str = "", suffix: str = "") -> Path:
+def reserve_filepath(filename: str, directory: Path = DOWNLOADS_DIR) -> Path:
     """
-    创建临时文件
+    以独占方式(O_EXCL)创建空文件来占用文件名，多个进程同时占用同一文件名时只有一个成功
     
     Args:
-        prefix: 文件名前缀
-        suffix: 文件扩展名
+        filename: 原始文件名
+        directory: 目标目录
         
     Returns:
-        临时文件路径
+        已占用的文件路径，调用方用os.replace写入内容
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{prefix}_{timestamp}{suffix}" if prefix else f"temp_{timestamp}{suffix}"
-    return TEMP_DIR / sanitize_filename(filename)
+    safe_filename = sanitize_filename(filename)
+    candidates = [safe_filename] + [_unique_name(safe_filename) for _ in range(3)]
+    for candidate in candidates:
+        filepath = directory / candidate
+        try:
+            fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        return filepath
+    raise FileExistsError(f"无法分配文件名: {safe_filename}")
 
-def cleanup_temp_files(max_age: Optional[timedelta] = None):
+def create_temp_dir(prefix: str = "job_") -> Path:
     """
-    清理临时文件
+    为一次下载创建独立的临时目录，下载的所有中间文件都写在其中
     
     Args:
-        max_age: 文件最大保留时间，默认24小时
+        prefix: 目录名前缀
+        
+    Returns:
+        临时目录路径
+    """
+    return Path(tempfile.mkdtemp(prefix=prefix, dir=TEMP_DIR))
+
+def job_temp_dir(job_id: str) -> Path:
     """
-    if max_age is None:
-        max_age = timedelta(hours=24)
+    下载任务固定的临时目录，任务重新执行时使用同一目录，从其中的部分文件继续下载
+    
+    Args:
+        job_id: 任务ID（下载会话ID）
         
-    current_time = datetime.now()
+    Returns:
+        临时目录路径（目录不一定存在）
+    """
+    return TEMP_DIR / f"job_{sanitize_filename(job_id)}"
+
+def has_partial_files(directory: Path) -> bool:
+    """
+    任务临时目录中是否留有上次未完成的下载文件
     
+    Args:
+        directory: 任务临时目录（见job_temp_dir）
+    """
     try:
-        for file in TEMP_DIR.iterdir():
-            if not file.is_file():
-                continue
-                
-            file_age = current_time - datetime.fromtimestamp(file.stat().st_mtime)
-            if file_age > max_age:
-                try:
-                    file.unlink()
-                except Exception as e:
-                    print(f"清理临时文件失败 {file}: {str(e)}")
-    except Exception as e:
-        print(f"清理临时文件时发生错误: {str(e)}")
+        with os.scandir(directory) as entries:
+            return any(entry.is_file() for entry in entries)
+    except FileNotFoundError:
+        return False
+
+def create_temp_file(prefix: str = "", suffix: str = "", job_id: Optional[str] = None) -> Path:
+    """
+    在新的独立临时目录中分配临时文件路径，并发的下载不会使用同一路径
+    
+    Args:
+        prefix: 文件名前缀
+        suffix: 文件扩展名
+        job_id: 指定时使用该任务固定的临时目录（见job_temp_dir），保留其中已有的文件
+        
+    Returns:
+        临时文件路径（文件尚未创建）
+    """
+    filename = f"{prefix}{suffix}" if prefix else f"temp{suffix}"
+    if job_id:
+        directory = job_temp_dir(job_id)
+        directory.mkdir(parents=True, exist_ok=True)
+    else:
+        directory = create_temp_dir()
+    return directory / sanitize_filename(filename)
+
+def remove_temp_dir(temp_file: Path):
+    """
+    删除临时文件所在的独立临时目录及其中的所有中间文件
+    
+    Args:
+        temp_file: create_temp_file返回的路径
+    """
+    directory = temp_file.parent
+    if directory.parent == TEMP_DIR:
+        shutil.rmtree(directory, ignore_errors=True)
+    else:
+        # 不在独立目录中的旧临时文件
+        for path in directory.glob(f"{temp_file.stem}*"):
+            path.unlink(missing_ok=True)
 
 def move_to_downloads(temp_file: Path, final_name: str) -> Path:
     """
     将临时文件移动到下载目录
     
+    先独占地占用最终文件名，再用os.replace原子替换，并发的下载不会互相覆盖。
+    
     Args:
         temp_file: 临时文件路径
         final_name: 最终文件名
@@ -105,6 +181,44 @@ def move_to_downloads(temp_file: Path, final_name: str) -> Path:
     if not temp_file.exists():
         raise FileNotFoundError(f"临时文件不存在: {temp_file}")
         
-    final_path = get_safe_filepath(final_name)
-    shutil.move(str(temp_file), str(final_path))
-    return final_path 
\ No newline at end of file
+    final_path = reserve_filepath(final_name)
+    try:
+        try:
+            os.replace(temp_file, final_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # 临时目录在其他文件系统上时复制后删除
+            shutil.copy2(temp_file, final_path)
+            temp_file.unlink()
+    except BaseException:
+        final_path.unlink(missing_ok=True)
+        raise
+    return final_path
+
+def link_or_copy(source: Path, filename: str) -> Path:
+    """
+    在下载目录中为已有文件创建一个新文件名，优先使用硬链接（不占用额外空间），
+    文件系统不支持时复制
+    
+    Args:
+        source: 已有文件
+        filename: 新文件名
+        
+    Returns:
+        新文件路径
+    """
+    target = reserve_filepath(filename, source.parent)
+    # 硬链接不能覆盖已存在的文件，先链接到隐藏的临时名再替换占用的文件名
+    staging = source.parent / f".{uuid.uuid4().hex}.link"
+    try:
+        try:
+            os.link(source, staging)
+        except OSError:
+            shutil.copy2(source, staging)
+        os.replace(staging, target)
+    except BaseException:
+        staging.unlink(missing_ok=True)
+        target.unlink(missing_ok=True)
+        raise
+    return target
@@ -10,6 +10,17 @@ SUPPORTED_PLATFORMS = {
     'bilibili.com': r'^https?://(?:www\.)?bilibili\.com/video/[a-zA-Z0-9]+',
 }
 
+# 支持的合集（播放列表和频道）
+SUPPORTED_COLLECTIONS = {
+    'youtube.com': {
+        'playlist': r'^https?://(?:www\.|m\.)?youtube\.com/(?:playlist|watch)\?(?:.*&)?list=([a-zA-Z0-9_-]+)',
+        'channel': r'^https?://(?:www\.|m\.)?youtube\.com/((?:@|channel/|c/|user/)[\w.%-]+)',
+    },
+    'bilibili.com': {
+        'channel': r'^https?://space\.bilibili\.com/(\d+)',
+    },
+}
+
 def validate_video_url(url: str) -> Tuple[bool, str]:
     """
     验证视频URL
@@ -88,4 +99,54 @@ def extract_video_id(url: str) -> Tuple[str, str]:
         if video_id:
             return video_id.group(1), 'bilibili'
             
-    raise ValidationError("无法从URL中提取视频ID") 
\ No newline at end of file
+    raise ValidationError("无法从URL中提取视频ID") 
+
+def extract_collection_id(url: str) -> Tuple[str, str, str]:
+    """
+    从播放列表或频道URL中提取合集ID
+    
+    Args:
+        url: 播放列表或频道URL
+        
+    Returns:
+        (合集ID, 合集类型, 平台名称)，合集类型为"playlist"或"channel"
+        
+    Raises:
+        ValidationError: URL不是支持的合集地址时抛出
+    """
+    if not url:
+        raise ValidationError("URL不能为空")
+        
+    try:
+        parsed = urlparse(url)
+    except Exception:
+        raise ValidationError("无效的URL格式")
+    if not all([parsed.scheme, parsed.netloc]):
+        raise ValidationError("无效的URL格式")
+        
+    domain = parsed.netloc.replace('www.', '')
+    platform = next((p for p in SUPPORTED_COLLECTIONS.keys() if p in domain), None)
+    if not platform:
+        raise ValidationError("不支持的视频平台")
+        
+    for kind, pattern in SUPPORTED_COLLECTIONS[platform].items():
+        match = re.match(pattern, url)
+        if match:
+            return match.group(1), kind, platform.split('.')[0]
+            
+    raise ValidationError("无效的播放列表或频道URL格式")
+
+def build_video_url(video_id: str, platform: str) -> str:
+    """
+    根据视频ID和平台构造标准视频URL
+    
+    Args:
+        video_id: 视频ID
+        platform: 平台名称（extract_video_id返回的平台）
+        
+    Returns:
+        视频URL
+    """
+    if platform == 'bilibili':
+        return f"https://www.bilibili.com/video/{video_id}"
+    return f"https://www.youtube.com/watch?v={video_id}"
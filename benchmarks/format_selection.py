@@ -0,0 +1,85 @@
+"""格式选择微基准
+
+生成与YouTube相近的格式列表（多种分辨率、帧率、编码和容器，以及音频和故事板格式），
+分别测量格式索引的构建和在已缓存索引上的格式选择耗时。
+
+用法:
+    python benchmarks/format_selection.py [--formats 150] [--number 2000]
+"""
+import argparse
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.models.video import VideoInfo, VideoFormat, FormatConstraints  # noqa: E402
+from backend.models.format_index import FormatIndex  # noqa: E402
+from backend.services.format_selector import select_format  # noqa: E402
+
+HEIGHTS = [144, 240, 360, 480, 720, 1080, 1440, 2160, 4320]
+VIDEO_CODECS = [("avc1.640028", "mp4"), ("vp09.00.40.08", "webm"), ("av01.0.08M.08", "mp4"), ("hev1.1.6.L120.90", "mp4")]
+AUDIO_CODECS = [("mp4a.40.2", "m4a"), ("opus", "webm")]
+
+def make_formats(count: int, seed: int = 0) -> list:
+    """生成count个左右的格式"""
+    rng = random.Random(seed)
+    formats = []
+    i = 0
+    while len(formats) < count:
+        i += 1
+        kind = rng.random()
+        if kind < 0.7:
+            height = rng.choice(HEIGHTS)
+            vcodec, ext = rng.choice(VIDEO_CODECS)
+            combined = rng.random() < 0.1
+            formats.append(VideoFormat(
+                format_id=str(100 + i), ext=ext, resolution=f"{height * 16 // 9}x{height}",
+                filesize=rng.choice([None, height * 50_000 * rng.randint(1, 10)]),
+                vcodec=vcodec, acodec="mp4a.40.2" if combined else "none",
+                format_note=f"{height}p", fps=rng.choice([24, 30, 60]), tbr=height * rng.uniform(1.5, 6)
+            ))
+        elif kind < 0.9:
+            acodec, ext = rng.choice(AUDIO_CODECS)
+            formats.append(VideoFormat(
+                format_id=str(100 + i), ext=ext, resolution="audio only", filesize=None,
+                vcodec="none", acodec=acodec, format_note="仅音频", fps=None, tbr=rng.uniform(48, 256)
+            ))
+        else:
+            # 故事板等既无视频也无音频的格式
+            formats.append(VideoFormat(
+                format_id=f"sb{i}", ext="mhtml", resolution="48x27", filesize=None,
+                vcodec="none", acodec="none", format_note="storyboard", fps=None, tbr=None
+            ))
+    return formats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--formats", type=int, default=150, help="每个视频的格式数")
+    parser.add_argument("--number", type=int, default=2000, help="每项测量的执行次数")
+    args = parser.parse_args()
+
+    formats = make_formats(args.formats)
+    info = VideoInfo(
+        id="bench", title="bench", description=None, duration=600,
+        thumbnail=None, uploader=None, formats=formats
+    )
+    cases = {
+        "720p": FormatConstraints(max_height=720),
+        "1080p av1>vp9": FormatConstraints(max_height=1080, codecs=["av1", "vp9"]),
+        "mp4 <=200MB": FormatConstraints(container="mp4", max_bytes=200 * 1024 * 1024),
+        "single only": FormatConstraints(allow_merge=False),
+    }
+
+    elapsed = timeit.timeit(lambda: FormatIndex(formats), number=args.number)
+    print(f"{len(formats)} 个格式")
+    print(f"{'构建索引':<16}{elapsed / args.number * 1e6:10.1f} µs/次")
+
+    for name, constraints in cases.items():
+        elapsed = timeit.timeit(lambda: select_format(info, constraints), number=args.number)
+        selection = select_format(info, constraints)
+        print(f"{name:<16}{elapsed / args.number * 1e6:10.1f} µs/次  -> {selection.format_id} ({selection.height}p)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""分片并行下载基准
+
+在本地启动一个HLS分片服务器（每个连接限速并带固定延迟，模拟单连接吞吐受限的CDN），
+用不同的分片并行数下载同一个播放列表，比较耗时和吞吐量。
+
+用法:
+    python benchmarks/fragment_download.py [--segments 40] [--segment-size 262144]
+        [--rate 1048576] [--latency 0.05] [--connections 1,2,4,8]
+"""
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.services.video_info import _run_download  # noqa: E402
+
+def make_handler(segments: int, segment_size: int, rate: int, latency: float):
+    """创建请求处理类：播放列表直接返回，分片按rate字节/秒限速发送"""
+    playlist = "\n".join(
+        ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:2", "#EXT-X-MEDIA-SEQUENCE:0"]
+        + [f"#EXTINF:2.0,\nseg{i}.ts" for i in range(segments)]
+        + ["#EXT-X-ENDLIST", ""]
+    ).encode()
+    payload = bytes(range(256)) * (segment_size // 256 + 1)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path.startswith("/stream.m3u8"):
+                body = playlist
+                content_type = "application/vnd.apple.mpegurl"
+            elif self.path.startswith("/seg"):
+                body = payload[:segment_size]
+                content_type = "video/mp2t"
+            else:
+                self.send_error(404)
+                return
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            # 每个连接按rate限速，每次发送1/20秒的数据量
+            step = max(1, rate // 20)
+            for offset in range(0, len(body), step):
+                self.wfile.write(body[offset:offset + step])
+                if content_type == "video/mp2t":
+                    time.sleep(step / rate)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def download(url: str, connections: int) -> tuple:
+    """下载一次，返回(耗时, 字节数)"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_file = Path(temp_dir) / "temp"
+        started = time.perf_counter()
+        # 屏蔽yt-dlp的详细输出
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            info = _run_download(url, None, temp_file, lambda data: None, lambda: False, connections)
+        elapsed = time.perf_counter() - started
+        return elapsed, Path(info['filepath']).stat().st_size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=int, default=40, help="分片数")
+    parser.add_argument("--segment-size", type=int, default=256 * 1024, help="每个分片的字节数")
+    parser.add_argument("--rate", type=int, default=1024 * 1024, help="每个连接的限速(字节/秒)")
+    parser.add_argument("--latency", type=float, default=0.05, help="每个请求的首字节延迟(秒)")
+    parser.add_argument("--connections", default="1,2,4,8", help="逗号分隔的分片并行数")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0),
+        make_handler(args.segments, args.segment_size, args.rate, args.latency)
+    )
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/stream.m3u8"
+
+    total = args.segments * args.segment_size
+    print(f"{args.segments} 个分片，共 {total / 1024 / 1024:.1f}MB，单连接限速 {args.rate / 1024 / 1024:.1f}MB/s")
+    baseline = None
+    try:
+        for connections in (int(c) for c in args.connections.split(",")):
+            elapsed, size = download(url, connections)
+            baseline = baseline or elapsed
+            print(
+                f"并行 {connections:>2}: {elapsed:6.2f}s  {size / elapsed / 1024 / 1024:6.2f}MB/s  "
+                f"加速 {baseline / elapsed:4.1f}x"
+            )
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,236 @@
+const CLIENT_ID_KEY = 'downloadClientId';
+const SESSIONS_KEY = 'downloadSessions';
+const TERMINAL_STATUSES = ['complete', 'error', 'cancelled'];
+const RECONNECT_BASE_DELAY = 500;
+const RECONNECT_MAX_DELAY = 30000;
+
+/**
+ * 获取浏览器保存的持久客户端ID，下载会话归属于该ID而不是某条连接
+ * @returns {string}
+ */
+function getClientId() {
+    let clientId = localStorage.getItem(CLIENT_ID_KEY);
+    if (!clientId) {
+        clientId = crypto.randomUUID ? crypto.randomUUID()
+            : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+        localStorage.setItem(CLIENT_ID_KEY, clientId);
+    }
+    return clientId;
+}
+
+/**
+ * 下载WebSocket客户端
+ *
+ * 所有下载共用一条WebSocket连接，通过会话ID区分。服务端把多个下载的
+ * 最新状态合并成一帧 {type: 'progress', updates: [...]} 推送。
+ * 连接断开后按指数退避（带随机抖动）重连，并通过resume恢复未结束的下载。
+ */
+class DownloadClient {
+    constructor() {
+        this.ws = null;
+        this.connecting = null;
+        this.nextRequestId = 1;
+        this.requests = new Map();  // request_id -> {resolve, reject}
+        this.handlers = new Map();  // session_id -> 状态回调
+        this.reconnectAttempts = 0;
+        this.reconnectTimer = null;
+    }
+
+    /**
+     * 本地保存的未结束下载会话ID
+     * @returns {Array<string>}
+     */
+    getStoredSessions() {
+        try {
+            return JSON.parse(localStorage.getItem(SESSIONS_KEY)) || [];
+        } catch (error) {
+            return [];
+        }
+    }
+
+    storeSession(sessionId) {
+        const sessions = this.getStoredSessions();
+        if (!sessions.includes(sessionId)) {
+            sessions.push(sessionId);
+            localStorage.setItem(SESSIONS_KEY, JSON.stringify(sessions));
+        }
+    }
+
+    forgetSession(sessionId) {
+        this.handlers.delete(sessionId);
+        const sessions = this.getStoredSessions().filter(id => id !== sessionId);
+        localStorage.setItem(SESSIONS_KEY, JSON.stringify(sessions));
+    }
+
+    /**
+     * 获取已建立的WebSocket连接，必要时新建
+     * @returns {Promise<WebSocket>}
+     */
+    connect() {
+        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+            return Promise.resolve(this.ws);
+        }
+        if (this.connecting) {
+            return this.connecting;
+        }
+
+        this.connecting = new Promise((resolve, reject) => {
+            const clientId = encodeURIComponent(getClientId());
+            const ws = new WebSocket(`ws://${window.location.host}/ws/download?client_id=${clientId}`);
+
+            ws.onopen = () => {
+                console.log('WebSocket连接已建立');
+                const reconnected = this.reconnectAttempts > 0;
+                this.ws = ws;
+                this.connecting = null;
+                this.reconnectAttempts = 0;
+                resolve(ws);
+                if (reconnected && this.handlers.size > 0) {
+                    // 重新订阅断线期间仍在进行的下载
+                    this.resume([...this.handlers.keys()]).catch(error => {
+                        console.error('恢复下载状态失败:', error);
+                    });
+                }
+            };
+
+            ws.onerror = (error) => {
+                console.error('WebSocket错误:', error);
+                if (this.ws !== ws) {
+                    this.connecting = null;
+                    reject(new Error('无法连接到服务器'));
+                }
+            };
+
+            ws.onclose = () => {
+                console.log('WebSocket连接已关闭');
+                this.ws = null;
+                for (const { reject } of this.requests.values()) {
+                    reject(new Error('连接已断开'));
+                }
+                this.requests.clear();
+                if (this.handlers.size > 0) {
+                    this.scheduleReconnect();
+                }
+            };
+
+            ws.onmessage = (event) => this.handleMessage(JSON.parse(event.data));
+        });
+        return this.connecting;
+    }
+
+    /**
+     * 安排一次重连，延迟按指数退避并加入随机抖动，避免服务重启后所有客户端同时重连
+     */
+    scheduleReconnect() {
+        if (this.reconnectTimer) {
+            return;
+        }
+        const delay = Math.min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** this.reconnectAttempts);
+        this.reconnectAttempts++;
+        this.reconnectTimer = setTimeout(() => {
+            this.reconnectTimer = null;
+            this.connect().catch(() => this.scheduleReconnect());
+        }, delay / 2 + Math.random() * delay / 2);
+    }
+
+    /**
+     * 发送带request_id的请求，等待服务端的应答
+     * @param {Object} message - 请求消息
+     * @returns {Promise<Object>} 应答消息
+     */
+    async request(message) {
+        const ws = await this.connect();
+        const requestId = String(this.nextRequestId++);
+        return new Promise((resolve, reject) => {
+            this.requests.set(requestId, { resolve, reject });
+            ws.send(JSON.stringify({ ...message, request_id: requestId }));
+        });
+    }
+
+    handleMessage(data) {
+        if (data.type === 'progress') {
+            data.updates.forEach(update => this.dispatch(update));
+            return;
+        }
+
+        const pending = this.requests.get(data.request_id);
+        if (!pending) {
+            console.warn('未处理的WebSocket消息:', data);
+            return;
+        }
+        this.requests.delete(data.request_id);
+        if (data.type === 'error') {
+            pending.reject(new Error(data.message));
+        } else {
+            pending.resolve(data);
+        }
+    }
+
+    /**
+     * 把状态更新交给对应会话的回调，会话结束后不再跟踪
+     * @param {Object} update - 会话状态
+     */
+    dispatch(update) {
+        const handler = this.handlers.get(update.session_id);
+        if (handler) {
+            handler(update);
+        }
+        if (TERMINAL_STATUSES.includes(update.status)) {
+            this.forgetSession(update.session_id);
+        }
+    }
+
+    /**
+     * 发起下载，发起者自动订阅该下载的状态
+     * @returns {Promise<string>} 下载会话ID
+     */
+    async download(url, formatId = null, onUpdate = null, audioFormat = null) {
+        const reply = await this.request({ type: 'download', url: url, format_id: formatId, audio_format: audioFormat });
+        this.storeSession(reply.session_id);
+        this.handlers.set(reply.session_id, onUpdate || (() => {}));
+        this.dispatch({ session_id: reply.session_id, status: 'queued', position: reply.position });
+        return reply.session_id;
+    }
+
+    /**
+     * 重新订阅下载会话，并用服务端的状态快照（包括断线期间的完成或失败）更新回调
+     * @param {Array<string>} sessionIds - 会话ID
+     * @param {Function} onUpdate - 可选，新的状态回调
+     * @returns {Promise<Array<Object>>} 会话状态快照
+     */
+    async resume(sessionIds, onUpdate = null) {
+        const reply = await this.request({ type: 'resume', session_ids: sessionIds });
+        reply.missing.forEach(sessionId => this.forgetSession(sessionId));
+        for (const snapshot of reply.sessions) {
+            if (onUpdate) {
+                this.handlers.set(snapshot.session_id, onUpdate);
+            }
+            this.dispatch(snapshot);
+        }
+        return reply.sessions;
+    }
+
+    async subscribe(sessionIds, onUpdate) {
+        const reply = await this.request({ type: 'subscribe', session_ids: sessionIds });
+        for (const sessionId of reply.session_ids) {
+            this.handlers.set(sessionId, onUpdate);
+        }
+        return reply.session_ids;
+    }
+
+    async unsubscribe(sessionIds) {
+        sessionIds.forEach(sessionId => this.handlers.delete(sessionId));
+        await this.request({ type: 'unsubscribe', session_ids: sessionIds });
+    }
+
+    async cancel(sessionId) {
+        const ws = await this.connect();
+        ws.send(JSON.stringify({ type: 'cancel', session_id: sessionId }));
+    }
+}
+
+const downloadClient = new DownloadClient();
+
 class VideoAPI {
     /**
      * 获取视频信息
@@ -42,52 +275,44 @@ class VideoAPI {
         }
     }
 
-    /**
-     * 创建WebSocket连接
-     * @returns {Promise<WebSocket>}
-     */
-    static createWebSocket() {
-        return new Promise((resolve, reject) => {
-            const ws = new WebSocket(`ws://${window.location.host}/ws/download`);
-            
-            ws.onopen = () => {
-                console.log('WebSocket连接已建立');
-                resolve(ws);
-            };
-            
-            ws.onerror = (error) => {
-                console.error('WebSocket错误:', error);
-                reject(error);
-            };
-            
-            ws.onclose = () => {
-                console.log('WebSocket连接已关闭');
-            };
-        });
-    }
-
     /**
      * 开始下载视频
      * @param {string} url - 视频URL
      * @param {string} formatId - 可选的格式ID
+     * @param {Function} onUpdate - 接收该下载状态更新的回调
+     * @param {string} audioFormat - 可选，仅音频下载的输出格式（original、m4a、opus、mp3）
+     * @returns {Promise<string>} 下载会话ID
      */
-    static async startDownload(url, formatId = null) {
+    static async startDownload(url, formatId = null, onUpdate = null, audioFormat = null) {
         try {
-            const ws = await this.createWebSocket();
-            
-            // 发送包含format_id的JSON消息
-            ws.send(JSON.stringify({
-                type: 'download',
-                url: url,
-                format_id: formatId
-            }));
-            
-            return ws;
+            return await downloadClient.download(url, formatId, onUpdate, audioFormat);
         } catch (error) {
             throw new Error(`下载错误: ${error.message}`);
         }
     }
+
+    /**
+     * 恢复本页面之前发起且尚未结束的下载（例如刷新页面或断线之后）
+     * @param {Function} onUpdate - 接收状态更新的回调
+     * @returns {Promise<Array<Object>>} 会话状态快照
+     */
+    static async resumeDownloads(onUpdate) {
+        const sessionIds = downloadClient.getStoredSessions();
+        if (sessionIds.length === 0) {
+            return [];
+        }
+        return await downloadClient.resume(sessionIds, onUpdate);
+    }
+
+    /**
+     * 取消下载
+     * @param {string} sessionId - 下载会话ID
+     */
+    static async cancelDownload(sessionId) {
+        await downloadClient.cancel(sessionId);
+    }
 }
 
 // 导出API类
+export { downloadClient };
 export default VideoAPI; 
\ No newline at end of file
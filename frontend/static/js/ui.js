@@ -83,12 +83,12 @@ export function initUI() {
             downloadButton.disabled = true;
             progressInfo.textContent = '准备下载...';
             
-            const ws = await VideoAPI.startDownload(url, formatId);
-            
-            ws.onmessage = (event) => {
-                const data = JSON.parse(event.data);
-                
-                if (data.status === 'downloading') {
+            await VideoAPI.startDownload(url, formatId, (data) => {
+                if (data.status === 'queued') {
+                    progressInfo.textContent = data.position > 0 ? `排队中，当前位置: ${data.position}` : '准备下载...';
+                } else if (data.status === 'waiting') {
+                    progressInfo.textContent = `等待存储空间: ${data.reason}`;
+                } else if (data.status === 'downloading') {
                     const percent = (data.downloaded_bytes / data.total_bytes * 100).toFixed(1);
                     const speed = formatSpeed(data.speed);
                     const eta = data.eta ? `${data.eta}秒` : '计算中';
@@ -98,13 +98,14 @@ export function initUI() {
                 } else if (data.status === 'complete') {
                     progressInfo.textContent = '下载完成！';
                     downloadButton.disabled = false;
-                    ws.close();
+                } else if (data.status === 'cancelled') {
+                    progressInfo.textContent = '下载已取消';
+                    downloadButton.disabled = false;
                 } else if (data.status === 'error') {
                     progressInfo.textContent = `错误: ${data.message}`;
                     downloadButton.disabled = false;
-                    ws.close();
                 }
-            };
+            });
         } catch (error) {
             alert(error.message);
             progress.style.display = 'none';
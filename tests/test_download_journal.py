@@ -0,0 +1,44 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from backend.services import download_journal
+from backend.services.download_journal import DownloadJournal
+from backend.services.download_manager import DownloadSession
+
+
+class JournalClaimTest(unittest.TestCase):
+    """恢复任务前的认领：多个worker共享同一个任务日志时只有一个能认领"""
+
+    def setUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        path = Path(self._temp.name) / "journal.db"
+        self.worker_a = DownloadJournal(path)
+        self.worker_b = DownloadJournal(path)
+        session = DownloadSession("http://example.com/v", "s1", client_id="client-a")
+        self.worker_a.record(session, Path(self._temp.name) / "job_s1")
+
+    def tearDown(self):
+        self.worker_a.close()
+        self.worker_b.close()
+        self._temp.cleanup()
+
+    def test_only_one_worker_claims(self):
+        self.assertTrue(self.worker_a.claim("s1"))
+        self.assertFalse(self.worker_b.claim("s1"))
+        self.assertFalse(self.worker_a.claim("missing"))
+
+    def test_claim_expires_after_lease(self):
+        self.assertTrue(self.worker_a.claim("s1"))
+        with mock.patch.object(download_journal, "JOURNAL_RESUME_LEASE", -1):
+            self.assertTrue(self.worker_b.claim("s1"))
+
+    def test_progress_clears_claim(self):
+        self.assertTrue(self.worker_a.claim("s1"))
+        self.worker_a.update_progress("s1", 1024)
+        self.assertTrue(self.worker_b.claim("s1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
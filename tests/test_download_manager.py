@@ -0,0 +1,97 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from backend.services.download_journal import DownloadJournal
+from backend.services.download_manager import DownloadManager, DownloadSession
+from backend.services.video_info import VideoInfoService
+from backend.utils.error_utils import DownloadCancelledError, DownloadError
+
+
+def make_manager(journal_path: Path) -> DownloadManager:
+    """绕过单例创建使用内存后端和临时任务日志的下载管理器"""
+    manager = object.__new__(DownloadManager)
+    manager._initialized = False
+    DownloadManager.__init__(manager)
+    manager._journal = DownloadJournal(journal_path)
+    return manager
+
+
+class CancelSessionTest(unittest.IsolatedAsyncioTestCase):
+    """取消顺序：下载停止后才确认取消并释放下载名额"""
+
+    async def asyncSetUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        self.manager = make_manager(Path(self._temp.name) / "journal.db")
+        self.log = []
+        log = self.log
+
+        async def fake_download_video(url, cancel_waiter=None, **kwargs):
+            await cancel_waiter
+            # 下载线程要过一段时间才会在进度钩子中发现取消
+            await asyncio.sleep(0.05)
+            log.append('stopped')
+            raise DownloadCancelledError("下载已取消")
+
+        self._original = VideoInfoService.download_video
+        VideoInfoService.download_video = staticmethod(fake_download_video)
+
+    async def asyncTearDown(self):
+        VideoInfoService.download_video = self._original
+        if self.manager._processor_task is not None:
+            self.manager._processor_task.cancel()
+        self.manager._journal.close()
+        self._temp.cleanup()
+
+    async def _start(self, session_id: str, client_id: str):
+        async def callback(event):
+            self.log.append(event['status'])
+
+        await self.manager.create_session("http://example.com/v", session_id, progress_callback=callback, client_id=client_id)
+        while (await self.manager.get_session(session_id)).status != "downloading":
+            await asyncio.sleep(0.01)
+
+    async def test_cancel_is_confirmed_after_download_stops(self):
+        await self._start("s1", "client-a")
+        self.assertEqual(await self.manager.cancel_session("s1", "client-a"), "cancelling")
+        self.assertEqual((await self.manager.get_stats())['active'], 1)
+
+        while (await self.manager.get_session("s1")).status != "cancelled":
+            await asyncio.sleep(0.01)
+        statuses = [s for s in self.log if s not in ('queued', 'downloading')]
+        self.assertEqual(statuses, ['cancelling', 'stopped', 'cancelled'])
+        self.assertEqual((await self.manager.get_stats())['active'], 0)
+
+    async def test_cancel_requires_owner(self):
+        await self._start("s2", "client-a")
+        with self.assertRaises(DownloadError):
+            await self.manager.cancel_session("s2", "client-b")
+        with self.assertRaises(DownloadError):
+            await self.manager.cancel_session("s2", None)
+        self.assertEqual((await self.manager.get_session("s2")).status, "downloading")
+        await self.manager.cancel_session("s2", "client-a")
+
+
+class ResumeInterruptedTest(unittest.IsolatedAsyncioTestCase):
+    """多个worker同时启动时，任务日志中的每个任务只恢复一次"""
+
+    async def test_each_entry_resumed_once(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            journal_path = Path(temp_dir) / "journal.db"
+            workers = [make_manager(journal_path) for _ in range(2)]
+            for i in range(3):
+                session = DownloadSession("http://example.com/v", f"s{i}", client_id="client-a")
+                workers[0]._journal.record(session, Path(temp_dir) / f"job_s{i}")
+
+            resumed = await asyncio.gather(*(worker.resume_interrupted() for worker in workers))
+            self.assertEqual(sum(resumed), 3)
+            for i in range(3):
+                owners = [worker for worker in workers if await worker.get_session(f"s{i}") is not None]
+                self.assertEqual(len(owners), 1)
+            for worker in workers:
+                worker._journal.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
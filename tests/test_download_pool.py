@@ -0,0 +1,35 @@
+import unittest
+
+import yt_dlp
+
+from backend.services.download_pool import _error_payload, _raise_error
+from backend.services.video_info import _SizeLimitExceeded
+from backend.utils.error_utils import AppError, DownloadError, VideoError
+
+
+class WorkerErrorMappingTest(unittest.TestCase):
+    """工作进程发回的错误与线程模式下的错误一致"""
+
+    def _roundtrip(self, error: Exception) -> AppError:
+        with self.assertRaises(AppError) as raised:
+            _raise_error(_error_payload(error))
+        return raised.exception
+
+    def test_size_limit(self):
+        error = self._roundtrip(_SizeLimitExceeded())
+        self.assertIs(type(error), DownloadError)
+        self.assertEqual(error.message, "视频文件超过大小限制")
+
+    def test_yt_dlp_error_goes_through_handle_error(self):
+        error = self._roundtrip(yt_dlp.utils.DownloadError("ERROR: Private video. Sign in if you've been granted access"))
+        self.assertIs(type(error), VideoError)
+        self.assertEqual(error.message, "这是一个私密视频")
+
+    def test_unknown_error_keeps_status_code(self):
+        error = self._roundtrip(RuntimeError("boom"))
+        self.assertIs(type(error), AppError)
+        self.assertEqual(error.status_code, 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from backend.services.download_manager import DownloadSession
+from backend.services.download_queue import FairDownloadQueue
+
+
+def make_session(session_id: str, client_id: str, priority: str = "interactive") -> DownloadSession:
+    return DownloadSession("http://example.com/" + session_id, session_id, client_id=client_id, priority=priority)
+
+
+class FairDownloadQueueTest(unittest.TestCase):
+    """公平队列：先按优先级，同一优先级内按客户端轮转"""
+
+    def _drain(self, queue: FairDownloadQueue):
+        order = []
+        while True:
+            session = queue.pop()
+            if session is None:
+                return order
+            order.append(session.session_id)
+
+    def test_clients_take_turns(self):
+        queue = FairDownloadQueue()
+        for index in range(3):
+            queue.push(make_session(f"a{index}", "a"))
+        queue.push(make_session("b0", "b"))
+        queue.push(make_session("b1", "b"))
+        self.assertEqual([s.session_id for s in queue], ["a0", "b0", "a1", "b1", "a2"])
+        self.assertEqual(self._drain(queue), ["a0", "b0", "a1", "b1", "a2"])
+        self.assertEqual(len(queue), 0)
+
+    def test_higher_priority_first(self):
+        queue = FairDownloadQueue()
+        queue.push(make_session("bulk", "a", priority="bulk"))
+        queue.push(make_session("interactive", "b"))
+        self.assertEqual(self._drain(queue), ["interactive", "bulk"])
+
+    def test_remove_and_position(self):
+        queue = FairDownloadQueue()
+        queue.push(make_session("a0", "a"))
+        queue.push(make_session("a1", "a"))
+        queue.push(make_session("b0", "b"))
+        self.assertEqual(queue.position("a1"), 3)
+        self.assertEqual(queue.remove("a0").session_id, "a0")
+        self.assertIsNone(queue.remove("missing"))
+        self.assertEqual(len(queue), 2)
+        self.assertEqual(queue.position("a1"), 1)
+        self.assertEqual(queue.position("missing"), 0)
+        self.assertEqual(self._drain(queue), ["a1", "b0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
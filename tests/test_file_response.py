@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.utils.file_response import RangeFileResponse, parse_range
+
+
+class ParseRangeTest(unittest.TestCase):
+    """Range请求头解析：结果为包含两端的(起始, 结束)"""
+
+    def test_explicit_range(self):
+        self.assertEqual(parse_range("bytes=0-499", 1000), (0, 499))
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_range("bytes=500-", 1000), (500, 999))
+
+    def test_end_is_clamped_to_size(self):
+        self.assertEqual(parse_range("bytes=900-2000", 1000), (900, 999))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range("bytes=-200", 1000), (800, 999))
+        self.assertEqual(parse_range("bytes=-5000", 1000), (0, 999))
+
+    def test_unsatisfiable(self):
+        with self.assertRaises(ValueError):
+            parse_range("bytes=1000-", 1000)
+        with self.assertRaises(ValueError):
+            parse_range("bytes=-0", 1000)
+        with self.assertRaises(ValueError):
+            parse_range("bytes=-10", 0)
+
+    def test_ignored_headers_fall_back_to_full_file(self):
+        for header in ("items=0-1", "bytes=0-1,5-6", "bytes=abc-", "bytes=5-1", "bytes=-", "bytes=5"):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1000))
+
+    def test_unit_is_case_insensitive(self):
+        self.assertEqual(parse_range("Bytes=0-0", 10), (0, 0))
+
+
+class RangeFileResponseTest(unittest.TestCase):
+    """分块读取路径（uvicorn下使用的路径）的范围和条件请求"""
+
+    def setUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        path = Path(self._temp.name) / "video.mp4"
+        path.write_bytes(bytes(range(256)) * 40)
+        app = FastAPI()
+
+        @app.get("/file")
+        def serve():
+            return RangeFileResponse(path, os.stat(path), chunk_size=1000)
+
+        self.client = TestClient(app)
+        self.content = path.read_bytes()
+
+    def tearDown(self):
+        self._temp.cleanup()
+
+    def test_full_file(self):
+        response = self.client.get("/file")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.content)
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+
+    def test_partial_content_spans_chunks(self):
+        response = self.client.get("/file", headers={"Range": "bytes=999-2500"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers["content-range"], f"bytes 999-2500/{len(self.content)}")
+        self.assertEqual(response.content, self.content[999:2501])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get("/file", headers={"Range": f"bytes={len(self.content)}-"})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["content-range"], f"bytes */{len(self.content)}")
+
+    def test_etag_and_if_range(self):
+        etag = self.client.get("/file").headers["etag"]
+        self.assertEqual(self.client.get("/file", headers={"If-None-Match": etag}).status_code, 304)
+        stale = self.client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        self.assertEqual(stale.status_code, 200)
+        fresh = self.client.get("/file", headers={"Range": "bytes=0-9", "If-Range": etag})
+        self.assertEqual(fresh.content, self.content[:10])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from backend.utils.file_utils import MAX_FILENAME_BYTES, reserve_filepath, sanitize_filename
+
+
+class ReserveFilepathTest(unittest.TestCase):
+    """文件名按UTF-8字节数限制，重名时加入的随机后缀不会使文件名超长"""
+
+    def setUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._temp.name)
+
+    def tearDown(self):
+        self._temp.cleanup()
+
+    def test_sanitize_limits_bytes_and_keeps_extension(self):
+        name = sanitize_filename("视频标题" * 100 + ".mp4")
+        self.assertLessEqual(len(name.encode('utf-8')), MAX_FILENAME_BYTES)
+        self.assertTrue(name.endswith(".mp4"))
+        self.assertTrue(name[:-4].strip("视频标题") == "")
+
+    def test_reserve_long_multibyte_name_twice(self):
+        filename = "长" * 120 + ".mp4"
+        self.assertGreaterEqual(len(filename.encode('utf-8')), 255)
+        first = reserve_filepath(filename, self.directory)
+        second = reserve_filepath(filename, self.directory)
+        self.assertNotEqual(first, second)
+        for path in (first, second):
+            self.assertTrue(path.exists())
+            self.assertEqual(path.suffix, ".mp4")
+            self.assertLessEqual(len(path.name.encode('utf-8')), MAX_FILENAME_BYTES)
+
+    def test_short_name_is_unchanged(self):
+        self.assertEqual(reserve_filepath("clip.mp4", self.directory).name, "clip.mp4")
+
+
+if __name__ == "__main__":
+    unittest.main()
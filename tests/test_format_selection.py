@@ -0,0 +1,40 @@
+import unittest
+
+from backend.models.video import VideoInfo, VideoFormat
+from backend.services.video_info import VideoInfoService
+
+
+def make_format(format_id, resolution, vcodec, acodec, tbr):
+    return VideoFormat(
+        format_id=format_id, ext="mp4", resolution=resolution, filesize=None,
+        vcodec=vcodec, acodec=acodec, format_note="", fps=None, tbr=tbr
+    )
+
+
+def make_info(formats):
+    return VideoInfo(
+        id="x", title="t", description=None, duration=10, thumbnail=None, uploader=None, formats=formats
+    )
+
+
+AUDIO = make_format("140", "audio only", "none", "mp4a.40.2", 128)
+COMBINED_360 = make_format("18", "640x360", "avc1.4d401e", "mp4a.40.2", 600)
+VIDEO_720 = make_format("136", "1280x720", "avc1.64001f", "none", 2000)
+
+
+class BestFormatTest(unittest.TestCase):
+    """get_best_format保持原有语义：返回可以直接下载的格式"""
+
+    def test_prefers_combined_format_over_video_only(self):
+        best = VideoInfoService.get_best_format(make_info([AUDIO, COMBINED_360, VIDEO_720]), "720p")
+        self.assertIsInstance(best, VideoFormat)
+        self.assertEqual(best.format_id, "18")
+
+    def test_returns_full_selection_when_merge_is_required(self):
+        best = VideoInfoService.get_best_format(make_info([AUDIO, VIDEO_720]), "720p")
+        self.assertEqual(best.format_id, "136+140")
+        self.assertEqual(best.audio.format_id, "140")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from backend.services import job_backend
+from backend.services.download_manager import DownloadSession
+from backend.services.job_backend import SqliteJobBackend
+
+
+class SqliteLeaseTest(unittest.IsolatedAsyncioTestCase):
+    """下载租约：持有名额的worker退出后，租约过期，名额交给其他worker"""
+
+    async def asyncSetUp(self):
+        self._temp = tempfile.TemporaryDirectory()
+        path = Path(self._temp.name) / "jobs.db"
+        self.worker_a = SqliteJobBackend(path, max_active=1, lease_ttl=30)
+        self.worker_b = SqliteJobBackend(path, max_active=1, lease_ttl=30)
+        await self.worker_a.add_session(DownloadSession("http://example.com/1", "s1", client_id="c1"))
+        await self.worker_a.add_session(DownloadSession("http://example.com/2", "s2", client_id="c2"))
+
+    async def asyncTearDown(self):
+        await self.worker_a.close()
+        await self.worker_b.close()
+        self._temp.cleanup()
+
+    def _expire_leases(self, seconds: float):
+        """让当前时间越过租约期限"""
+        now = time.time() + seconds
+        return mock.patch.object(job_backend.time, "time", return_value=now)
+
+    async def test_slot_is_held_while_lease_is_valid(self):
+        session = await self.worker_a.claim()
+        self.assertEqual(session.session_id, "s1")
+        self.assertIsNone(self.worker_b._try_claim())
+
+    async def test_expired_download_is_failed_and_slot_freed(self):
+        await self.worker_a.claim()
+        with self._expire_leases(31):
+            row = self.worker_b._try_claim()
+        self.assertEqual(row['session_id'], "s2")
+
+        reaped = await self.worker_b.get_session("s1")
+        self.assertEqual(reaped.status, "failed")
+        self.assertEqual(reaped.last_event['status'], "error")
+
+    async def test_expired_cancelling_download_is_cancelled(self):
+        await self.worker_a.claim()
+        self.assertTrue(await self.worker_a.set_cancelling("s1"))
+        with self._expire_leases(31):
+            self.worker_b._try_claim()
+        reaped = await self.worker_b.get_session("s1")
+        self.assertEqual(reaped.status, "cancelled")
+
+    async def test_renewed_lease_is_not_reaped(self):
+        await self.worker_a.claim()
+        # 续约发生在20秒后，此时原租约尚未过期
+        with self._expire_leases(20):
+            self.worker_a._maintain()
+        with self._expire_leases(31):
+            self.assertIsNone(self.worker_b._try_claim())
+        session = await self.worker_b.get_session("s1")
+        self.assertEqual(session.status, "downloading")
+
+    async def test_expired_lease_event_reaches_other_workers(self):
+        await self.worker_a.claim()
+        with self._expire_leases(31):
+            self.worker_b._try_claim()
+        events = self.worker_a._fetch_events()
+        self.assertIn({'session_id': "s1", 'status': "error", 'error': "下载进程已退出"}, events)
+
+
+if __name__ == "__main__":
+    unittest.main()
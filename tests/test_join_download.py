@@ -0,0 +1,104 @@
+import asyncio
+import shutil
+import threading
+import unittest
+
+from backend.services.video_info import VideoInfoService
+from backend.utils.file_utils import job_temp_dir
+from backend.utils.error_utils import DownloadCancelledError
+
+
+class JoinDownloadTest(unittest.IsolatedAsyncioTestCase):
+    """_join_download：取消顺序，以及恢复的任务不加入从头开始的下载"""
+
+    async def asyncSetUp(self):
+        self.stopped = asyncio.Event()
+        self.finish = asyncio.Event()
+        self.started = []
+        stopped, finish, started = self.stopped, self.finish, self.started
+
+        async def fake_download_file(url, format_id, shared, *args):
+            started.append(args[-1] if args else None)
+            # 模拟下载线程：所有请求者取消后过一段时间才真正停止
+            waiter = asyncio.ensure_future(shared.cancelled.wait())
+            done, _ = await asyncio.wait(
+                {waiter, asyncio.ensure_future(finish.wait())}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if waiter in done:
+                await asyncio.sleep(0.05)
+                stopped.set()
+                raise DownloadCancelledError("下载已取消")
+            waiter.cancel()
+            return "done.mp4"
+
+        self._original = VideoInfoService._download_file
+        VideoInfoService._download_file = staticmethod(fake_download_file)
+
+    async def asyncTearDown(self):
+        VideoInfoService._download_file = self._original
+        VideoInfoService._downloads.clear()
+
+    def _requester(self):
+        loop = asyncio.get_running_loop()
+        return threading.Event(), loop.create_future()
+
+    def _join(self, key, cancel_event, cancel_waiter, job_id=None):
+        return VideoInfoService._join_download(
+            key, "http://example.com/v", None, None, cancel_event, job_id=job_id, cancel_waiter=cancel_waiter
+        )
+
+    @staticmethod
+    def _cancel(cancel_event, cancel_waiter):
+        cancel_event.set()
+        cancel_waiter.set_result(None)
+
+    async def test_last_requester_waits_for_download_to_stop(self):
+        event, waiter = self._requester()
+        task = asyncio.ensure_future(self._join(("t", "last", "best"), event, waiter))
+        await asyncio.sleep(0.01)
+        self._cancel(event, waiter)
+        with self.assertRaises(DownloadCancelledError):
+            await task
+        self.assertTrue(self.stopped.is_set())
+
+    async def test_requester_leaves_early_while_others_remain(self):
+        key = ("t", "shared", "best")
+        event_a, waiter_a = self._requester()
+        event_b, waiter_b = self._requester()
+        task_a = asyncio.ensure_future(self._join(key, event_a, waiter_a))
+        task_b = asyncio.ensure_future(self._join(key, event_b, waiter_b))
+        await asyncio.sleep(0.01)
+        self._cancel(event_a, waiter_a)
+        with self.assertRaises(DownloadCancelledError):
+            await task_a
+        self.assertFalse(self.stopped.is_set())
+
+        self.finish.set()
+        path, started = await task_b
+        self.assertEqual(path, "done.mp4")
+        self.assertFalse(started)
+
+    async def test_resumed_job_with_partial_files_does_not_join(self):
+        key = ("t", "resume", "best")
+        partial = job_temp_dir("resumed-job")
+        partial.mkdir(parents=True, exist_ok=True)
+        self.addCleanup(shutil.rmtree, partial, True)
+        (partial / "temp.mp4.part").write_bytes(b"x" * 16)
+
+        event_a, waiter_a = self._requester()
+        event_b, waiter_b = self._requester()
+        task_a = asyncio.ensure_future(self._join(key, event_a, waiter_a))
+        await asyncio.sleep(0.01)
+        task_b = asyncio.ensure_future(self._join(key, event_b, waiter_b, job_id="resumed-job"))
+        await asyncio.sleep(0.01)
+        # 恢复的任务用自己的任务目录单独下载，进行中的共享下载仍只有原来的请求者
+        self.assertEqual(self.started, [None, "resumed-job"])
+        self.assertEqual(len(VideoInfoService._downloads[key]._cancel_events), 1)
+
+        self.finish.set()
+        self.assertEqual(await task_a, ("done.mp4", True))
+        self.assertEqual(await task_b, ("done.mp4", True))
+
+
+if __name__ == "__main__":
+    unittest.main()